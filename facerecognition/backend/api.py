@@ -10,6 +10,8 @@ Usage:
     python api.py
     # or
     uvicorn api:app --host 0.0.0.0 --port 8000
+    # several worker processes (set FACE_DB_SHARED = True in config.py)
+    uvicorn api:app --host 0.0.0.0 --port 8000 --workers 4
 """
 
 import io
@@ -21,17 +23,32 @@ os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 import json
 import base64
 import numpy as np
+import time
+import uuid
 import uvicorn
 from datetime import datetime
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from typing import List
 
-from config import HOST, PORT, MIN_ENROLLMENT_IMAGES, MAX_ENROLLMENT_IMAGES
+from collections import OrderedDict, deque
+
+from config import (
+    HOST, PORT, MIN_ENROLLMENT_IMAGES, MAX_ENROLLMENT_IMAGES, WS_MAX_TRACKS, WS_MAX_RATE_HZ,
+)
 from face_recognizer import FaceRecognizer
 from face_database import FaceDatabase
 from audit_logger import AuditLogger
-from liveness_checker import LivenessChecker
+from audit_api import create_audit_router
+from recognition_cache import RecognitionCache
+from liveness_checker import LivenessChecker, rule_stats
+from liveness_state import create_state_store, parse_session
+from identity_smoother import IdentitySmoother, identity_stats
+from inference_scheduler import InferenceScheduler, SchedulerSaturated
+from face_pipeline import FrameRequest
+from worker_pool import WorkerPool, PoolSaturated
+from ws_protocol import BINARY_SUBPROTOCOLS, FrameError, unpack_frame
 
 # ── Initialize ──────────────────────────────────────────────
 app = FastAPI(
@@ -53,7 +70,42 @@ recognizer = FaceRecognizer()
 face_db = FaceDatabase()
 audit_log = AuditLogger()
 
-print("[API] Security pipeline: LivenessChecker (MiniFASNet) will be initialized per WebSocket connection.")
+# Batches MiniFASNet / ArcFace work from all WebSocket connections
+scheduler = InferenceScheduler(recognizer)
+
+# Runs all other blocking work (decode, REST inference, DB calls) off the event loop
+pool = WorkerPool()
+
+# Temporal-consistency counters per Pi session and face track (survive reconnects)
+state_store = create_state_store()
+
+# GET /audit, GET /audit/summary
+app.include_router(create_audit_router(audit_log, pool))
+
+# Embeddings / matches of repeated /recognize uploads
+recognition_cache = RecognitionCache()
+
+# Server-side latency of WebSocket recognize frames (receive → response), for /stats
+ws_latencies = deque(maxlen=1000)
+
+print("[API] Security pipeline: LivenessChecker (MiniFASNet) will be initialized per WebSocket connection and face track.")
+
+
+@app.on_event("shutdown")
+def shutdown():
+    scheduler.stop()
+    pool.shutdown()
+    audit_log.close()
+
+
+@app.exception_handler(PoolSaturated)
+async def pool_saturated_handler(request, exc):
+    """Back-pressure: tell REST clients to retry instead of queueing forever."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server busy, retry shortly"},
+        headers={"Retry-After": "1"},
+    )
 
 
 # ── Helper Functions ────────────────────────────────────────
@@ -71,6 +123,84 @@ def decode_upload_file(file_bytes):
     return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
 
 
+def decode_ws_face(face):
+    """Decode the face of a WebSocket message: raw JPEG bytes (binary frame) or base64 (JSON)."""
+    if isinstance(face, str):
+        return decode_base64_image(face)
+    if len(face) == 0:
+        return None
+    return decode_upload_file(face)
+
+
+def decode_ws_images(message):
+    """Decode the face crop and the optional downscaled full frame of a WebSocket message."""
+    face_img = decode_ws_face(message.get("face", ""))
+    frame = message.get("frame")
+    return face_img, decode_ws_face(frame) if frame is not None else None
+
+
+def latency_stats():
+    """Percentiles of the recent WebSocket frame latencies."""
+    if not ws_latencies:
+        return {"frames": 0}
+    values = np.array(ws_latencies)
+    return {
+        "frames": len(values),
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+        "max_ms": round(float(values.max()), 2),
+    }
+
+
+def extract_embeddings(uploads):
+    """Decode uploaded images and embed them in one batched ArcFace pass (worker pool)."""
+    decoded = [decode_upload_file(contents) for contents in uploads]
+    return recognizer.get_embeddings_batch(decoded)
+
+
+def recognize_upload(contents):
+    """
+    Decode, embed and match one uploaded image (worker pool).
+    Repeated uploads of the same bytes reuse the cached embedding, and the
+    cached match while the face database is unchanged.
+    """
+    key = recognition_cache.key(contents)
+    entry = recognition_cache.get(key)
+    if entry is None:
+        img = decode_upload_file(contents)
+        if img is None:
+            raise HTTPException(status_code=400, detail="Invalid image")
+        entry = recognition_cache.put(key, recognizer.get_embedding(img))
+
+    if entry.embedding is None:
+        return {
+            "name": "no_face_detected",
+            "score": 0.0,
+            "matched": False,
+        }
+
+    version = face_db.current_version()
+    match = recognition_cache.match(entry, version)
+    if match is None:
+        match = face_db.recognize(entry.embedding)
+        recognition_cache.set_match(entry, match, version)
+    return match
+
+
+def match_identity(identity):
+    """
+    Match a track's smoothed embedding (worker pool). The cached match is
+    reused only while the face database is unchanged; current_version()
+    syncs first, so a remove / re-enroll in another worker invalidates it.
+    """
+    version = face_db.current_version()
+    match = identity.cached_match(version)
+    if match is None:
+        match = face_db.recognize(identity.embedding)
+        identity.set_match(match, version)
+    return match
+
+
 # ── REST API Endpoints ──────────────────────────────────────
 
 @app.get("/")
@@ -79,7 +209,7 @@ async def root():
     return {
         "service": "Face Recognition API",
         "status": "running",
-        "enrolled_people": len(face_db.get_all_people()),
+        "enrolled_people": face_db.count(),
     }
 
 
@@ -111,23 +241,12 @@ async def enroll_person(
             detail=f"Maximum {MAX_ENROLLMENT_IMAGES} images allowed, got {len(images)}"
         )
 
-    # Extract embeddings from each image
-    embeddings = []
-    failed = 0
-
-    for img_file in images:
-        contents = await img_file.read()
-        img = decode_upload_file(contents)
-
-        if img is None:
-            failed += 1
-            continue
+    # Extract embeddings from all images (one batched ArcFace pass)
+    uploads = [await img_file.read() for img_file in images]
+    results = await pool.run(extract_embeddings, uploads)
 
-        embedding = recognizer.get_embedding(img)
-        if embedding is not None:
-            embeddings.append(embedding)
-        else:
-            failed += 1
+    embeddings = [emb for emb in results if emb is not None]
+    failed = len(results) - len(embeddings)
 
     if len(embeddings) < MIN_ENROLLMENT_IMAGES:
         raise HTTPException(
@@ -138,7 +257,7 @@ async def enroll_person(
         )
 
     # Enroll in database
-    result = face_db.enroll(name, embeddings)
+    result = await pool.run(face_db.enroll, name, embeddings)
     result["failed_images"] = failed
 
     return result
@@ -158,53 +277,130 @@ async def recognize_face(
         Recognition result with name and confidence score
     """
     contents = await image.read()
-    img = decode_upload_file(contents)
-
-    if img is None:
-        raise HTTPException(status_code=400, detail="Invalid image")
-
-    embedding = recognizer.get_embedding(img)
-
-    if embedding is None:
-        return {
-            "name": "no_face_detected",
-            "score": 0.0,
-            "matched": False,
-        }
-
-    result = face_db.recognize(embedding)
-    return result
+    return await pool.run(recognize_upload, contents)
 
 
 @app.get("/people")
 async def list_people():
     """List all enrolled people."""
-    return {"people": face_db.get_all_people()}
+    return {"people": await pool.run(face_db.get_all_people)}
+
+
+@app.get("/stats")
+async def stats():
+    """Inference scheduler, worker pool, liveness rule, cache, audit and WebSocket latency metrics."""
+    return {
+        "scheduler": scheduler.stats(),
+        "pool": pool.stats(),
+        "liveness_rules": rule_stats(),
+        "liveness_state": state_store.stats(),
+        "audit": audit_log.stats(),
+        "recognize_cache": recognition_cache.stats(),
+        "identity": identity_stats(),
+        "ws_latency": latency_stats(),
+    }
 
 
 @app.delete("/people/{name}")
 async def delete_person(name: str):
     """Remove an enrolled person."""
-    if face_db.remove_person(name):
+    if await pool.run(face_db.remove_person, name):
         return {"message": f"Removed '{name}'"}
     raise HTTPException(status_code=404, detail=f"Person '{name}' not found")
 
 
 # ── WebSocket Endpoint ──────────────────────────────────────
 
+async def receive_message(ws):
+    """
+    Receive one Pi message as a dict: binary frames (ws_protocol) and
+    JSON text frames are both accepted on any connection.
+    """
+    message = await ws.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("bytes") is not None:
+        return unpack_frame(message["bytes"])
+    return json.loads(message["text"])
+
+
+async def send_response(ws, response, started=None):
+    """
+    Send a JSON response to the Pi, advertising the max frame rate it may use.
+
+    Args:
+        started: time.perf_counter() when the frame was received; adds
+                 "server_ms" and records the frame latency for /stats
+    """
+    response["max_rate_hz"] = WS_MAX_RATE_HZ
+    if started is not None:
+        response["server_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        ws_latencies.append(response["server_ms"])
+    await ws.send_json(response)
+
+
+async def send_busy(ws, seq, track_id, timestamp):
+    """Back-pressure: skip this frame (liveness state is left untouched)."""
+    await send_response(ws, {
+        "error": "Server busy",
+        "is_validated": False,
+        "matched": False,
+        "seq": seq,
+        "track_id": track_id,
+        "timestamp": timestamp,
+    })
+
+
+def liveness_for_track(livenesses, session, track_id):
+    """
+    LivenessChecker for a Pi-side face track (track_id None = untracked client).
+
+    Args:
+        livenesses: OrderedDict track_id -> LivenessChecker of one connection,
+                    least recently used first
+        session:    session id of the connection (state store key)
+        track_id:   track from the message
+
+    Returns:
+        the track's checker, whose counter lives in state_store (unknown
+        tracks start from zero consecutive frames); the least recently used
+        checker is dropped beyond WS_MAX_TRACKS
+    """
+    return track_state(
+        livenesses, track_id,
+        lambda: LivenessChecker(store=state_store, session=session, track_id=track_id),
+    )
+
+
+def track_state(states, track_id, factory):
+    """LRU lookup of per-track state of one connection (at most WS_MAX_TRACKS entries)."""
+    state = states.pop(track_id, None)
+    if state is None:
+        state = factory()
+    states[track_id] = state
+    while len(states) > WS_MAX_TRACKS:
+        states.popitem(last=False)
+    return state
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(ws: WebSocket):
     """
     Real-time face recognition via WebSocket — with full security pipeline.
 
-    Security rules enforced (per connection, stateful):
+    Security rules enforced (per session and face track, stateful):
       1. Proximity Block         — face_height_ratio > 0.45 → reject
       2. Temporal Consistency    — must pass 5 consecutive real frames
       3. Strict Liveness         — MiniFASNet confidence >= 0.90
       4. Ghost Blink Fix         — counter resets on type=no_face
       5. Anti-Tailgating Lockdown — face_count > 1 → lockdown
 
-    Pi sends one of two message types:
+    Pi sends one of two message types, either as JSON text frames or, if it
+    negotiated one of the BINARY_SUBPROTOCOLS, as binary frames with the same
+    fields and the raw JPEG bytes (see ws_protocol.py). The optional "seq"
+    is echoed back so a pipelining client can match responses to frames. The
+    optional "track_id" (Pi-side face tracker) selects the liveness state, so
+    each person in view builds up their own consecutive-frame count:
 
       Face detected:
         {
@@ -213,11 +409,13 @@ async def websocket_endpoint(ws: WebSocket):
           "box": [x1, y1, x2, y2],
           "face_height_ratio": 0.35,
           "face_count": 1,
+          "track_id": 7,
+          "seq": 42,
           "timestamp": 1234567890.0
         }
 
       No face in frame (triggers ghost blink reset):
-        { "type": "no_face", "timestamp": 1234567890.0 }
+        { "type": "no_face", "seq": 43, "timestamp": 1234567890.0 }
 
     Backend responds:
         {
@@ -230,31 +428,68 @@ async def websocket_endpoint(ws: WebSocket):
           "lockdown": false,
           "too_close": false,
           "label": "REAL (0.95)",
-          "timestamp": 1234567890.0
+          "seq": 42,
+          "track_id": 7,
+          "timestamp": 1234567890.0,
+          "max_rate_hz": 10.0
         }
+
+    Every response carries "max_rate_hz", the highest frame rate the Pi may
+    use (it sends faster during a HOLD STILL streak, see raspberry_pi/send_rate.py).
+
+    The Pi names its session in the URL (/ws?session=<id>, 8-64 characters of
+    [A-Za-z0-9_-]); liveness counters are kept per session and track
+    (liveness_state.py) and survive a short reconnect. The id is trusted as
+    given (no authentication): keep /ws on the Pi's network. A missing or
+    invalid id gets a private session for this connection.
+
+    A recognize message may also carry "frame" (base64 JPEG of the whole
+    camera frame, downscaled) and "frame_scale" (its width / camera width):
+    MiniFASNet then sees the face in its real surroundings ("liveness_context":
+    "frame" in the response). Recognize responses report "server_ms", the time
+    from receiving the frame to answering it.
     """
-    await ws.accept()
+    offered = ws.scope.get("subprotocols", [])
+    subprotocol = next((p for p in BINARY_SUBPROTOCOLS if p in offered), None)
+    await ws.accept(subprotocol=subprotocol)
     client_host = ws.client.host if ws.client else "unknown"
-    print(f"[WebSocket] Client connected: {client_host}")
 
-    # Each connection gets its own independent liveness state
-    liveness = LivenessChecker()
+    # Liveness state is keyed by the Pi's session (?session=<id>), so a short
+    # reconnect resumes the streak; without a valid one it is private to this connection
+    requested = ws.query_params.get("session")
+    session = parse_session(requested)
+    if session is None:
+        if requested is not None:
+            print(f"[WebSocket] Ignoring invalid session id from {client_host}")
+        session = uuid.uuid4().hex
+    livenesses = OrderedDict()
+    identities = OrderedDict()  # track_id -> IdentitySmoother
+    print(f"[WebSocket] Client connected: {client_host} ({subprotocol or 'JSON'} frames, session {session[:8]})")
 
     try:
         while True:
-            data = await ws.receive_text()
-            message = json.loads(data)
+            try:
+                message = await receive_message(ws)
+            except FrameError as e:
+                await send_response(ws, {"error": str(e), "is_validated": False, "matched": False})
+                continue
+            started = time.perf_counter()
             msg_type = message.get("type", "")
+            seq = message.get("seq")
+            track_id = message.get("track_id")
             timestamp = message.get("timestamp", 0)
 
             # ── RULE 4: Ghost Blink Fix ───────────────────────────────────────
-            # Pi reports no face → wipe the frame counter completely.
+            # Pi reports no face → wipe the frame counters of every track of
+            # the session (also tracks seen before a reconnect).
             if msg_type == "no_face":
-                liveness.reset()
-                await ws.send_json({
+                state_store.reset_session(session)
+                identities.clear()
+                await send_response(ws, {
                     "label": "NO_FACE",
                     "is_validated": False,
                     "matched": False,
+                    "seq": seq,
                     "timestamp": timestamp,
                 })
                 continue
@@ -262,13 +497,19 @@ async def websocket_endpoint(ws: WebSocket):
             if msg_type != "recognize":
                 continue  # Ignore unknown message types
 
-            # ── Decode cropped face ───────────────────────────────────────────
-            face_img = decode_base64_image(message.get("face", ""))
+            # ── Decode cropped face (and the optional full frame) ─────────────
+            try:
+                face_img, frame = await pool.run(decode_ws_images, message)
+            except PoolSaturated:
+                await send_busy(ws, seq, track_id, timestamp)
+                continue
             if face_img is None:
-                await ws.send_json({
+                await send_response(ws, {
                     "error": "Failed to decode face image",
                     "is_validated": False,
                     "matched": False,
+                    "seq": seq,
+                    "track_id": track_id,
                     "timestamp": timestamp,
                 })
                 continue
@@ -276,8 +517,46 @@ async def websocket_endpoint(ws: WebSocket):
             face_height_ratio = float(message.get("face_height_ratio", 0.0))
             face_count        = int(message.get("face_count", 1))
 
-            # ── Run all 5 security rules ──────────────────────────────────────
-            result = liveness.check(face_img, face_height_ratio, face_count)
+            # ── Single pass: detect once, MiniFASNet + ArcFace on the result ───
+            # Batched with frames from the other connections. Skipped when a
+            # cheap rule (lockdown, proximity) already rejects the frame; the
+            # embedding is only computed when this frame can complete the streak
+            # and its crop differs from the one the track was last embedded on.
+            liveness = liveness_for_track(livenesses, session, track_id)
+            identity = track_state(identities, track_id, IdentitySmoother)
+            analysis = None
+            embed = False
+            if liveness.needs_inference(face_height_ratio, face_count):
+                embed = liveness.can_validate_next() and identity.needs_embedding(face_img)
+                box = message.get("box") or [0, 0, 0, 0]
+                try:
+                    analysis = await scheduler.analyze(FrameRequest(
+                        face_img,
+                        frame=frame,
+                        crop_origin=(box[0], box[1]),
+                        frame_scale=float(message.get("frame_scale", 0.0)),
+                        embed=embed,
+                    ))
+                except SchedulerSaturated:
+                    await send_busy(ws, seq, track_id, timestamp)
+                    continue
+                except Exception as e:
+                    # This frame alone failed in the models (the rest of its batch went through)
+                    await send_response(ws, {
+                        "error": f"Inference failed: {e}",
+                        "is_validated": False,
+                        "matched": False,
+                        "seq": seq,
+                        "track_id": track_id,
+                        "timestamp": timestamp,
+                    })
+                    continue
+
+            # ── Run the security rules ────────────────────────────────────────
+            result = liveness.check(
+                face_img, face_height_ratio, face_count,
+                spoof_result=analysis.spoof if analysis else None,
+            )
 
             # Build base response (always sent, even before validation)
             response = {
@@ -287,27 +566,41 @@ async def websocket_endpoint(ws: WebSocket):
                 "lockdown": result.is_multi_face_lockdown,
                 "too_close": result.too_close,
                 "label": result.label,
+                "blocked_by": result.blocked_by,
+                "liveness_context": None if analysis is None else "frame" if analysis.full_frame else "crop",
+                "seq": seq,
+                "track_id": track_id,
                 "timestamp": timestamp,
             }
 
             # ── Recognition only fires after full validation ───────────────────
             if not result.is_fully_validated:
+                identity.reset()
                 response["matched"] = False
                 response["name"] = "unknown"
                 response["score"] = 0.0
-                await ws.send_json(response)
+                await send_response(ws, response, started)
                 continue
 
-            # ── Extract embedding and match against database ───────────────────
-            embedding = recognizer.get_embedding(face_img)
-            if embedding is None:
+            # ── Match the track's smoothed embedding against the database ─────
+            # A fresh embedding of this pass is folded in; an unchanged crop
+            # reuses the smoothed one, and its match while the DB is unchanged.
+            if analysis.embedding is not None:
+                identity.update(analysis.embedding, face_img)
+            elif embed or identity.embedding is None:
                 response["matched"] = False
                 response["name"] = "no_face_detected"
                 response["score"] = 0.0
-                await ws.send_json(response)
+                await send_response(ws, response, started)
                 continue
+            else:
+                identity.reuse()
 
-            match = face_db.recognize(embedding)
+            try:
+                match = await pool.run(match_identity, identity)
+            except PoolSaturated:
+                await send_busy(ws, seq, track_id, timestamp)
+                continue
             response["name"]    = match["name"]
             response["score"]   = match["score"]
             response["matched"] = match["matched"]
@@ -331,7 +624,7 @@ async def websocket_endpoint(ws: WebSocket):
                     )
                     print(f"\033[91m[AUDIT]\033[0m Unknown person attempted unlock | score={match['score']:.2f}")
 
-            await ws.send_json(response)
+            await send_response(ws, response, started)
 
     except WebSocketDisconnect:
         print(f"[WebSocket] Client disconnected: {client_host}")
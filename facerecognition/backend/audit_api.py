@@ -0,0 +1,70 @@
+"""
+GET /audit endpoints - access history from the audit log index.
+
+Kept apart from api.py so they can be mounted on any app with an AuditLogger
+and a WorkerPool (api.py: app.include_router(create_audit_router(audit_log, pool))).
+Index lookups run in the worker pool; malformed times or cursors answer 400,
+a disabled index (AUDIT_INDEX = False) 404.
+"""
+
+from fastapi import APIRouter, HTTPException
+
+try:
+    from config import AUDIT_QUERY_MAX_LIMIT
+except ImportError:
+    from .config import AUDIT_QUERY_MAX_LIMIT
+
+
+def audit_query(call, *args):
+    """Run an audit index lookup (worker pool); bad times / cursors become 400s."""
+    try:
+        return call(*args)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid query: {e}")
+    except RuntimeError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+def create_audit_router(audit_log, pool):
+    """
+    Args:
+        audit_log: AuditLogger
+        pool:      WorkerPool running the lookups
+
+    Returns:
+        APIRouter with GET /audit and GET /audit/summary
+    """
+    router = APIRouter()
+
+    @router.get("/audit")
+    async def audit_events(
+        person: str = None,
+        event_type: str = None,
+        start: str = None,
+        end: str = None,
+        limit: int = 100,
+        cursor: str = None,
+    ):
+        """
+        Access history from the audit log index, newest first.
+
+        Args:
+            person:     only events of this person ("UNKNOWN" for failed unlocks)
+            event_type: e.g. DOOR_UNLOCK_SUCCESS / DOOR_UNLOCK_FAILED
+            start, end: ISO 8601 time window, inclusive (server local time if naive)
+            limit:      page size (1..AUDIT_QUERY_MAX_LIMIT)
+            cursor:     "next_cursor" of the previous page
+
+        Returns:
+            {"events": [...], "next_cursor": str or null}
+        """
+        if not 1 <= limit <= AUDIT_QUERY_MAX_LIMIT:
+            raise HTTPException(status_code=400, detail=f"limit must be between 1 and {AUDIT_QUERY_MAX_LIMIT}")
+        return await pool.run(audit_query, audit_log.query, person, event_type, start, end, limit, cursor)
+
+    @router.get("/audit/summary")
+    async def audit_summary(start: str = None, end: str = None):
+        """Event counts by type and by person in an ISO 8601 time window."""
+        return await pool.run(audit_query, audit_log.summary, start, end)
+
+    return router
@@ -0,0 +1,230 @@
+"""
+Audit index - SQLite sidecar over the JSON Lines audit segments.
+
+The segments stay the source of truth; the index only stores, per event, its
+time, type, person and score plus the segment and byte offset of its line.
+Queries by person / event type / time window run on the (person, ts),
+(event_type, ts) and (ts) indexes and read just the page of lines they
+return, so months of door events answer in milliseconds.
+
+The index is derived data: catch_up() indexes whatever bytes of each segment
+it has not seen yet, so it fills in events written by other worker
+processes, survives crashes between a write and its indexing, and a deleted
+audit_index.db is rebuilt from the segments on the next start. AuditLogger
+calls it after every batch and renames the active segment's entry when it
+rotates, both under its file lock.
+
+Pagination is keyset based: every page returns "next_cursor", which is passed
+back as `cursor` to continue after the last event (newest first).
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS segments ("
+    " id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, indexed INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS events ("
+    " id INTEGER PRIMARY KEY, ts REAL NOT NULL, event_type TEXT, person TEXT, score REAL,"
+    " segment_id INTEGER NOT NULL, offset INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS events_ts ON events (ts)",
+    "CREATE INDEX IF NOT EXISTS events_person_ts ON events (person, ts)",
+    "CREATE INDEX IF NOT EXISTS events_type_ts ON events (event_type, ts)",
+)
+
+
+def _epoch(value):
+    """datetime or ISO 8601 string -> POSIX seconds (naive times are local, like log_event)."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+
+def encode_cursor(ts, event_id):
+    return f"{ts!r}:{event_id}"
+
+
+def decode_cursor(cursor):
+    """
+    Raises:
+        ValueError: for a malformed cursor
+    """
+    try:
+        ts, event_id = cursor.rsplit(":", 1)
+        return float(ts), int(event_id)
+    except ValueError:
+        raise ValueError(f"malformed cursor '{cursor}'") from None
+
+
+class AuditIndex:
+    """
+    Usage:
+        index = AuditIndex(os.path.join(log_dir, "audit_index.db"))
+        index.catch_up(log_dir, segment_names)
+        rows, next_cursor = index.query(person="Alice", limit=50)
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()   # one connection, used by the writer thread and API workers
+        self._conn = sqlite3.connect(db_path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # rebuilt from the segments if lost
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ── Maintenance (caller holds the audit file lock) ────────────────────
+
+    def catch_up(self, log_dir, names, prune=True):
+        """
+        Index the unseen tail of segments.
+
+        Args:
+            log_dir: audit directory
+            names:   segment file names in chronological order
+            prune:   `names` lists every segment; forget indexed ones not in it
+
+        Returns:
+            number of events added
+        """
+        added = 0
+        with self._lock:
+            known = {name: (seg_id, indexed) for seg_id, name, indexed
+                     in self._conn.execute("SELECT id, name, indexed FROM segments")}
+
+            for name in (set(known) - set(names)) if prune else ():
+                seg_id = known[name][0]
+                self._conn.execute("BEGIN")
+                self._conn.execute("DELETE FROM events WHERE segment_id = ?", (seg_id,))
+                self._conn.execute("DELETE FROM segments WHERE id = ?", (seg_id,))
+                self._conn.execute("COMMIT")
+
+            for name in names:
+                path = os.path.join(log_dir, name)
+                try:
+                    size = os.path.getsize(path)
+                except FileNotFoundError:
+                    continue
+                seg_id, indexed = known.get(name, (None, 0))
+                if seg_id is None:
+                    seg_id = self._conn.execute(
+                        "INSERT INTO segments (name, indexed) VALUES (?, 0)", (name,)
+                    ).lastrowid
+                if size > indexed:
+                    added += self._index_tail(path, seg_id, indexed)
+        return added
+
+    def _index_tail(self, path, seg_id, offset):
+        """Index complete lines from `offset` to the end of one segment."""
+        rows = []
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partial line being written; picked up next time
+                try:
+                    entry = json.loads(line)
+                    rows.append((_epoch(entry["timestamp"]), entry.get("event_type"), entry.get("person"),
+                                 entry.get("score"), seg_id, offset))
+                except (ValueError, KeyError, TypeError):
+                    pass  # torn line after a crash
+                offset += len(line)
+
+        self._conn.execute("BEGIN")
+        self._conn.executemany(
+            "INSERT INTO events (ts, event_type, person, score, segment_id, offset) VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        self._conn.execute("UPDATE segments SET indexed = ? WHERE id = ?", (offset, seg_id))
+        self._conn.execute("COMMIT")
+        return len(rows)
+
+    def rename_segment(self, old, new):
+        """Follow a rotation (active segment renamed to a timestamped one)."""
+        with self._lock:
+            self._conn.execute("UPDATE segments SET name = ? WHERE name = ?", (new, old))
+
+    # ── Queries ───────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _where(person, event_type, start, end):
+        clauses, params = [], []
+        if person is not None:
+            clauses.append("person = ?")
+            params.append(person)
+        if event_type is not None:
+            clauses.append("event_type = ?")
+            params.append(event_type)
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(_epoch(start))
+        if end is not None:
+            clauses.append("ts <= ?")
+            params.append(_epoch(end))
+        return clauses, params
+
+    def query(self, person=None, event_type=None, start=None, end=None, limit=100, cursor=None):
+        """
+        One page of matching events, newest first.
+
+        Args:
+            person, event_type: exact-match filters
+            start, end:         time window (datetime or ISO string, inclusive)
+            limit:              page size
+            cursor:             next_cursor of the previous page
+
+        Returns:
+            (rows, next_cursor): rows are (segment name, offset) in page order;
+            next_cursor is None on the last page
+        """
+        clauses, params = self._where(person, event_type, start, end)
+        if cursor is not None:
+            ts, event_id = decode_cursor(cursor)
+            clauses.append("(e.ts < ? OR (e.ts = ? AND e.id < ?))")
+            params += [ts, ts, event_id]
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT e.id, e.ts, s.name, e.offset FROM events e JOIN segments s ON s.id = e.segment_id "
+                f"{where} ORDER BY e.ts DESC, e.id DESC LIMIT ?",
+                params + [limit + 1],
+            ).fetchall()
+
+        next_cursor = encode_cursor(rows[limit - 1][1], rows[limit - 1][0]) if len(rows) > limit else None
+        return [(name, offset) for _, _, name, offset in rows[:limit]], next_cursor
+
+    def summary(self, start=None, end=None):
+        """
+        Event counts in a time window.
+
+        Returns:
+            dict with total, by_event_type {type: count} and by_person {person: count}
+        """
+        clauses, params = self._where(None, None, start, end)
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+        with self._lock:
+            by_type = self._conn.execute(
+                f"SELECT event_type, COUNT(*) FROM events {where} GROUP BY event_type", params
+            ).fetchall()
+            by_person = self._conn.execute(
+                f"SELECT person, COUNT(*) FROM events {where} GROUP BY person ORDER BY COUNT(*) DESC", params
+            ).fetchall()
+        return {
+            "total": sum(count for _, count in by_type),
+            "by_event_type": dict(by_type),
+            "by_person": dict(by_person),
+        }
+
+    def stats(self):
+        with self._lock:
+            events, = self._conn.execute("SELECT COUNT(*) FROM events").fetchone()
+            segments, = self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()
+        return {"events": events, "segments": segments}
@@ -1,44 +1,498 @@
+"""
+Audit logger - append-only JSON Lines security trail.
+
+log_event() used to re-read the whole audit_log.json array, append one entry
+and rewrite the file, synchronously on the WebSocket path. Now it only puts
+the entry on a queue; a background "audit-writer" thread appends whatever is
+queued (up to AUDIT_BATCH_SIZE events) as JSON Lines with one write and one
+fsync per batch, so a burst of unlocks costs one disk flush.
+
+Files in AUDIT_LOG_DIR:
+
+    audit_log.jsonl                         active segment
+    audit_log.<YYYYmmddTHHMMSSffffff>.jsonl rotated segments, named after
+                                            their first event
+
+The active segment is rotated once it reaches AUDIT_ROTATE_BYTES or its first
+event is AUDIT_ROTATE_SECONDS old. Writes and rotation hold an fcntl lock on
+audit.lock, so several API worker processes can share one directory.
+
+read_events() streams events in time order and skips whole segments outside
+the requested time range, so nothing is loaded into memory at once. With
+AUDIT_INDEX, a SQLite sidecar (audit_index.py) is kept up to date after every
+batch and query() / summary() answer filtered, paginated lookups from it.
+"""
+
 import os
 import json
-from datetime import datetime
+import queue
+import atexit
+import sqlite3
+import threading
+import contextlib
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: single-process only
+
+try:
+    from config import (
+        AUDIT_LOG_DIR, AUDIT_BATCH_SIZE, AUDIT_FSYNC, AUDIT_ROTATE_BYTES, AUDIT_ROTATE_SECONDS, AUDIT_INDEX,
+    )
+    from audit_index import AuditIndex
+except ImportError:
+    from .config import (
+        AUDIT_LOG_DIR, AUDIT_BATCH_SIZE, AUDIT_FSYNC, AUDIT_ROTATE_BYTES, AUDIT_ROTATE_SECONDS, AUDIT_INDEX,
+    )
+    from .audit_index import AuditIndex
+
+ACTIVE_NAME = "audit_log.jsonl"
+INDEX_NAME = "audit_index.db"
+_SEGMENT_PREFIX = "audit_log."
+_SEGMENT_SUFFIX = ".jsonl"
+_STAMP_FORMAT = "%Y%m%dT%H%M%S%f"
+
+# Events of several workers are timestamped before they are queued, so a
+# segment can hold a few events slightly older than its first line. Segment
+# skipping in read_events() allows for that much disorder.
+_SEGMENT_SLACK = timedelta(seconds=60)
+
+_STOP = object()
+
+
+def _parse_time(value):
+    """datetime, ISO 8601 string or None -> datetime or None."""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def _iter_file(path):
+    """Yield the events of one segment (a torn last line after a crash is skipped)."""
+    try:
+        with open(path, "rb") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        return  # rotated away while listing
+
+
+def _repair_tail(path):
+    """
+    Cut a torn last line (crash mid-write) so the next append starts on a
+    fresh line instead of being glued onto it. Caller holds the lock.
+
+    Returns:
+        number of bytes discarded
+    """
+    try:
+        f = open(path, "r+b")
+    except FileNotFoundError:
+        return 0
+    with f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return 0
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return 0
+
+        keep, pos = 0, size
+        while pos > 0:
+            start = max(0, pos - 4096)
+            f.seek(start)
+            newline = f.read(pos - start).rfind(b"\n")
+            if newline >= 0:
+                keep = start + newline + 1
+                break
+            pos = start
+        f.truncate(keep)
+        return size - keep
+
+
+def _first_timestamp(path):
+    """Timestamp of the first event in a segment, or None if it is empty."""
+    for entry in _iter_file(path):
+        return _parse_time(entry["timestamp"])
+    return None
+
+
+def list_segments(log_dir=None):
+    """
+    Audit segments in chronological order.
+
+    Args:
+        log_dir: audit directory (default AUDIT_LOG_DIR)
+
+    Returns:
+        list of (start datetime, path): rotated segments by name, then the
+        active segment (start None if it is empty)
+    """
+    log_dir = log_dir or AUDIT_LOG_DIR
+    try:
+        names = os.listdir(log_dir)
+    except FileNotFoundError:
+        return []
+
+    segments = []
+    for name in sorted(names):
+        if name == ACTIVE_NAME or not (name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX)):
+            continue
+        stamp = name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)].split("-")[0]
+        try:
+            segments.append((datetime.strptime(stamp, _STAMP_FORMAT), os.path.join(log_dir, name)))
+        except ValueError:
+            continue
+
+    active = os.path.join(log_dir, ACTIVE_NAME)
+    if os.path.exists(active):
+        segments.append((_first_timestamp(active), active))
+    return segments
+
+
+def read_events(start=None, end=None, event_type=None, person=None, log_dir=None):
+    """
+    Stream audit events, oldest first.
+
+    Args:
+        start:      only events at or after this time (datetime or ISO string)
+        end:        only events at or before this time
+        event_type: only this event type (e.g. "DOOR_UNLOCK_SUCCESS")
+        person:     only events of this person
+        log_dir:    audit directory (default AUDIT_LOG_DIR)
+
+    Yields:
+        event dicts (timestamp, event_type, person, score, details)
+    """
+    start, end = _parse_time(start), _parse_time(end)
+    segments = list_segments(log_dir)
+
+    for i, (seg_start, path) in enumerate(segments):
+        next_start = segments[i + 1][0] if i + 1 < len(segments) else None
+        if start is not None and next_start is not None and next_start + _SEGMENT_SLACK < start:
+            continue  # the whole segment is older than the range
+        if end is not None and seg_start is not None and seg_start - _SEGMENT_SLACK > end:
+            break     # this and every later segment are newer than the range
+
+        for entry in _iter_file(path):
+            if event_type is not None and entry.get("event_type") != event_type:
+                continue
+            if person is not None and entry.get("person") != person:
+                continue
+            if start is not None or end is not None:
+                ts = _parse_time(entry["timestamp"])
+                if (start is not None and ts < start) or (end is not None and ts > end):
+                    continue
+            yield entry
+
 
 class AuditLogger:
-    def __init__(self, log_file_path=None):
-        if log_file_path is None:
-            self.log_file_path = os.path.join(os.path.dirname(__file__), "data", "audit_log.json")
-        else:
-            self.log_file_path = log_file_path
-            
-        self._ensure_file()
+    """
+    Non-blocking audit trail writer.
+
+    Usage:
+        audit_log = AuditLogger()
+        audit_log.log_event("DOOR_UNLOCK_SUCCESS", "Alice", 0.71, "...")
+        for event in audit_log.read_events(start="2026-10-01"):
+            ...
+        page = audit_log.query(person="Alice", limit=50)   # AUDIT_INDEX
+        audit_log.close()   # on shutdown (also registered with atexit)
+    """
+
+    def __init__(self, log_dir=None, legacy_path=None, index=None):
+        self.log_dir = log_dir or AUDIT_LOG_DIR
+        self.path = os.path.join(self.log_dir, ACTIVE_NAME)
+        os.makedirs(self.log_dir, exist_ok=True)
+
+        self._file = None               # active segment, opened for append
+        self._segment_start = None      # first event time of the active segment
+        self._lock_file = open(os.path.join(self.log_dir, "audit.lock"), "a+") if fcntl else None
+        self._thread_lock = threading.Lock()   # flock does not exclude threads sharing _lock_file
+        self._queue = queue.Queue()
 
-    def _ensure_file(self):
-        os.makedirs(os.path.dirname(self.log_file_path), exist_ok=True)
-        if not os.path.exists(self.log_file_path):
-            with open(self.log_file_path, "w", encoding="utf-8") as f:
-                json.dump([], f)
+        # Counters
+        self.written = 0
+        self.batches = 0
+        self.rotations = 0
+        self.errors = 0
+
+        if legacy_path is None:
+            legacy_path = os.path.join(os.path.dirname(self.log_dir), "audit_log.json")
+        self._migrate_legacy(legacy_path)
+
+        self.index = None
+        if AUDIT_INDEX if index is None else index:
+            self.index = AuditIndex(os.path.join(self.log_dir, INDEX_NAME))
+            with self._file_lock():
+                added = self._update_index(full=True)
+            if added:
+                print(f"[Audit] Indexed {added} event(s) into {INDEX_NAME}")
+
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        print(f"[Audit] JSON Lines audit log: {self.log_dir}")
+
+    # ── Public API ───────────────────────────────────────────────────────
 
     def log_event(self, event_type, person_name, score=0.0, details=""):
         """
-        Logs a security event to the JSON audit file.
+        Queue a security event for the audit trail (returns immediately).
+
+        Returns:
+            the event dict
         """
-        now = datetime.now().isoformat()
         log_entry = {
-            "timestamp": now,
+            "timestamp": datetime.now().isoformat(),
             "event_type": event_type,
             "person": person_name,
             "score": round(score, 4),
-            "details": details
+            "details": details,
         }
-        
-        try:
-            with open(self.log_file_path, "r", encoding="utf-8") as f:
-                logs = json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            logs = []
-            
-        logs.append(log_entry)
-        
-        with open(self.log_file_path, "w", encoding="utf-8") as f:
-            json.dump(logs, f, indent=2, ensure_ascii=False)
-            
+        if self._thread.is_alive():
+            self._queue.put(log_entry)
+        else:
+            self._write([log_entry])  # after close(): write synchronously
         return log_entry
+
+    def flush(self, timeout=5.0):
+        """Block until every event queued so far is on disk."""
+        if not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def read_events(self, start=None, end=None, event_type=None, person=None):
+        """read_events() over this logger's directory, including queued events."""
+        self.flush()
+        return read_events(start, end, event_type, person, log_dir=self.log_dir)
+
+    def query(self, person=None, event_type=None, start=None, end=None, limit=100, cursor=None):
+        """
+        One page of indexed events, newest first (queued events included).
+
+        Args:
+            person, event_type: exact-match filters
+            start, end:         time window (datetime or ISO string, inclusive)
+            limit:              page size
+            cursor:             "next_cursor" of the previous page
+
+        Returns:
+            dict with "events" and "next_cursor" (None on the last page)
+
+        Raises:
+            ValueError: malformed time or cursor
+            RuntimeError: the index is disabled (AUDIT_INDEX = False)
+        """
+        if self.index is None:
+            raise RuntimeError("Audit index disabled (AUDIT_INDEX = False)")
+        self.flush()
+        with self._file_lock():  # no rotation between the lookup and reading the lines
+            rows, next_cursor = self.index.query(person, event_type, start, end, limit, cursor)
+            events = self._read_lines(rows)
+        return {"events": events, "next_cursor": next_cursor}
+
+    def summary(self, start=None, end=None):
+        """Event counts by type and person in a time window (see AuditIndex.summary)."""
+        if self.index is None:
+            raise RuntimeError("Audit index disabled (AUDIT_INDEX = False)")
+        self.flush()
+        return self.index.summary(start, end)
+
+    def close(self):
+        """Write the remaining events and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout=10.0)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "rotations": self.rotations,
+            "errors": self.errors,
+            "segments": len(list_segments(self.log_dir)),
+            "index": self.index.stats() if self.index is not None else None,
+        }
+
+    # ── Writer thread ────────────────────────────────────────────────────
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, waiters = [], []
+            item = self._queue.get()
+            while True:
+                if item is _STOP:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if len(batch) >= AUDIT_BATCH_SIZE:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Exclusive lock on the audit files: threads of this process, then flock on audit.lock."""
+        with self._thread_lock:
+            if self._lock_file is None:
+                yield
+                return
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _open_active(self):
+        """The active segment, reopened if another process rotated it."""
+        if self._file is not None:
+            try:
+                same = os.stat(self.path).st_ino == os.fstat(self._file.fileno()).st_ino
+            except FileNotFoundError:
+                same = False
+            if same:
+                return self._file
+            self._file.close()
+        torn = _repair_tail(self.path)
+        if torn:
+            print(f"[Audit] Discarded a torn last line ({torn} bytes) in {ACTIVE_NAME}")
+        self._file = open(self.path, "ab")
+        self._segment_start = _first_timestamp(self.path)
+        return self._file
+
+    def _write(self, entries):
+        """Append a batch: one write, one fsync, then rotate if due."""
+        data = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries).encode("utf-8")
+        try:
+            with self._file_lock():
+                f = self._open_active()
+                f.write(data)
+                f.flush()
+                if AUDIT_FSYNC:
+                    os.fsync(f.fileno())
+                if self._segment_start is None:
+                    self._segment_start = _parse_time(entries[0]["timestamp"])
+                self._update_index()
+                self._maybe_rotate(os.fstat(f.fileno()).st_size)
+        except OSError as e:
+            self.errors += 1
+            print(f"[Audit] Failed to write {len(entries)} event(s): {e}")
+            return
+        self.written += len(entries)
+        self.batches += 1
+
+    def _segment_path(self, start):
+        """Unused rotated-segment path for a segment starting at `start`."""
+        base = os.path.join(self.log_dir, _SEGMENT_PREFIX + start.strftime(_STAMP_FORMAT))
+        path, n = base + _SEGMENT_SUFFIX, 1
+        while os.path.exists(path):
+            path = f"{base}-{n}{_SEGMENT_SUFFIX}"
+            n += 1
+        return path
+
+    def _maybe_rotate(self, size):
+        """Rotate the active segment by size or age (caller holds the lock)."""
+        age = (datetime.now() - self._segment_start).total_seconds()
+        if size < AUDIT_ROTATE_BYTES and age < AUDIT_ROTATE_SECONDS:
+            return
+        target = self._segment_path(self._segment_start)
+        self._file.close()
+        self._file = None
+        os.rename(self.path, target)
+        if self.index is not None:
+            self.index.rename_segment(ACTIVE_NAME, os.path.basename(target))
+        self.rotations += 1
+        print(f"[Audit] Rotated segment {os.path.basename(target)} ({size / 1e6:.1f} MB)")
+
+    # ── Index ────────────────────────────────────────────────────────────
+
+    def _update_index(self, full=False):
+        """
+        Index new lines (caller holds the lock). After a batch only the active
+        segment can have grown; `full` rescans every segment (startup).
+
+        Returns:
+            number of events indexed
+        """
+        if self.index is None:
+            return 0
+        names = [os.path.basename(path) for _, path in list_segments(self.log_dir)] if full else [ACTIVE_NAME]
+        try:
+            return self.index.catch_up(self.log_dir, names, prune=full)
+        except sqlite3.Error as e:
+            # The JSONL segments are the audit trail; the index catches up on the next batch
+            print(f"[Audit] Index update failed: {e}")
+            return 0
+
+    def _read_lines(self, rows):
+        """Events at (segment name, offset) positions, in the given order."""
+        events, files = [], {}
+        try:
+            for name, offset in rows:
+                f = files.get(name)
+                if f is None:
+                    try:
+                        f = files[name] = open(os.path.join(self.log_dir, name), "rb")
+                    except FileNotFoundError:
+                        continue  # segment deleted since it was indexed
+                f.seek(offset)
+                try:
+                    events.append(json.loads(f.readline()))
+                except ValueError:
+                    continue
+        finally:
+            for f in files.values():
+                f.close()
+        return events
+
+    # ── Migration ────────────────────────────────────────────────────────
+
+    def _migrate_legacy(self, legacy_path):
+        """Convert the old audit_log.json array into a rotated JSONL segment (once)."""
+        if not os.path.exists(legacy_path):
+            return
+        with self._file_lock():
+            if not os.path.exists(legacy_path):
+                return  # another worker migrated it
+            try:
+                with open(legacy_path, "r", encoding="utf-8") as f:
+                    logs = json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                print(f"[Audit] Could not migrate {legacy_path}: {e}")
+                return
+
+            if logs:
+                target = self._segment_path(_parse_time(logs[0]["timestamp"]))
+                tmp = target + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    for entry in logs:
+                        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.rename(tmp, target)
+            os.rename(legacy_path, legacy_path + ".migrated")
+            print(f"[Audit] Migrated {len(logs)} event(s) from {os.path.basename(legacy_path)}")
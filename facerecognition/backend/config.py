@@ -15,9 +15,23 @@ INSIGHTFACE_MODEL = "buffalo_l"
 # GPU device ID (0 = first GPU, -1 = CPU)
 GPU_DEVICE_ID = -1  # -1 = CPU (for laptop testing), 0 = first GPU
 
+# InsightFace modules to load from the pack. Only the detector (for alignment
+# landmarks) and ArcFace are used; genderage and the 2D/3D landmark models are
+# skipped. Set to None to load everything.
+INSIGHTFACE_MODULES = ["detection", "recognition"]
+
 # Detection size for InsightFace (used during enrollment)
 DETECTION_SIZE = (640, 640)
 
+# Detector input size for face crops sent by the Pi: the crop already holds one
+# face, so a small size is enough to find its 5 alignment landmarks
+# (untuned; see scripts/benchmark_crop_fast_path.py).
+CROP_DETECTION_SIZE = (160, 160)
+
+# Max aligned faces per ArcFace ONNX call when embedding several images/faces at once
+# (untuned; see scripts/benchmark_batch_embedding.py)
+RECOGNITION_BATCH_SIZE = 32
+
 # ---- Recognition Thresholds ----
 # Cosine similarity threshold for positive match (higher = stricter)
 RECOGNITION_THRESHOLD = 0.4
@@ -26,6 +40,38 @@ RECOGNITION_THRESHOLD = 0.4
 # Path to the face embeddings database
 FACE_DB_PATH = os.path.join(os.path.dirname(__file__), "data", "face_db.json")
 
+# Storage backend for the face database:
+#   "binary" - float32 embedding block (face_db.npy, memory-mapped on load)
+#              plus a small metadata sidecar (face_db.meta.json)
+#   "json"   - legacy single face_db.json with embeddings as text
+# An existing face_db.json is migrated to the binary files on first start.
+FACE_DB_FORMAT = "binary"
+
+# Templates kept per person: enrollment embeddings are clustered into up to K
+# templates instead of one average (memory: N x K x 2 KB). 1 = single average.
+FACE_DB_MAX_TEMPLATES = 3
+# Per-person score over its templates: "max" or "top_m_mean" (mean of best m)
+FACE_DB_TEMPLATE_SCORING = "max"
+FACE_DB_TEMPLATE_TOP_M = 2
+
+# Every enroll/update/remove is appended as one record to face_db.log; the log
+# is folded into a fresh checkpoint (atomic rename) after this many records.
+FACE_DB_COMPACT_EVERY = 1000
+FACE_DB_LOG_FSYNC = True       # fsync each log record (crash-safe, slower bulk enrollment)
+
+# Search index over the embedding matrix:
+#   "exact" - brute-force matrix product over every identity (always exact)
+#   "ivf"   - inverted-file ANN index (k-means coarse quantizer), for campus-scale DBs
+FACE_DB_INDEX = "exact"
+FACE_DB_IVF_MIN_SIZE = 20000   # "ivf" searches exactly until the DB holds this many templates
+FACE_DB_IVF_NPROBE = 16        # lists scanned per query: higher = better recall, slower
+
+# Set True when running several API worker processes on one database
+# (`uvicorn api:app --workers N`): each worker memory-maps the same checkpoint
+# and tails face_db.log, so enroll/remove in one worker reach all of them
+# without a restart. Writers serialize on an fcntl lock (POSIX only).
+FACE_DB_SHARED = False
+
 # Directory for storing enrolled face images (for reference)
 ENROLLED_FACES_DIR = os.path.join(os.path.dirname(__file__), "data", "enrolled_faces")
 
@@ -35,5 +81,71 @@ MAX_ENROLLMENT_IMAGES = 15     # Maximum images per enrollment
 
 # ---- Liveness / Security ----
 LIVENESS_STRICT_THRESHOLD   = 0.90   # MiniFASNet confidence cutoff (must be >= this to be "real")
+# What MiniFASNet sees (face_pipeline.py):
+#   "detected" - the detector's face box, in the downscaled full frame if the Pi sends one
+#   "crop"     - the whole padded Haar crop as the face box (before the single-pass pipeline)
+# LIVENESS_STRICT_THRESHOLD was tuned on "crop". Confidences shift with the input:
+# only switch to "detected" together with a threshold measured on real / spoof
+# crops with scripts/compare_liveness_input.py.
+LIVENESS_INPUT              = "crop"
 PROXIMITY_RATIO_LIMIT       = 0.45   # Max face_height / frame_height before proximity block
 TEMPORAL_CONSISTENCY_FRAMES = 5      # Consecutive real frames required before door unlocks
+# Blocking rules in evaluation order; the first rule that rejects a frame ends
+# the chain. Cheap rules first: lockdown / too-close frames skip MiniFASNet.
+LIVENESS_RULE_ORDER         = ["lockdown", "proximity", "liveness"]
+
+# Temporal-consistency counters are kept per Pi session (ws://.../ws?session=<id>)
+# and face track, so a short reconnect does not drop the streak. A counter not
+# updated for LIVENESS_STATE_TTL seconds is forgotten; keep it above the Pi's
+# longest gap between frames of a face in view (TRACK_IDENTIFIED_RESEND, 5 s).
+# Session ids are not authenticated: whoever can reach /ws with a session's id
+# can resume or wipe its counters, so keep the backend on the Pi's network.
+#   "memory" - in this process
+#   "sqlite" - LIVENESS_STATE_DB_PATH, shared by `uvicorn --workers N`
+LIVENESS_STATE_STORE        = "memory"
+LIVENESS_STATE_TTL          = 10.0
+LIVENESS_STATE_DB_PATH      = os.path.join(os.path.dirname(__file__), "data", "liveness_state.db")
+WS_MAX_TRACKS               = 8      # Per-track liveness states kept per connection (oldest evicted)
+WS_MAX_RATE_HZ              = 10.0   # Max frames/s the Pi may send (advertised in every WebSocket response)
+
+# Once a track is validated, ArcFace only re-runs when its crop changes: a
+# 64-bit dHash differing by more than IDENTITY_HASH_DISTANCE bits from the last
+# embedded crop, a new track, or IDENTITY_REFRESH_SECONDS since the last
+# embedding. Embeddings are averaged per track (EMA) before matching.
+IDENTITY_HASH_DISTANCE      = 8      # Bits; same face frame-to-frame ~0-6, another face ~30
+IDENTITY_REFRESH_SECONDS    = 2.0    # Re-embed at least this often while a track is validated
+IDENTITY_EMA_ALPHA          = 0.3    # Weight of the newest embedding in the smoothed one
+IDENTITY_RESET_SIMILARITY   = 0.5    # Cosine below this restarts the average (different person)
+
+# ---- Audit Log ----
+# Security events are appended as JSON Lines by a background writer thread
+# (log_event never blocks the request path). The active segment is rotated
+# into AUDIT_LOG_DIR/audit_log.<first event time>.jsonl once it reaches
+# AUDIT_ROTATE_BYTES or is AUDIT_ROTATE_SECONDS old. A legacy
+# data/audit_log.json array is migrated on first start.
+AUDIT_LOG_DIR          = os.path.join(os.path.dirname(__file__), "data", "audit")
+AUDIT_BATCH_SIZE       = 256          # Max queued events written (and fsynced) in one batch
+AUDIT_FSYNC            = True         # fsync once per batch (crash-safe audit trail)
+AUDIT_ROTATE_BYTES     = 16 * 1024 * 1024
+AUDIT_ROTATE_SECONDS   = 24 * 3600    # Start a new segment at least daily
+# SQLite sidecar (AUDIT_LOG_DIR/audit_index.db) behind GET /audit: event time,
+# type, person and line offset per event. Rebuilt from the segments if deleted.
+AUDIT_INDEX            = True
+AUDIT_QUERY_MAX_LIMIT  = 1000         # Max events per GET /audit page
+
+# ---- /recognize Result Cache ----
+# Identical uploads (same bytes) reuse their embedding for RECOGNIZE_CACHE_TTL
+# seconds; the match is recomputed whenever the face database changed.
+RECOGNIZE_CACHE_SIZE   = 512          # Entries kept (LRU); 0 disables the cache
+RECOGNIZE_CACHE_TTL    = 300.0        # Seconds an embedding is reused
+
+# ---- Inference Scheduler (WebSocket micro-batching) ----
+# Frames from all WebSocket connections are gathered for up to
+# INFERENCE_MAX_WAIT_MS and run through MiniFASNet / ArcFace as one batch.
+INFERENCE_MAX_BATCH_SIZE = 16
+INFERENCE_MAX_WAIT_MS = 5
+INFERENCE_MAX_QUEUE = 64       # Waiting requests before WebSocket frames get a "busy" reply
+
+# ---- Worker Pool (blocking decode / inference / DB calls off the event loop) ----
+WORKER_POOL_SIZE = 4           # Threads running REST and WebSocket blocking work
+WORKER_POOL_MAX_PENDING = 32   # Running + queued calls before REST returns 503 / WS frames are skipped
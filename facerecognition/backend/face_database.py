@@ -1,11 +1,32 @@
 """
 Face Database - stores and searches face embeddings.
 
-Storage format (face_db.json):
+Each person keeps up to K = FACE_DB_MAX_TEMPLATES unit-norm templates
+(clusters of their enrollment embeddings) instead of one averaged embedding,
+so enrollments across lighting and pose stay separable.
+
+Binary storage format (default, FACE_DB_FORMAT = "binary"):
+    face_db.<seq>.npy  float32 (N x K x 512) template block, memory-mapped on load;
+                       unused template slots are zero
+    face_db.meta.json  {"version": 2, "dim": 512, "log_seq": seq,
+                        "embeddings": "face_db.<seq>.npy",
+                        "people": {name: metadata incl. "num_templates"}}
+                       people are listed in row order of the .npy block
+
+Change log (face_db.log), one JSON line per mutation since the checkpoint:
+    {"seq": 42, "op": "put", "name": ..., "person": {metadata}, "templates": <base64 float32>}
+    {"seq": 43, "op": "remove", "name": ...}
+
+Each mutation is a single O(1) append. After FACE_DB_COMPACT_EVERY records the
+state is written as a new checkpoint; the sidecar is the commit point (atomic
+rename) and records with seq <= log_seq are skipped on replay, so a crash at
+any point leaves a recoverable database.
+
+Legacy storage format (face_db.json), migrated to binary on first start:
 {
     "people": {
         "Ali Yilmaz": {
-            "embedding": [0.123, -0.456, ...],  // 512-d averaged embedding
+            "templates": [[0.123, -0.456, ...], ...],  // up to K 512-d templates
             "num_samples": 8,
             "enrolled_at": "2026-04-15T18:00:00",
             "updated_at": "2026-04-15T18:00:00"
@@ -13,46 +34,842 @@ Storage format (face_db.json):
         ...
     }
 }
+
+(Files written by older versions with a single "embedding" per person, or a
+2-d N x 512 block, load as one template per person.)
+
+In memory the templates are kept out of the JSON dict in a contiguous,
+pre-normalized float32 matrix (N x K x 512) with a parallel list of names, so a
+lookup is a single matrix-vector product over all N*K templates followed by a
+per-person max (or top-m mean) over the K axis. Searches go through a pluggable
+index (ExactIndex or the approximate IVFIndex, see FACE_DB_INDEX) that is kept
+in sync with the template rows.
+
+The public methods are serialized by a re-entrant lock, so the API can call
+them from its worker threads.
+
+Shared mode (FACE_DB_SHARED, for several API worker processes): every process
+maps the same checkpoint read-only (copy-on-write, so the pages are shared
+through the OS page cache) and the change log doubles as the replication
+channel. Before each call a process stats the checkpoint and the log; if
+another process appended records it tails them, if it wrote a new checkpoint
+it re-maps. Mutations hold an exclusive fcntl lock on face_db.lock, readers
+that need to catch up hold it shared. `version` (the last applied log seq)
+increases with every change.
 """
 
 import os
+import glob
 import json
+import base64
+import functools
+import threading
+import contextlib
 import numpy as np
 from datetime import datetime
 try:
-    from config import FACE_DB_PATH, ENROLLED_FACES_DIR, RECOGNITION_THRESHOLD
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: shared (multi-process) mode unavailable
+try:
+    from config import (
+        FACE_DB_PATH, FACE_DB_FORMAT, FACE_DB_COMPACT_EVERY, FACE_DB_LOG_FSYNC,
+        FACE_DB_INDEX, FACE_DB_IVF_MIN_SIZE, FACE_DB_IVF_NPROBE,
+        FACE_DB_MAX_TEMPLATES, FACE_DB_TEMPLATE_SCORING, FACE_DB_TEMPLATE_TOP_M,
+        FACE_DB_SHARED, ENROLLED_FACES_DIR, RECOGNITION_THRESHOLD,
+    )
 except ImportError:
-    from .config import FACE_DB_PATH, ENROLLED_FACES_DIR, RECOGNITION_THRESHOLD
+    from .config import (
+        FACE_DB_PATH, FACE_DB_FORMAT, FACE_DB_COMPACT_EVERY, FACE_DB_LOG_FSYNC,
+        FACE_DB_INDEX, FACE_DB_IVF_MIN_SIZE, FACE_DB_IVF_NPROBE,
+        FACE_DB_MAX_TEMPLATES, FACE_DB_TEMPLATE_SCORING, FACE_DB_TEMPLATE_TOP_M,
+        FACE_DB_SHARED, ENROLLED_FACES_DIR, RECOGNITION_THRESHOLD,
+    )
+
+EMBEDDING_DIM = 512
+BINARY_FORMAT_VERSION = 2
+
+
+def _locked(method):
+    """Run a read-only FaceDatabase method under the instance lock, after catching up."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            self._sync()
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _locked_write(method):
+    """Run a mutating FaceDatabase method under the instance lock and, in
+    shared mode, the exclusive cross-process file lock."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock, self._file_lock(exclusive=True):
+            self._sync(exclusive=True)
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def binary_paths(db_path, log_seq=0):
+    """(embeddings .npy, metadata sidecar) paths for a face_db.json path."""
+    base = os.path.splitext(db_path)[0]
+    return f"{base}.{log_seq}.npy", base + ".meta.json"
+
+
+def lock_path(db_path):
+    """Cross-process lock file used in shared mode."""
+    return os.path.splitext(db_path)[0] + ".lock"
+
+
+def log_path(db_path):
+    """Change log path for a face_db.json path."""
+    return os.path.splitext(db_path)[0] + ".log"
+
+
+def _replace_file(path, write):
+    """Write via `write(f)` to a temp file, then atomically rename over `path`."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_binary(db_path, people, matrix, log_seq=0):
+    """
+    Write a checkpoint in the binary format.
+
+    Args:
+        db_path: face_db.json path the binary files are derived from
+        people:  dict name -> metadata, in the same order as matrix rows
+        matrix:  float32 array (len(people) x K x 512)
+        log_seq: last change log record folded into this checkpoint
+    """
+    npy_path, meta_path = binary_paths(db_path, log_seq)
+    meta = {
+        "version": BINARY_FORMAT_VERSION,
+        "dim": EMBEDDING_DIM,
+        "log_seq": log_seq,
+        "embeddings": os.path.basename(npy_path),
+        "people": people,
+    }
+
+    # The embedding block gets a new name per checkpoint; replacing the sidecar
+    # is what switches readers over to it.
+    _replace_file(npy_path, lambda f: np.save(f, np.ascontiguousarray(matrix, dtype=np.float32)))
+    _replace_file(meta_path, lambda f: f.write(json.dumps(meta, ensure_ascii=False).encode("utf-8")))
+
+    base = os.path.splitext(db_path)[0]
+    for stale in glob.glob(glob.escape(base) + ".*npy"):
+        if os.path.abspath(stale) != os.path.abspath(npy_path):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass  # still mapped by another process (Windows); retried next checkpoint
+
+
+def encode_templates(templates):
+    """float32 (n x 512) templates -> base64 string for a change log record."""
+    return base64.b64encode(np.asarray(templates, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def decode_templates(data):
+    """Inverse of encode_templates(); returns an (n x 512) array."""
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+
+
+def _normalize_rows(x):
+    x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def select_templates(embeddings, max_templates, weights=None, iterations=10):
+    """
+    Reduce embeddings to at most `max_templates` unit-norm templates.
+
+    Runs a small weighted spherical k-means (farthest-point init), so
+    embeddings from different poses / lighting end up in different templates
+    while near-duplicates are averaged together. With max_templates=1 this is
+    the plain weighted mean.
+
+    Args:
+        embeddings:    (n x 512) array or list of 512-d arrays
+        max_templates: K
+        weights:       optional per-embedding weights (default 1 each)
+
+    Returns:
+        float32 array (min(n, K) x 512), largest cluster first
+    """
+    x = _normalize_rows(embeddings)
+    w = np.ones(len(x)) if weights is None else np.asarray(weights, dtype=np.float64)
+    if len(x) <= max_templates:
+        return x.astype(np.float32)
+
+    mean = (w[:, None] * x).sum(axis=0)
+    chosen = [int(np.argmax(x @ mean))]
+    while len(chosen) < max_templates:
+        closest = np.max(x @ x[chosen].T, axis=1)
+        chosen.append(int(np.argmin(closest)))
+    centers = x[chosen]
+
+    for _ in range(iterations):
+        assign = np.argmax(x @ centers.T, axis=1)
+        for c in range(max_templates):
+            members = assign == c
+            if members.any():
+                center = (w[members, None] * x[members]).sum(axis=0)
+                centers[c] = center / np.linalg.norm(center)
+
+    assign = np.argmax(x @ centers.T, axis=1)
+    cluster_weight = np.bincount(assign, weights=w, minlength=max_templates)
+    keep = [c for c in np.argsort(-cluster_weight, kind="stable") if cluster_weight[c] > 0]
+    return centers[keep].astype(np.float32)
+
+
+def migrate_json_to_binary(db_path):
+    """
+    One-shot migration of a legacy face_db.json to face_db.npy + face_db.meta.json.
+    The JSON file is left in place untouched.
+
+    Returns:
+        int: number of people migrated
+    """
+    with open(db_path, "r", encoding="utf-8") as f:
+        legacy = json.load(f)
+    people = legacy.get("people", {})
+
+    templates = [_json_templates(person) for person in people.values()]
+    max_templates = max((len(t) for t in templates), default=1)
+    matrix = np.zeros((len(people), max_templates, EMBEDDING_DIM), dtype=np.float32)
+    for row, (person, person_templates) in enumerate(zip(people.values(), templates)):
+        matrix[row, :len(person_templates)] = _normalize_rows(person_templates)
+        person["num_templates"] = len(person_templates)
+
+    write_binary(db_path, people, matrix, legacy.get("log_seq", 0))
+    print(f"[FaceDB] Migrated {len(people)} people from {os.path.basename(db_path)} to binary format")
+    return len(people)
+
+
+def _json_templates(person):
+    """Pop the templates out of a JSON person dict (older files store one "embedding")."""
+    if "templates" in person:
+        return person.pop("templates")
+    return [person.pop("embedding")]
+
+
+def _top_k(scores, k):
+    """Indices of the k largest scores, best first (argpartition, then sort k)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.intp)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class ExactIndex:
+    """
+    Brute-force search: one matrix-vector product over every template row
+    (empty slots included, see FaceDatabase._search).
+    Always exact; also the fallback used by IVFIndex while it is untrained.
+
+    Index rows are template rows of the flattened (N*K x 512) matrix. Hooks:
+    on_set (row filled), on_clear (row emptied), on_move (row copied to
+    another row), on_remove (row beyond the live range).
+    """
+
+    name = "exact"
+
+    def reset(self):
+        pass
+
+    def maybe_train(self, matrix, valid):
+        pass
+
+    def on_set(self, row, embedding):
+        pass
+
+    def on_clear(self, row):
+        pass
+
+    def on_move(self, src, dst):
+        pass
+
+    def on_remove(self, row):
+        pass
+
+    def score(self, matrix, query):
+        """
+        Args:
+            matrix: live template rows of the embedding matrix (N*K x 512)
+            query:  normalized float32 query (512,)
+
+        Returns:
+            (rows, scores): candidate rows and their cosine similarities;
+            rows is None when every row was scored (scores[i] is row i)
+        """
+        return None, matrix @ query
+
+
+class IVFIndex:
+    """
+    Approximate inverted-file index.
+
+    A spherical k-means coarse quantizer splits the rows into `nlist` lists;
+    a query only scores the rows in the `nprobe` lists whose centroids are
+    closest to it. `nprobe` is the recall-vs-latency knob and can be changed
+    at any time. Searches are exact until the index is first trained, which
+    happens once the DB holds `min_size` templates.
+    """
+
+    name = "ivf"
+
+    def __init__(self, nprobe=None, min_size=None, nlist=None):
+        self.nprobe = nprobe or FACE_DB_IVF_NPROBE
+        self.min_size = FACE_DB_IVF_MIN_SIZE if min_size is None else min_size
+        self.nlist = nlist  # None = ~4 * sqrt(N), chosen at training time
+        self.exact = ExactIndex()
+        self.reset()
+
+    def reset(self):
+        self.centroids = None
+        self._assign = np.zeros(0, dtype=np.int32)  # list id per row, -1 = empty slot
+        self._trained_size = 0
+        self._lists = None  # (order, offsets), rebuilt lazily after mutations
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def maybe_train(self, matrix, valid):
+        """(Re)train once the DB reaches min_size templates, and again each time it doubles."""
+        n = int(np.count_nonzero(valid))
+        if n >= max(self.min_size, 1) and n >= 2 * self._trained_size:
+            self.train(matrix, valid)
+
+    def train(self, matrix, valid, iterations=10, seed=0):
+        """Fit centroids on a sample of the valid rows, then assign every valid row to a list."""
+        valid_rows = np.flatnonzero(valid)
+        n = len(valid_rows)
+        nlist = min(self.nlist or max(1, int(4 * np.sqrt(n))), n)
+        rng = np.random.default_rng(seed)
+
+        sample = np.asarray(matrix[np.sort(rng.choice(valid_rows, min(n, 16 * nlist), replace=False))])
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            # Per-list sums of the assigned rows (segment sums over rows sorted by list)
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assign, kind="stable")
+            counts = np.bincount(assign, minlength=nlist)
+            starts = np.cumsum(counts) - counts
+            sums = np.zeros_like(centroids)
+            sums[counts > 0] = np.add.reduceat(sample[order], starts[counts > 0], axis=0)
+            norms = np.linalg.norm(sums, axis=1)
+
+            # Re-seed empty lists from random sample rows
+            empty = norms == 0
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            norms[empty] = 1.0
+            centroids = sums / norms[:, None]
+
+        self.centroids = centroids.astype(np.float32)
+        self._assign = self._quantize(matrix)
+        self._assign[~valid] = -1
+        self._trained_size = n
+        self._lists = None
+        print(f"[FaceDB] IVF index trained: {n} rows in {nlist} lists (nprobe={self.nprobe})")
+
+    def _quantize(self, matrix, chunk=8192):
+        """Nearest-centroid list id for each row, in chunks to bound memory."""
+        assign = np.empty(len(matrix), dtype=np.int32)
+        for start in range(0, len(matrix), chunk):
+            assign[start:start + chunk] = np.argmax(matrix[start:start + chunk] @ self.centroids.T, axis=1)
+        return assign
+
+    def on_set(self, row, embedding):
+        if not self.is_trained:
+            return
+        if row >= len(self._assign):
+            assign = np.full(max(row + 1, 2 * len(self._assign)), -1, dtype=np.int32)
+            assign[:len(self._assign)] = self._assign
+            self._assign = assign
+        self._assign[row] = np.argmax(self.centroids @ embedding)
+        self._lists = None
+
+    def on_clear(self, row):
+        if self.is_trained and row < len(self._assign):
+            self._assign[row] = -1
+            self._lists = None
+
+    def on_move(self, src, dst):
+        if self.is_trained:
+            self._assign[dst] = self._assign[src]
+            self._lists = None
+
+    def on_remove(self, row):
+        self._lists = None
+
+    def _build_lists(self, n):
+        """
+        Group live rows by list: rows of list c are order[offsets[c]:offsets[c+1]].
+        Empty slots (-1) sort before list 0 and are never probed.
+        """
+        order = np.argsort(self._assign[:n], kind="stable")
+        offsets = np.searchsorted(self._assign[:n][order], np.arange(len(self.centroids) + 1))
+        self._lists = (order, offsets)
+
+    def score(self, matrix, query):
+        n = len(matrix)
+        if not self.is_trained:
+            return self.exact.score(matrix, query)
+        if self._lists is None:
+            self._build_lists(n)
+        order, offsets = self._lists
+
+        probe = _top_k(self.centroids @ query, self.nprobe)
+        candidates = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probe])
+        return candidates, matrix[candidates] @ query
+
+
+def make_index(kind=None):
+    """Build the search index named by FACE_DB_INDEX ("exact" or "ivf")."""
+    kind = kind or FACE_DB_INDEX
+    if kind == "exact":
+        return ExactIndex()
+    if kind == "ivf":
+        return IVFIndex()
+    raise ValueError(f"Unknown face DB index '{kind}'")
 
 
 class FaceDatabase:
     """
     Manages face embeddings storage and search.
-    Uses JSON file for simplicity (upgradeable to PostgreSQL + pgvector).
+    Uses a memory-mapped .npy embedding block plus a JSON metadata sidecar
+    (or the legacy single JSON file), upgradeable to PostgreSQL + pgvector.
     """
 
-    def __init__(self):
+    def __init__(self, db_path=None, storage_format=None, index=None, shared=None):
+        self.db_path = db_path or FACE_DB_PATH
+        self.storage_format = storage_format or FACE_DB_FORMAT
+        if self.storage_format not in ("binary", "json"):
+            raise ValueError(f"Unknown face DB format '{self.storage_format}'")
+
+        # Per-identity scoring over the K templates: "max" or "top_m_mean"
+        self.max_templates = FACE_DB_MAX_TEMPLATES
+        self.template_scoring = FACE_DB_TEMPLATE_SCORING
+        self.top_m = FACE_DB_TEMPLATE_TOP_M
+        if self.template_scoring not in ("max", "top_m_mean"):
+            raise ValueError(f"Unknown template scoring '{self.template_scoring}'")
+
+        # Several processes on one database: see "Shared mode" above
+        self.shared = FACE_DB_SHARED if shared is None else shared
+        if self.shared and fcntl is None:
+            raise RuntimeError("Shared face DB mode needs fcntl (POSIX only)")
+
+        self.index = index or make_index()
+
+        # Change log: _log_seq is the last record applied, _log_pending counts
+        # records since the last checkpoint, _log_offset is how far the log
+        # has been read and _checkpoint_stat identifies the loaded checkpoint.
+        self._log_path = log_path(self.db_path)
+        self._log_file = None
+        self._log_offset = 0
+        self._checkpoint_stat = None
+
+        self._lock = threading.RLock()
+        self._lock_file = None
         self._ensure_dirs()
-        self.db = self._load()
-        print(f"[FaceDB] Loaded {len(self.db.get('people', {}))} enrolled people")
+        with self._file_lock(exclusive=True):
+            self._reload(truncate=True)
+        print(f"[FaceDB] Loaded {len(self.db.get('people', {}))} enrolled people"
+              + (" (shared mode)" if self.shared else ""))
 
     def _ensure_dirs(self):
         """Create data directories if they don't exist."""
-        os.makedirs(os.path.dirname(FACE_DB_PATH), exist_ok=True)
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
         os.makedirs(ENROLLED_FACES_DIR, exist_ok=True)
 
+    def _reset_state(self):
+        """Empty in-memory state (before loading a checkpoint)."""
+        # Template matrix: rows [0, _count) are live, the rest is spare capacity.
+        # Row i holds _ntemplates[i] templates of _names[i]; _rows maps name -> row.
+        self._matrix = np.zeros((0, self.max_templates, EMBEDDING_DIM), dtype=np.float32)
+        self._ntemplates = np.zeros(0, dtype=np.int32)
+        self._names = []
+        self._rows = {}
+        self.index.reset()
+        self._log_seq = 0
+        self._log_pending = 0
+        self._log_offset = 0
+
+    def _reload(self, truncate):
+        """Load the current checkpoint and replay the change log on top."""
+        self._reset_state()
+        self._checkpoint_stat = self._stat_checkpoint()
+        self.db = self._load()
+        self._replay_log(truncate=truncate)
+        self.index.maybe_train(*self._flat_templates())
+
     def _load(self):
         """Load database from disk."""
-        if os.path.exists(FACE_DB_PATH):
-            with open(FACE_DB_PATH, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return {"people": {}}
+        if self.storage_format == "binary":
+            return self._load_binary()
+        return self._load_json()
 
     def _save(self):
-        """Save database to disk."""
-        with open(FACE_DB_PATH, "w", encoding="utf-8") as f:
-            json.dump(self.db, f, indent=2, ensure_ascii=False)
+        """Write a full checkpoint of the current state."""
+        if self.storage_format == "binary":
+            people = {name: self.db["people"][name] for name in self._names}
+            write_binary(self.db_path, people, self._matrix[:self._count], self._log_seq)
+        else:
+            self._save_json()
+
+    def _load_binary(self):
+        """
+        Memory-map the template block and read the metadata sidecar.
+
+        The matrix is mapped copy-on-write: rows are paged in lazily and
+        in-place updates never touch the file until the next _save().
+        """
+        _, meta_path = binary_paths(self.db_path)
+        if not os.path.exists(meta_path):
+            if not os.path.exists(self.db_path):
+                return {"people": {}}
+            migrate_json_to_binary(self.db_path)
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        people = meta.get("people", {})
+        # Sidecars written before the change log existed point at face_db.npy
+        default_npy = os.path.basename(os.path.splitext(self.db_path)[0]) + ".npy"
+        npy_path = os.path.join(os.path.dirname(meta_path), meta.get("embeddings", default_npy))
+
+        matrix = np.load(npy_path, mmap_mode="c")
+        if matrix.ndim == 2:
+            matrix = matrix.reshape(len(matrix), 1, EMBEDDING_DIM)  # single-embedding format
+        if matrix.shape[0] != len(people) or matrix.shape[2] != EMBEDDING_DIM:
+            raise ValueError(
+                f"Face DB corrupt: {npy_path} has shape {matrix.shape}, "
+                f"metadata lists {len(people)} people"
+            )
+
+        ntemplates = np.array([p.get("num_templates", 1) for p in people.values()], dtype=np.int32)
+        if matrix.shape[1] != self.max_templates:
+            # FACE_DB_MAX_TEMPLATES changed: pad, or keep the largest clusters
+            # (stored first). Rewritten in the new shape at the next checkpoint.
+            resized = np.zeros((len(matrix), self.max_templates, EMBEDDING_DIM), dtype=np.float32)
+            keep = min(matrix.shape[1], self.max_templates)
+            resized[:, :keep] = matrix[:, :keep]
+            matrix = resized
+            ntemplates = np.minimum(ntemplates, self.max_templates)
+            for person, n in zip(people.values(), ntemplates):
+                person["num_templates"] = int(n)
+
+        self._matrix = matrix
+        self._ntemplates = ntemplates
+        self._names = list(people)
+        self._rows = {name: row for row, name in enumerate(self._names)}
+        self._log_seq = meta.get("log_seq", 0)
+        return {"people": people}
+
+    def _load_json(self):
+        """
+        Load the legacy JSON file.
+
+        Templates are moved out of the per-person dicts into the matrix;
+        the returned dict only holds metadata.
+        """
+        db = {"people": {}}
+        if os.path.exists(self.db_path):
+            with open(self.db_path, "r", encoding="utf-8") as f:
+                db = json.load(f)
+
+        self._log_seq = db.pop("log_seq", 0)
+        people = db.setdefault("people", {})
+        self._reserve(len(people))
+        for name, person in people.items():
+            templates = _json_templates(person)[:self.max_templates]
+            self._set_row(name, templates)
+            person["num_templates"] = len(templates)
+        return db
+
+    def _save_json(self):
+        """Write the legacy JSON file."""
+        people = {}
+        for name, person in self.db["people"].items():
+            row = self._rows[name]
+            templates = self._matrix[row, :self._ntemplates[row]].tolist()
+            people[name] = dict(person, templates=templates)
+
+        data = json.dumps({"log_seq": self._log_seq, "people": people}, indent=2, ensure_ascii=False)
+        _replace_file(self.db_path, lambda f: f.write(data.encode("utf-8")))
+
+    # ── Change log ──────────────────────────────────────────────
+
+    def _replay_log(self, truncate=True):
+        """
+        Apply change log records newer than the loaded checkpoint, starting
+        at _log_offset. A torn last record (crash mid-append) is truncated
+        away if `truncate` (only safe while no other process can append).
+        """
+        if not os.path.exists(self._log_path):
+            return
+
+        valid_bytes = self._log_offset
+        with open(self._log_path, "rb") as f:
+            f.seek(self._log_offset)
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete record")
+                    record = json.loads(line)
+                except ValueError:
+                    print(f"[FaceDB] Discarding torn change log record at byte {valid_bytes}")
+                    break
+                valid_bytes += len(line)
+
+                if record["seq"] <= self._log_seq:
+                    continue  # already folded into the checkpoint
+                self._apply(record)
+                self._log_seq = record["seq"]
+                self._log_pending += 1
+
+        self._log_offset = valid_bytes
+        if truncate and valid_bytes < os.path.getsize(self._log_path):
+            with open(self._log_path, "r+b") as f:
+                f.truncate(valid_bytes)
+
+    def _apply(self, record):
+        """Apply one change log record to the in-memory state."""
+        name = record["name"]
+        if record["op"] == "put":
+            # Records written before multi-template storage carry one "embedding"
+            templates = decode_templates(record.get("templates", record.get("embedding")))
+            templates = templates[:self.max_templates]
+            self._set_row(name, templates)
+            self.db["people"][name] = dict(record["person"], num_templates=len(templates))
+        elif record["op"] == "remove" and name in self.db["people"]:
+            del self.db["people"][name]
+            self._delete_row(name)
+
+    def _append_log(self, op, name):
+        """Durably append one mutation (already applied in memory) to the change log."""
+        self._log_seq += 1
+        record = {"seq": self._log_seq, "op": op, "name": name}
+        if op == "put":
+            row = self._rows[name]
+            record["person"] = self.db["people"][name]
+            record["templates"] = encode_templates(self._matrix[row, :self._ntemplates[row]])
+
+        line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+        if self._log_file is None:
+            self._log_file = open(self._log_path, "ab")
+        self._log_file.write(line)
+        self._log_file.flush()
+        self._log_offset += len(line)
+        if FACE_DB_LOG_FSYNC:
+            os.fsync(self._log_file.fileno())
+
+        self._log_pending += 1
+        if self._log_pending >= FACE_DB_COMPACT_EVERY:
+            self._checkpoint()
+
+    def _checkpoint(self):
+        """Fold the change log into a new checkpoint and empty the log."""
+        self._save()
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+        # Safe to crash before this: replay skips records <= the checkpoint's log_seq
+        with open(self._log_path, "wb"):
+            pass
+        self._log_pending = 0
+        self._log_offset = 0
+        self._checkpoint_stat = self._stat_checkpoint()
+        self.index.maybe_train(*self._flat_templates())
+
+    # ── Shared mode (multi-process) ─────────────────────────────
+
+    def _stat_checkpoint(self):
+        """Identity of the checkpoint file; atomic replace changes the inode."""
+        path = binary_paths(self.db_path)[1] if self.storage_format == "binary" else self.db_path
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _log_size(self):
+        try:
+            return os.path.getsize(self._log_path)
+        except FileNotFoundError:
+            return 0
 
+    @contextlib.contextmanager
+    def _file_lock(self, exclusive):
+        """Cross-process flock on face_db.lock (no-op unless shared)."""
+        if not self.shared:
+            yield
+            return
+        if self._lock_file is None:
+            self._lock_file = open(lock_path(self.db_path), "a+")
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _changed_on_disk(self):
+        return (self._stat_checkpoint() != self._checkpoint_stat
+                or self._log_size() != self._log_offset)
+
+    def _sync(self, exclusive=False):
+        """
+        Pick up changes made by other processes: tail new log records, or
+        reload if a new checkpoint was written. Two stat() calls when nothing
+        changed. `exclusive` means the caller already holds the exclusive lock.
+        """
+        if not self.shared or not self._changed_on_disk():
+            return
+
+        lock = contextlib.nullcontext() if exclusive else self._file_lock(exclusive=False)
+        with lock:
+            if self._stat_checkpoint() != self._checkpoint_stat or self._log_size() < self._log_offset:
+                self._reload(truncate=exclusive)
+                print(f"[FaceDB] Reloaded checkpoint (version {self._log_seq})")
+            else:
+                self._replay_log(truncate=exclusive)
+
+    @property
+    def version(self):
+        """Last applied change log seq; increases with every enroll/update/remove/clear."""
+        return self._log_seq
+
+    @_locked
+    def current_version(self):
+        """version after picking up changes made by other workers (shared mode)."""
+        return self._log_seq
+
+    # ── Template matrix ─────────────────────────────────────────
+
+    @property
+    def _count(self):
+        return len(self._names)
+
+    def _reserve(self, capacity):
+        """Grow the matrix (amortized doubling) so it can hold `capacity` people."""
+        if capacity <= len(self._matrix):
+            return
+        new_capacity = max(capacity, 2 * len(self._matrix), 16)
+        matrix = np.zeros((new_capacity, self.max_templates, EMBEDDING_DIM), dtype=np.float32)
+        matrix[:self._count] = self._matrix[:self._count]
+        ntemplates = np.zeros(new_capacity, dtype=np.int32)
+        ntemplates[:self._count] = self._ntemplates[:self._count]
+        self._matrix = matrix
+        self._ntemplates = ntemplates
+
+    def _template_mask(self):
+        """(N x K) bool: which template slots of the live rows are filled."""
+        return np.arange(self.max_templates) < self._ntemplates[:self._count, None]
+
+    def _flat_templates(self):
+        """Live template rows as an (N*K x 512) view plus their (N*K,) valid mask."""
+        flat = self._matrix[:self._count].reshape(-1, EMBEDDING_DIM)
+        return flat, self._template_mask().reshape(-1)
+
+    def _set_row(self, name, templates):
+        """Insert or overwrite the templates (1..K embeddings) of `name`."""
+        templates = _normalize_rows(templates)
+        n = len(templates)
+
+        row = self._rows.get(name)
+        if row is None:
+            row = self._count
+            self._reserve(row + 1)
+            self._names.append(name)
+            self._rows[name] = row
+
+        self._matrix[row, :n] = templates
+        self._matrix[row, n:] = 0.0
+        self._ntemplates[row] = n
+
+        K = self.max_templates
+        for slot in range(K):
+            if slot < n:
+                self.index.on_set(row * K + slot, self._matrix[row, slot])
+            else:
+                self.index.on_clear(row * K + slot)
+
+    def _delete_row(self, name):
+        """Remove `name` from the matrix by moving the last row into its slot."""
+        row = self._rows.pop(name)
+        last = self._count - 1
+        K = self.max_templates
+        if row != last:
+            moved = self._names[last]
+            self._matrix[row] = self._matrix[last]
+            self._ntemplates[row] = self._ntemplates[last]
+            self._names[row] = moved
+            self._rows[moved] = row
+            for slot in range(K):
+                self.index.on_move(last * K + slot, row * K + slot)
+        self._names.pop()
+        for slot in range(K):
+            self.index.on_remove(last * K + slot)
+
+    def _person_templates(self, name):
+        """(n x 512) float32 copy of the stored templates of `name`."""
+        row = self._rows[name]
+        return np.array(self._matrix[row, :self._ntemplates[row]])
+
+    def _aggregate(self, table):
+        """Per-person score from an (P x K) template score table (-inf = empty slot)."""
+        m = min(self.top_m, self.max_templates)
+        if self.template_scoring == "max" or m == 1:
+            return table.max(axis=1)
+
+        top = -np.partition(-table, m - 1, axis=1)[:, :m]
+        filled = np.isfinite(top)
+        return np.where(filled, top, 0.0).sum(axis=1) / np.maximum(filled.sum(axis=1), 1)
+
+    def _search(self, query_embedding, k):
+        """
+        (rows, scores) of the k best-matching people, via the index.
+
+        One matrix-vector product over all template rows (or the IVF
+        candidates), then a max / top-m mean over each person's K slots.
+
+        The exact path scores all N*K rows, empty slots (zero rows) included,
+        and masks those to -inf afterwards, so a person with fewer than K
+        templates never matches through an empty slot. With mostly
+        single-template people that is up to K times the multiply-adds
+        actually needed, but one contiguous product over the matrix is still
+        cheaper than gathering the filled rows (a copy of them per query).
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / np.linalg.norm(query)
+
+        K = self.max_templates
+        flat, valid = self._flat_templates()
+        rows, scores = self.index.score(flat, query)
+
+        if rows is None:
+            table = np.where(valid, scores, -np.inf).reshape(-1, K)
+            people = None
+        else:
+            keep = valid[rows]
+            rows, scores = rows[keep], scores[keep]
+            people, slot_owner = np.unique(rows // K, return_inverse=True)
+            table = np.full((len(people), K), -np.inf, dtype=np.float32)
+            table[slot_owner, rows % K] = scores
+
+        person_scores = self._aggregate(table)
+        top = _top_k(person_scores, k)
+        return (top if people is None else people[top]), person_scores[top]
+
+    @_locked_write
     def enroll(self, name, embeddings):
         """
         Enroll a person with their face embeddings.
@@ -67,32 +884,34 @@ class FaceDatabase:
         if len(embeddings) < 1:
             raise ValueError("At least 1 embedding required")
 
-        # Average all embeddings for robust representation
-        avg_embedding = np.mean(embeddings, axis=0)
-        avg_embedding = avg_embedding / np.linalg.norm(avg_embedding)
+        # Cluster into up to K templates (K=1: the plain average)
+        templates = select_templates(embeddings, self.max_templates)
 
         now = datetime.now().isoformat()
 
+        self._set_row(name, templates)
         self.db["people"][name] = {
-            "embedding": avg_embedding.tolist(),
             "num_samples": len(embeddings),
+            "num_templates": len(templates),
             "enrolled_at": now,
             "updated_at": now,
         }
 
-        self._save()
-        print(f"[FaceDB] Enrolled '{name}' with {len(embeddings)} samples")
+        self._append_log("put", name)
+        print(f"[FaceDB] Enrolled '{name}' with {len(embeddings)} samples ({len(templates)} templates)")
 
         return {
             "name": name,
             "num_samples": len(embeddings),
+            "num_templates": len(templates),
             "enrolled_at": now,
         }
 
+    @_locked_write
     def update(self, name, new_embeddings):
         """
         Update an existing person's embeddings by adding new samples.
-        Recomputes the average embedding.
+        Re-clusters the stored templates together with the new samples.
 
         Args:
             name: Person's name
@@ -102,23 +921,57 @@ class FaceDatabase:
             raise ValueError(f"Person '{name}' not found")
 
         person = self.db["people"][name]
-        old_embedding = np.array(person["embedding"])
+        old_templates = self._person_templates(name)
         old_count = person["num_samples"]
 
-        # Weighted average: keep old samples' contribution
-        all_embeddings = [old_embedding * old_count] + list(new_embeddings)
+        # Each stored template stands for its share of the old samples
+        pool = np.vstack([old_templates, _normalize_rows(new_embeddings)])
+        weights = [old_count / len(old_templates)] * len(old_templates) + [1.0] * len(new_embeddings)
+        templates = select_templates(pool, self.max_templates, weights=weights)
         total_count = old_count + len(new_embeddings)
 
-        avg_embedding = np.sum(all_embeddings, axis=0) / total_count
-        avg_embedding = avg_embedding / np.linalg.norm(avg_embedding)
-
-        person["embedding"] = avg_embedding.tolist()
+        self._set_row(name, templates)
         person["num_samples"] = total_count
+        person["num_templates"] = len(templates)
         person["updated_at"] = datetime.now().isoformat()
 
-        self._save()
-        print(f"[FaceDB] Updated '{name}': {total_count} total samples")
+        self._append_log("put", name)
+        print(f"[FaceDB] Updated '{name}': {total_count} total samples ({len(templates)} templates)")
+
+    @_locked_write
+    def enroll_many(self, people):
+        """
+        Enroll (or re-enroll) many people at once, e.g. a bulk import.
+        Writes one checkpoint instead of a change log record per person.
+
+        Args:
+            people: dict name -> list of numpy arrays (512-d each)
 
+        Returns:
+            int: number of people enrolled
+        """
+        if any(len(embeddings) < 1 for embeddings in people.values()):
+            raise ValueError("At least 1 embedding required per person")
+
+        now = datetime.now().isoformat()
+        self._reserve(self._count + len(people))
+        for name, embeddings in people.items():
+            templates = select_templates(embeddings, self.max_templates)
+            self._set_row(name, templates)
+            self.db["people"][name] = {
+                "num_samples": len(embeddings),
+                "num_templates": len(templates),
+                "enrolled_at": now,
+                "updated_at": now,
+            }
+
+        # Like clear(): the checkpoint is the change (other workers reload it)
+        self._log_seq += 1
+        self._checkpoint()
+        print(f"[FaceDB] Enrolled {len(people)} people in bulk")
+        return len(people)
+
+    @_locked
     def recognize(self, query_embedding, threshold=None):
         """
         Find the best matching person for a query embedding.
@@ -133,19 +986,14 @@ class FaceDatabase:
         if threshold is None:
             threshold = RECOGNITION_THRESHOLD
 
-        query_embedding = np.array(query_embedding)
-        query_embedding = query_embedding / np.linalg.norm(query_embedding)
-
         best_name = "unknown"
         best_score = 0.0
 
-        for name, person in self.db.get("people", {}).items():
-            stored_emb = np.array(person["embedding"])
-            similarity = float(np.dot(query_embedding, stored_emb))
-
-            if similarity > best_score:
-                best_score = similarity
-                best_name = name
+        if self._count > 0:
+            rows, scores = self._search(query_embedding, 1)
+            if len(rows) and scores[0] > best_score:
+                best_score = float(scores[0])
+                best_name = self._names[rows[0]]
 
         matched = best_score >= threshold
 
@@ -155,6 +1003,7 @@ class FaceDatabase:
             "matched": matched,
         }
 
+    @_locked
     def search_top_k(self, query_embedding, k=5):
         """
         Find top-k most similar people.
@@ -166,18 +1015,20 @@ class FaceDatabase:
         Returns:
             list of dicts: [{"name": str, "score": float}, ...]
         """
-        query_embedding = np.array(query_embedding)
-        query_embedding = query_embedding / np.linalg.norm(query_embedding)
+        if self._count == 0 or k <= 0:
+            return []
 
-        scores = []
-        for name, person in self.db.get("people", {}).items():
-            stored_emb = np.array(person["embedding"])
-            similarity = float(np.dot(query_embedding, stored_emb))
-            scores.append({"name": name, "score": round(similarity, 4)})
+        rows, scores = self._search(query_embedding, k)
+        return [
+            {"name": self._names[row], "score": round(float(score), 4)}
+            for row, score in zip(rows, scores)
+        ]
 
-        scores.sort(key=lambda x: x["score"], reverse=True)
-        return scores[:k]
+    def count(self):
+        """Number of enrolled people as of the last call (lock-free, for health checks)."""
+        return len(self._names)
 
+    @_locked
     def get_all_people(self):
         """
         Get list of all enrolled people.
@@ -190,11 +1041,13 @@ class FaceDatabase:
             people.append({
                 "name": name,
                 "num_samples": person["num_samples"],
+                "num_templates": person.get("num_templates", 1),
                 "enrolled_at": person["enrolled_at"],
                 "updated_at": person["updated_at"],
             })
         return people
 
+    @_locked_write
     def remove_person(self, name):
         """
         Remove a person from the database.
@@ -207,13 +1060,19 @@ class FaceDatabase:
         """
         if name in self.db["people"]:
             del self.db["people"][name]
-            self._save()
+            self._delete_row(name)
+            self._append_log("remove", name)
             print(f"[FaceDB] Removed '{name}'")
             return True
         return False
 
+    @_locked_write
     def clear(self):
         """Remove all enrolled people."""
         self.db = {"people": {}}
-        self._save()
+        self._names = []
+        self._rows = {}
+        self.index.reset()
+        self._log_seq += 1
+        self._checkpoint()
         print("[FaceDB] Cleared all entries")
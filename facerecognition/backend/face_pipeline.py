@@ -0,0 +1,123 @@
+"""
+FacePipeline - single-pass liveness and recognition for Pi frames.
+
+Before, every frame was handled twice: MiniFASNet ran on the padded Haar crop
+with a synthetic full-image bbox, and ArcFace ran InsightFace detection again
+on the same crop. Now the face is located once per frame (InsightFace
+detector: bbox + 5 landmarks, FaceRecognizer.locate) and both models reuse it:
+
+  - MiniFASNet sees what LIVENESS_INPUT selects. "crop" (default) is the
+    input LIVENESS_STRICT_THRESHOLD was tuned on: the whole padded crop as
+    the face box. "detected" gives it the detected bbox, around which it
+    crops 2.7x the face box; if the Pi sent a downscaled full frame the bbox
+    is mapped into that frame and the model sees its intended context
+    (background, screen or photo edges). "detected" is uncalibrated until
+    scripts/compare_liveness_input.py has been run on labelled crops.
+  - ArcFace embeds the already aligned 112x112 face, only for frames that can
+    validate (no second detector pass).
+
+All requests in a scheduler batch share one MiniFASNet call and one ArcFace
+call.
+"""
+
+import numpy as np
+from dataclasses import dataclass
+
+try:
+    from config import LIVENESS_INPUT
+    from liveness_checker import predict_spoof_batch
+except ImportError:
+    from .config import LIVENESS_INPUT
+    from .liveness_checker import predict_spoof_batch
+
+
+@dataclass
+class FrameRequest:
+    """One Pi frame to analyse."""
+    face_img: np.ndarray                # padded face crop (full resolution)
+    frame: np.ndarray = None            # optional downscaled full frame
+    crop_origin: tuple = (0, 0)         # crop's top-left corner in full-resolution frame pixels
+    frame_scale: float = 0.0            # frame width / full-resolution width
+    embed: bool = False                 # also compute the ArcFace embedding
+
+
+@dataclass
+class FrameAnalysis:
+    """Result of FacePipeline.analyze_batch() for one frame."""
+    spoof: object                       # uniface SpoofingResult (is_real, confidence)
+    embedding: np.ndarray = None        # (512,) unit-norm, if requested and a face was found
+    bbox: list = None                   # face bbox [x1, y1, x2, y2] in crop pixels, None if not found
+    full_frame: bool = False            # MiniFASNet ran on the full frame
+
+
+class FacePipeline:
+    """
+    Detect once, then run MiniFASNet and ArcFace on the shared result.
+
+    Usage:
+        pipeline = FacePipeline(recognizer)
+        analyses = pipeline.analyze_batch([FrameRequest(face_img, embed=True)])
+    """
+
+    def __init__(self, recognizer, liveness_input=None):
+        self.recognizer = recognizer
+        self.liveness_input = liveness_input or LIVENESS_INPUT
+        if self.liveness_input not in ("detected", "crop"):
+            raise ValueError(f"Unknown liveness input '{self.liveness_input}' (expected 'detected' or 'crop')")
+
+    @staticmethod
+    def _frame_bbox(request, bbox):
+        """Map a crop bbox into the downscaled full frame (None if it falls outside)."""
+        ox, oy = request.crop_origin
+        s = request.frame_scale
+        x1, y1, x2, y2 = ((bbox[0] + ox) * s, (bbox[1] + oy) * s, (bbox[2] + ox) * s, (bbox[3] + oy) * s)
+        h, w = request.frame.shape[:2]
+        if x2 - x1 < 2 or y2 - y1 < 2 or x1 < 0 or y1 < 0 or x2 > w or y2 > h:
+            return None
+        return [x1, y1, x2, y2]
+
+    def analyze_batch(self, requests):
+        """
+        Analyse several frames (typically one scheduler batch).
+
+        Args:
+            requests: list of FrameRequest
+
+        Returns:
+            list of FrameAnalysis, one per request
+        """
+        located = [self.recognizer.locate(r.face_img, crop=True) for r in requests]
+
+        # MiniFASNet input per frame: full frame + mapped bbox, or the crop
+        spoof_imgs, spoof_bboxes, full_frame = [], [], []
+        for request, loc in zip(requests, located):
+            bbox = loc[0] if loc is not None and self.liveness_input == "detected" else None
+            frame_bbox = None
+            if bbox is not None and request.frame is not None and request.frame_scale > 0:
+                frame_bbox = self._frame_bbox(request, bbox)
+            if frame_bbox is not None:
+                spoof_imgs.append(request.frame)
+                spoof_bboxes.append(frame_bbox)
+            else:
+                spoof_imgs.append(request.face_img)
+                spoof_bboxes.append(bbox)  # None = whole crop (no face found)
+            full_frame.append(frame_bbox is not None)
+        spoofs = predict_spoof_batch(spoof_imgs, spoof_bboxes)
+
+        # ArcFace on the aligned faces that were asked for
+        embed_idx = [i for i, (r, loc) in enumerate(zip(requests, located)) if r.embed and loc is not None]
+        embeddings = [None] * len(requests)
+        if embed_idx:
+            feats = self.recognizer.embed_aligned([located[i][1] for i in embed_idx])
+            for i, feat in zip(embed_idx, feats):
+                embeddings[i] = feat
+
+        return [
+            FrameAnalysis(
+                spoof=spoof,
+                embedding=embedding,
+                bbox=loc[0] if loc is not None else None,
+                full_frame=used_frame,
+            )
+            for spoof, embedding, loc, used_frame in zip(spoofs, embeddings, located, full_frame)
+        ]
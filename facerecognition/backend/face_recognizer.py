@@ -11,10 +11,17 @@ Model: buffalo_l (ArcFace-based)
 import cv2
 import numpy as np
 from insightface.app import FaceAnalysis
+from insightface.utils import face_align
 try:
-    from config import INSIGHTFACE_MODEL, GPU_DEVICE_ID, DETECTION_SIZE
+    from config import (
+        INSIGHTFACE_MODEL, INSIGHTFACE_MODULES, GPU_DEVICE_ID,
+        DETECTION_SIZE, CROP_DETECTION_SIZE, RECOGNITION_BATCH_SIZE,
+    )
 except ImportError:
-    from .config import INSIGHTFACE_MODEL, GPU_DEVICE_ID, DETECTION_SIZE
+    from .config import (
+        INSIGHTFACE_MODEL, INSIGHTFACE_MODULES, GPU_DEVICE_ID,
+        DETECTION_SIZE, CROP_DETECTION_SIZE, RECOGNITION_BATCH_SIZE,
+    )
 
 
 class FaceRecognizer:
@@ -36,12 +43,103 @@ class FaceRecognizer:
         self.app = FaceAnalysis(
             name=INSIGHTFACE_MODEL,
             providers=providers,
+            allowed_modules=INSIGHTFACE_MODULES,
         )
         self.app.prepare(ctx_id=GPU_DEVICE_ID, det_size=DETECTION_SIZE)
 
-        print("[FaceRecognizer] Ready")
+        # ArcFace model, called directly so aligned crops can be batched
+        self.rec_model = self.app.models["recognition"]
+        batch_dim = self.rec_model.input_shape[0]
+        self.batch_size = RECOGNITION_BATCH_SIZE if not isinstance(batch_dim, int) else batch_dim
 
-    def get_embedding(self, face_image):
+        print(f"[FaceRecognizer] Ready (recognition batch size: {self.batch_size})")
+
+    @staticmethod
+    def _upscale_small(face_image):
+        """Resize if very small (InsightFace needs reasonable size)."""
+        h, w = face_image.shape[:2]
+        if h < 112 or w < 112:
+            scale = max(112 / h, 112 / w)
+            face_image = cv2.resize(
+                face_image,
+                None,
+                fx=scale,
+                fy=scale,
+                interpolation=cv2.INTER_LINEAR,
+            )
+        return face_image
+
+    def _detect(self, image, crop=False):
+        """
+        Run only the detector: (bboxes (n x 5), 5-point landmarks (n x 5 x 2)).
+
+        With crop=True the detector runs at CROP_DETECTION_SIZE, retrying at the
+        full DETECTION_SIZE only if that finds nothing.
+        """
+        if crop:
+            bboxes, kpss = self.app.det_model.detect(
+                image, input_size=CROP_DETECTION_SIZE, max_num=0, metric="default"
+            )
+            if len(bboxes) > 0:
+                return bboxes, kpss
+        return self.app.det_model.detect(image, max_num=0, metric="default")
+
+    def _align(self, image, kps):
+        """Warp a face to the 112x112 ArcFace template using its 5 landmarks."""
+        return face_align.norm_crop(image, landmark=kps, image_size=self.rec_model.input_size[0])
+
+    def _embed_crops(self, crops):
+        """
+        Run ArcFace on aligned crops in batches of self.batch_size.
+
+        Returns:
+            float32 array (len(crops) x 512) of unit-norm embeddings
+        """
+        feats = [
+            self.rec_model.get_feat(crops[i:i + self.batch_size])
+            for i in range(0, len(crops), self.batch_size)
+        ]
+        feats = np.concatenate(feats, axis=0)
+        return feats / np.linalg.norm(feats, axis=1, keepdims=True)
+
+    def locate(self, face_image, crop=False):
+        """
+        Detect the largest face once and align it for ArcFace.
+
+        Args:
+            face_image: BGR image (numpy array)
+            crop:       face crop from the Pi (see get_embedding)
+
+        Returns:
+            (bbox, aligned): bbox [x1, y1, x2, y2] in face_image pixels and the
+            112x112 aligned face, or None if the image is empty / has no face
+        """
+        if face_image is None or face_image.size == 0:
+            return None
+
+        h = face_image.shape[0]
+        image = self._upscale_small(face_image)
+        bboxes, kpss = self._detect(image, crop=crop)
+        if len(bboxes) == 0 or kpss is None:
+            return None
+
+        # Use the largest face
+        areas = (bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])
+        best = int(np.argmax(areas))
+        scale = image.shape[0] / h
+        bbox = (bboxes[best, :4] / scale).tolist()
+        return bbox, self._align(image, kpss[best])
+
+    def embed_aligned(self, aligned):
+        """
+        ArcFace embeddings of faces already aligned by locate() (batched).
+
+        Returns:
+            float32 array (len(aligned) x 512) of unit-norm embeddings
+        """
+        return self._embed_crops(aligned)
+
+    def get_embedding(self, face_image, crop=False):
         """
         Extract face embedding from an image.
 
@@ -51,46 +149,52 @@ class FaceRecognizer:
 
         Args:
             face_image: BGR image (numpy array)
+            crop: True for a face crop (e.g. from the Pi's Haar detector):
+                  the detector only needs to find landmarks, so it runs at
+                  the small CROP_DETECTION_SIZE instead of DETECTION_SIZE
 
         Returns:
             numpy array of shape (512,) or None if no face found
         """
-        if face_image is None or face_image.size == 0:
-            return None
+        return self.get_embeddings_batch([face_image], crop=crop)[0]
 
-        # Resize if very small (InsightFace needs reasonable size)
-        h, w = face_image.shape[:2]
-        if h < 112 or w < 112:
-            scale = max(112 / h, 112 / w)
-            face_image = cv2.resize(
-                face_image,
-                None,
-                fx=scale,
-                fy=scale,
-                interpolation=cv2.INTER_LINEAR,
-            )
-
-        faces = self.app.get(face_image)
+    def get_embeddings_batch(self, images, crop=False):
+        """
+        Extract the embedding of the largest face in each image.
 
-        if len(faces) == 0:
-            return None
+        Detection runs per image, but all aligned 112x112 crops go through
+        ArcFace together (one ONNX call per RECOGNITION_BATCH_SIZE crops).
+        Only the detector and ArcFace run; the attribute/landmark models of
+        the model pack are skipped.
 
-        # Return embedding of the largest face
-        if len(faces) > 1:
-            faces = sorted(
-                faces,
-                key=lambda f: (f.bbox[2] - f.bbox[0]) * (f.bbox[3] - f.bbox[1]),
-                reverse=True,
-            )
+        Args:
+            images: list of BGR images (numpy arrays, may contain None)
+            crop:   images are face crops (see get_embedding)
 
-        embedding = faces[0].embedding
-        # Normalize to unit vector
-        embedding = embedding / np.linalg.norm(embedding)
-        return embedding
+        Returns:
+            list with one entry per image: numpy array of shape (512,),
+            or None if the image was empty or no face was found
+        """
+        crops = []
+        owners = []
+
+        for i, image in enumerate(images):
+            located = self.locate(image, crop=crop)
+            if located is None:
+                continue
+            crops.append(located[1])
+            owners.append(i)
+
+        results = [None] * len(images)
+        if crops:
+            for i, embedding in zip(owners, self._embed_crops(crops)):
+                results[i] = embedding
+        return results
 
     def get_all_embeddings(self, image):
         """
         Extract embeddings for ALL faces in an image.
+        All detected faces are embedded in a single batched ArcFace call.
 
         Args:
             image: BGR image (numpy array)
@@ -101,17 +205,16 @@ class FaceRecognizer:
         if image is None or image.size == 0:
             return []
 
-        faces = self.app.get(image)
-        results = []
+        bboxes, kpss = self._detect(image)
+        if len(bboxes) == 0 or kpss is None:
+            return []
 
-        for face in faces:
-            emb = face.embedding / np.linalg.norm(face.embedding)
-            results.append({
-                "embedding": emb,
-                "bbox": face.bbox.tolist(),
-            })
+        embeddings = self._embed_crops([self._align(image, kps) for kps in kpss])
 
-        return results
+        return [
+            {"embedding": emb, "bbox": bbox[:4].tolist()}
+            for emb, bbox in zip(embeddings, bboxes)
+        ]
 
     @staticmethod
     def compute_similarity(embedding1, embedding2):
@@ -0,0 +1,159 @@
+"""
+Identity smoother - per-track embedding and identity across WebSocket frames.
+
+Once a track is validated, every following frame used to run ArcFace and a
+database search, although a person lingering at the door sends nearly the
+same crop over and over. Each (connection, track) now carries:
+
+  - a 64-bit difference hash (dHash) of the crop that was last embedded;
+    ArcFace only re-runs when the new crop differs by more than
+    IDENTITY_HASH_DISTANCE bits, when IDENTITY_REFRESH_SECONDS have passed,
+    or for a new track ID (a new smoother)
+  - an exponentially smoothed, unit-norm embedding (IDENTITY_EMA_ALPHA), so
+    the identity is decided on several frames instead of the latest one; an
+    embedding less similar than IDENTITY_RESET_SIMILARITY to the running one
+    (someone else under the same track) restarts the average
+  - the match of the smoothed embedding, reused until the embedding or
+    FaceDatabase.current_version() changes
+
+The smoother is reset whenever the track loses validation, so the frame that
+completes a streak (and triggers the audit log) is always freshly embedded.
+"""
+
+import time
+import cv2
+import numpy as np
+
+try:
+    from config import (
+        IDENTITY_HASH_DISTANCE,
+        IDENTITY_REFRESH_SECONDS,
+        IDENTITY_EMA_ALPHA,
+        IDENTITY_RESET_SIMILARITY,
+    )
+except ImportError:
+    from .config import (
+        IDENTITY_HASH_DISTANCE,
+        IDENTITY_REFRESH_SECONDS,
+        IDENTITY_EMA_ALPHA,
+        IDENTITY_RESET_SIMILARITY,
+    )
+
+# Process-wide counters for /stats
+_stats = {"embedded": 0, "reused": 0, "resets": 0, "matched": 0, "match_reused": 0}
+
+
+def identity_stats():
+    """
+    Returns:
+        dict with validated frames whose fresh embedding was folded in
+        ("embedded") vs. answered from the smoothed embedding ("reused"),
+        EMA restarts, and database searches vs. reused matches
+    """
+    frames = _stats["embedded"] + _stats["reused"]
+    return {
+        **_stats,
+        "reuse_rate": round(_stats["reused"] / frames, 3) if frames else 0.0,
+    }
+
+
+def dhash(face_img):
+    """
+    64-bit difference hash of a BGR crop: 9x8 grayscale thumbnail, one bit
+    per horizontally adjacent pixel pair. Robust to small shifts, JPEG noise
+    and exposure changes; a different face or pose flips many bits.
+    """
+    gray = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY) if face_img.ndim == 3 else face_img
+    thumb = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (thumb[:, 1:] > thumb[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hash_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class IdentitySmoother:
+    """
+    Smoothed embedding and identity of one face track.
+
+    Usage:
+        smoother = IdentitySmoother()
+        embed = smoother.needs_embedding(face_img)       # ask the pipeline for ArcFace?
+        ...                                              # (frame validated)
+        if analysis.embedding is not None:
+            smoother.update(analysis.embedding, face_img)
+        else:
+            smoother.reuse()
+        version = face_db.current_version()           # synced in shared mode
+        match = smoother.cached_match(version)
+        if match is None:
+            match = face_db.recognize(smoother.embedding)
+            smoother.set_match(match, version)
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget the track's embedding (validation lost, Ghost Blink)."""
+        self.embedding = None       # smoothed (512,) unit-norm
+        self.frames = 0             # embeddings averaged since the last restart
+        self._hash = None           # dHash of the last embedded crop
+        self._embedded_at = 0.0
+        self._match = None
+        self._match_version = None
+
+    def needs_embedding(self, face_img):
+        """
+        Should ArcFace run on this crop? No side effects: the frame may still
+        be rejected by the liveness rules.
+
+        Args:
+            face_img: BGR face crop of the current frame
+        """
+        return (
+            self.embedding is None
+            or time.monotonic() - self._embedded_at > IDENTITY_REFRESH_SECONDS
+            or hash_distance(dhash(face_img), self._hash) > IDENTITY_HASH_DISTANCE
+        )
+
+    def update(self, embedding, face_img):
+        """
+        Fold a fresh ArcFace embedding into the running average.
+
+        Args:
+            embedding: (512,) embedding of `face_img`
+            face_img:  the crop it was computed on (its dHash gates the next embedding)
+        """
+        _stats["embedded"] += 1
+        embedding = np.asarray(embedding, dtype=np.float32)
+        if self.embedding is not None and float(np.dot(embedding, self.embedding)) < IDENTITY_RESET_SIMILARITY:
+            _stats["resets"] += 1
+            self.embedding = None
+        if self.embedding is None:
+            smoothed = embedding
+            self.frames = 0
+        else:
+            smoothed = IDENTITY_EMA_ALPHA * embedding + (1.0 - IDENTITY_EMA_ALPHA) * self.embedding
+        self.embedding = smoothed / (np.linalg.norm(smoothed) + 1e-10)
+        self.frames += 1
+        self._hash = dhash(face_img)
+        self._embedded_at = time.monotonic()
+        self._match = None
+
+    def reuse(self):
+        """A validated frame answered from the smoothed embedding (no fresh one)."""
+        _stats["reused"] += 1
+
+    def cached_match(self, version):
+        """Match of the current smoothed embedding at this database version, or None."""
+        if self._match is None or self._match_version != version:
+            return None
+        _stats["match_reused"] += 1
+        return dict(self._match)
+
+    def set_match(self, match, version):
+        _stats["matched"] += 1
+        self._match = dict(match)
+        self._match_version = version
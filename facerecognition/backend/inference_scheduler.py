@@ -0,0 +1,197 @@
+"""
+InferenceScheduler - micro-batches model inference across WebSocket connections.
+
+Every /ws handler submits its frame and awaits an asyncio future. A single
+worker thread collects requests from all connections for up to
+INFERENCE_MAX_WAIT_MS (or until INFERENCE_MAX_BATCH_SIZE requests are queued),
+runs the single-pass FacePipeline (detector, MiniFASNet, ArcFace) once per
+batch and resolves the futures back on the event loop. Model code never runs
+on the event loop itself.
+
+Back-pressure: at most INFERENCE_MAX_QUEUE requests wait for the worker.
+Beyond that, analyze() raises SchedulerSaturated straight away (the WebSocket
+handler answers the frame with "busy") instead of letting memory and latency
+grow while the GPU falls behind. If a batch fails, its requests are retried
+one by one so a single bad crop only fails its own frame.
+
+Usage:
+    scheduler = InferenceScheduler(recognizer)
+    analysis = await scheduler.analyze(FrameRequest(face_img, embed=True))
+"""
+
+import time
+import queue
+import asyncio
+import threading
+
+try:
+    from config import INFERENCE_MAX_BATCH_SIZE, INFERENCE_MAX_WAIT_MS, INFERENCE_MAX_QUEUE
+    from face_pipeline import FacePipeline
+except ImportError:
+    from .config import INFERENCE_MAX_BATCH_SIZE, INFERENCE_MAX_WAIT_MS, INFERENCE_MAX_QUEUE
+    from .face_pipeline import FacePipeline
+
+
+ANALYZE = "analyze"
+
+
+class SchedulerSaturated(Exception):
+    """Raised when INFERENCE_MAX_QUEUE requests are already waiting."""
+
+
+def _resolve(future, result):
+    if not future.done():  # the connection may have gone away
+        future.set_result(result)
+
+
+def _fail(future, error):
+    if not future.done():
+        future.set_exception(error)
+
+
+class InferenceScheduler:
+    """
+    Central inference queue shared by all WebSocket connections.
+    One worker thread; ONNX Runtime releases the GIL while a batch runs.
+    """
+
+    def __init__(self, recognizer, max_batch_size=None, max_wait_ms=None, max_queue=None):
+        self.recognizer = recognizer
+        self.max_batch_size = max_batch_size or INFERENCE_MAX_BATCH_SIZE
+        self.max_wait_ms = INFERENCE_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms
+        self.max_queue = max_queue or INFERENCE_MAX_QUEUE
+
+        self.pipeline = FacePipeline(recognizer)
+
+        self._runners = {
+            ANALYZE: self.pipeline.analyze_batch,
+        }
+        self._queue = queue.Queue(maxsize=self.max_queue)
+
+        # Metrics
+        self.requests = 0
+        self.rejected = 0
+        self.failed = 0
+        self.batches = 0
+        self.batched_items = 0
+        self.max_queue_depth = 0
+        self.last_batch_ms = 0.0
+
+        self._thread = threading.Thread(target=self._worker, name="inference-scheduler", daemon=True)
+        self._thread.start()
+        print(f"[InferenceScheduler] Started (max batch {self.max_batch_size}, max wait {self.max_wait_ms} ms, "
+              f"max queue {self.max_queue})")
+
+    # ── Event-loop side ─────────────────────────────────────────
+
+    async def _submit(self, kind, payload):
+        """
+        Raises:
+            SchedulerSaturated: if max_queue requests are already waiting.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        try:
+            self._queue.put_nowait((kind, payload, loop, future))
+        except queue.Full:
+            self.rejected += 1
+            raise SchedulerSaturated(f"{self.max_queue} requests queued") from None
+
+        self.requests += 1
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return await future
+
+    async def analyze(self, request):
+        """FrameAnalysis (spoof result, optional embedding) for a FrameRequest (batched)."""
+        return await self._submit(ANALYZE, request)
+
+    def stats(self):
+        """Queue depth and batching metrics."""
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "max_queue": self.max_queue,
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "batches": self.batches,
+            "avg_batch_size": round(self.batched_items / self.batches, 2) if self.batches else 0.0,
+            "last_batch_ms": round(self.last_batch_ms, 2),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+        }
+
+    def stop(self):
+        """Stop the worker thread after the requests already queued."""
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    # ── Worker thread ───────────────────────────────────────────
+
+    def _collect(self):
+        """
+        Block for the first request, then keep gathering until the batch is
+        full or max_wait_ms has passed since the first one arrived.
+        Returns (batch, stop_requested).
+        """
+        first = self._queue.get()
+        if first is None:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self, batch):
+        """Run each model once over its share of the batch and resolve the futures."""
+        for kind, runner in self._runners.items():
+            items = [item for item in batch if item[0] == kind]
+            if not items:
+                continue
+
+            try:
+                results = runner([payload for _, payload, _, _ in items])
+            except Exception as e:
+                print(f"[InferenceScheduler] {kind} batch of {len(items)} failed ({e}), retrying one by one")
+                self._run_each(runner, items)
+                continue
+
+            for (_, _, loop, future), result in zip(items, results):
+                loop.call_soon_threadsafe(_resolve, future, result)
+
+    def _run_each(self, runner, items):
+        """Fallback after a failed batch: only the requests that fail on their own get the error."""
+        for _, payload, loop, future in items:
+            try:
+                result = runner([payload])[0]
+            except Exception as e:
+                self.failed += 1
+                loop.call_soon_threadsafe(_fail, future, e)
+            else:
+                loop.call_soon_threadsafe(_resolve, future, result)
+
+    def _worker(self):
+        stop = False
+        while not stop:
+            batch, stop = self._collect()
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            self._run(batch)
+            self.last_batch_ms = (time.perf_counter() - start) * 1000
+            self.batches += 1
+            self.batched_items += len(batch)
+
+        print("[InferenceScheduler] Stopped")
@@ -8,9 +8,17 @@ Encapsulates all 5 security rules from test_recognition_only.py:
   4. Ghost Blink Fix         - frame counter resets when no face is present
   5. Anti-Tailgating Lockdown - more than 1 face in frame → full lockdown
 
-One LivenessChecker instance per WebSocket connection.
+Rules 5, 1 and 3 are blocking rules evaluated per frame in the order of
+LIVENESS_RULE_ORDER; the first rule that blocks ends the chain, so with the
+cheap rules first a lockdown or too-close frame never reaches MiniFASNet.
+Each rule is timed; rule_stats() aggregates over all checkers.
+
+One LivenessChecker instance per WebSocket connection (and face track); the
+consecutive-frame counter itself lives in a liveness state store, keyed by
+session and track, so it can outlive the connection (liveness_state.py).
 """
 
+import time
 import numpy as np
 from dataclasses import dataclass
 from uniface.spoofing import MiniFASNet
@@ -20,13 +28,23 @@ try:
         LIVENESS_STRICT_THRESHOLD,
         PROXIMITY_RATIO_LIMIT,
         TEMPORAL_CONSISTENCY_FRAMES,
+        LIVENESS_RULE_ORDER,
     )
+    from liveness_state import MemoryStateStore
 except ImportError:
     from .config import (
         LIVENESS_STRICT_THRESHOLD,
         PROXIMITY_RATIO_LIMIT,
         TEMPORAL_CONSISTENCY_FRAMES,
+        LIVENESS_RULE_ORDER,
     )
+    from .liveness_state import MemoryStateStore
+
+# Blocking rule names (LIVENESS_RULE_ORDER)
+RULE_LOCKDOWN = "lockdown"      # RULE 5
+RULE_PROXIMITY = "proximity"    # RULE 1
+RULE_LIVENESS = "liveness"      # RULE 3 (MiniFASNet)
+_MODEL_RULES = {RULE_LIVENESS}
 
 
 @dataclass
@@ -39,6 +57,56 @@ class LivenessResult:
     liveness_conf: float
     consecutive_frames: int
     label: str                   # Human-readable status for the Pi / display
+    blocked_by: str = None       # Rule that rejected the frame (rules after it did not run)
+    rule_ms: dict = None         # Time spent per rule that ran, in ms
+
+
+@dataclass
+class _Frame:
+    """Inputs and findings of one frame while the rule chain runs."""
+    face_img: np.ndarray
+    face_height_ratio: float
+    face_count: int
+    spoof_result: object = None
+    is_real: bool = False
+    liveness_conf: float = 0.0
+    too_close: bool = False
+    lockdown: bool = False
+
+
+# Rule metrics over all checkers (updated on the event loop only)
+_rule_stats = {}
+_frames_checked = 0
+_inference_skipped = 0
+
+
+def _record_rule(name, ms, blocked):
+    stats = _rule_stats.setdefault(name, {"runs": 0, "blocked": 0, "total_ms": 0.0})
+    stats["runs"] += 1
+    stats["blocked"] += int(blocked)
+    stats["total_ms"] += ms
+
+
+def rule_stats():
+    """
+    Rule pipeline metrics since startup.
+
+    Returns:
+        dict with frames checked, MiniFASNet runs skipped by an earlier
+        rule, and per rule: runs, blocked and avg_ms
+    """
+    return {
+        "frames": _frames_checked,
+        "inference_skipped": _inference_skipped,
+        "rules": {
+            name: {
+                "runs": stats["runs"],
+                "blocked": stats["blocked"],
+                "avg_ms": round(stats["total_ms"] / stats["runs"], 3),
+            }
+            for name, stats in _rule_stats.items()
+        },
+    }
 
 
 # Module-level shared MiniFASNet instance (heavy to load, reuse across connections)
@@ -53,6 +121,43 @@ def _get_spoofer():
     return _spoofer
 
 
+def full_image_bbox(face_img):
+    """
+    Synthetic bbox that covers the entire cropped image.
+    MiniFASNet.predict(frame, bbox) crops internally — passing the full
+    cropped face as the "frame" with a full-image bbox is equivalent.
+    """
+    h, w = face_img.shape[:2]
+    return [0, 0, w, h]
+
+
+def predict_spoof_batch(face_imgs, bboxes=None):
+    """
+    Run MiniFASNet on several faces in one ONNX call.
+
+    Falls back to one call per face if the model has a fixed batch size of 1.
+
+    Args:
+        face_imgs: list of BGR numpy arrays (cropped faces or full frames)
+        bboxes:    face bbox [x1, y1, x2, y2] per image; None (or a None
+                   entry) uses full_image_bbox() for a cropped face
+
+    Returns:
+        list of SpoofingResult (is_real, confidence), one per face
+    """
+    spoofer = _get_spoofer()
+    if bboxes is None:
+        bboxes = [None] * len(face_imgs)
+    bboxes = [full_image_bbox(img) if bbox is None else bbox for img, bbox in zip(face_imgs, bboxes)]
+
+    if spoofer.session.get_inputs()[0].shape[0] == 1:
+        return [spoofer.predict(img, bbox) for img, bbox in zip(face_imgs, bboxes)]
+
+    batch = np.concatenate([spoofer.preprocess(img, bbox) for img, bbox in zip(face_imgs, bboxes)])
+    outputs = spoofer.session.run([spoofer.output_name], {spoofer.input_name: batch})[0]
+    return [spoofer.postprocess(outputs[i:i + 1]) for i in range(len(face_imgs))]
+
+
 class LivenessChecker:
     """
     Stateful per-connection liveness and security checker.
@@ -65,11 +170,53 @@ class LivenessChecker:
 
         # When a face is detected:
         result = checker.check(face_img, face_height_ratio, face_count)
+
+        # With MiniFASNet run elsewhere (batched), ask first whether it is needed:
+        spoof = predict(...) if checker.needs_inference(ratio, count) else None
+        result = checker.check(face_img, ratio, count, spoof_result=spoof)
     """
 
-    def __init__(self):
+    _RULES = {
+        RULE_LOCKDOWN: "_rule_lockdown",
+        RULE_PROXIMITY: "_rule_proximity",
+        RULE_LIVENESS: "_rule_liveness",
+    }
+
+    def __init__(self, rule_order=None, store=None, session=None, track_id=None):
+        """
+        Args:
+            rule_order: blocking rule names (default LIVENESS_RULE_ORDER)
+            store:      liveness state store holding the consecutive-frame
+                        counter; a private in-memory one (no expiry) if None
+            session:    session id of the Pi connection (store key)
+            track_id:   Pi-side face track (store key), None = untracked
+        """
         self.spoofer = _get_spoofer()
-        self.consecutive_real_frames = 0
+        self.store = store or MemoryStateStore(ttl=float("inf"))
+        self.session = session
+        self.track_id = track_id
+
+        self.rules = list(rule_order or LIVENESS_RULE_ORDER)
+        unknown = [name for name in self.rules if name not in self._RULES]
+        if unknown:
+            raise ValueError(f"Unknown liveness rules {unknown}, expected {list(self._RULES)}")
+        if RULE_LIVENESS not in self.rules:
+            raise ValueError(f"Liveness rule order must include '{RULE_LIVENESS}'")
+
+    @property
+    def consecutive_real_frames(self):
+        return self.store.get(self.session, self.track_id)
+
+    @consecutive_real_frames.setter
+    def consecutive_real_frames(self, frames):
+        self.store.set(self.session, self.track_id, frames)
+
+    def can_validate_next(self):
+        """
+        True if one more real frame completes RULE 2, so the caller can
+        compute the ArcFace embedding in the same pass as MiniFASNet.
+        """
+        return self.consecutive_real_frames + 1 >= TEMPORAL_CONSISTENCY_FRAMES
 
     def reset(self):
         """
@@ -80,76 +227,122 @@ class LivenessChecker:
         """
         self.consecutive_real_frames = 0
 
+    def reset_session(self):
+        """
+        SECURITY RULE 4 for a whole session: wipes the counters of every track
+        of this checker's session, including tracks from before a reconnect.
+        """
+        self.store.reset_session(self.session)
+
+    # ── Blocking rules (True = reject the frame) ─────────────────────────────
+
+    def _rule_lockdown(self, frame):
+        """RULE 5 – Anti-Tailgating Lockdown: more than one face in the frame."""
+        frame.lockdown = frame.face_count > 1
+        return frame.lockdown
+
+    def _rule_proximity(self, frame):
+        """RULE 1 – Proximity Block: face too close to the camera."""
+        frame.too_close = frame.face_height_ratio > PROXIMITY_RATIO_LIMIT
+        return frame.too_close
+
+    def _rule_liveness(self, frame):
+        """
+        RULE 3 – MiniFASNet liveness, with the strict override: even if the
+        model says "real", reject if its confidence is below the threshold.
+        """
+        if frame.spoof_result is None:
+            frame.spoof_result = self.spoofer.predict(frame.face_img, full_image_bbox(frame.face_img))
+        frame.liveness_conf = float(frame.spoof_result.confidence)
+        frame.is_real = frame.spoof_result.is_real and frame.liveness_conf >= LIVENESS_STRICT_THRESHOLD
+        return not frame.is_real
+
+    def needs_inference(self, face_height_ratio, face_count):
+        """
+        False if a model-free rule ordered before MiniFASNet already rejects
+        this frame, so the caller can skip the (batched) inference.
+        """
+        frame = _Frame(None, face_height_ratio, face_count)
+        for name in self.rules:
+            if name in _MODEL_RULES:
+                return True
+            if getattr(self, self._RULES[name])(frame):
+                return False
+        return True
+
     def check(
         self,
         face_img: np.ndarray,
         face_height_ratio: float,
         face_count: int,
+        spoof_result=None,
     ) -> LivenessResult:
         """
-        Run all 5 security rules against the current face image.
+        Run the security rules against the current face image.
+
+        The blocking rules run in self.rules order and stop at the first one
+        that rejects the frame; the flags of rules after it stay False.
 
         Args:
             face_img:          Cropped face BGR numpy array.
             face_height_ratio: face_height / frame_height (computed by Pi).
             face_count:        Total faces detected by Pi this frame.
+            spoof_result:      MiniFASNet result computed elsewhere (e.g. by the
+                               batched InferenceScheduler); run here if None
+                               and the liveness rule is reached.
 
         Returns:
             LivenessResult dataclass.
         """
-        # ── RULE 5: Anti-Tailgating Lockdown ─────────────────────────────────
-        is_multi_face_lockdown = face_count > 1
-
-        # ── RULE 1: Proximity Block ───────────────────────────────────────────
-        too_close = face_height_ratio > PROXIMITY_RATIO_LIMIT
+        global _frames_checked, _inference_skipped
 
-        # ── RULE 3: MiniFASNet Liveness Detection ─────────────────────────────
-        # Build a synthetic bbox that covers the entire cropped image.
-        # MiniFASNet.predict(frame, bbox) crops internally — passing the full
-        # cropped face as the "frame" with a full-image bbox is equivalent.
-        h, w = face_img.shape[:2]
-        synthetic_bbox = [0, 0, w, h]
+        frame = _Frame(face_img, face_height_ratio, face_count, spoof_result)
+        blocked_by = None
+        rule_ms = {}
+        for name in self.rules:
+            start = time.perf_counter()
+            blocked = getattr(self, self._RULES[name])(frame)
+            rule_ms[name] = round((time.perf_counter() - start) * 1000, 3)
+            _record_rule(name, rule_ms[name], blocked)
+            if blocked:
+                blocked_by = name
+                break
 
-        spoof_result = self.spoofer.predict(face_img, synthetic_bbox)
-        is_real = spoof_result.is_real
-        liveness_conf = float(spoof_result.confidence)
+        _frames_checked += 1
+        if RULE_LIVENESS not in rule_ms:
+            _inference_skipped += 1
 
-        # ── RULE 3 (strict override) ──────────────────────────────────────────
-        # Even if MiniFASNet says "real", reject if confidence is below threshold.
-        if is_real and liveness_conf < LIVENESS_STRICT_THRESHOLD:
-            is_real = False
-
-        # ── Combined failure reset ────────────────────────────────────────────
-        # Any blocking condition resets the temporal counter.
-        if too_close or not is_real or is_multi_face_lockdown:
-            self.consecutive_real_frames = 0
-            is_real = False
-
-        # ── RULE 2: Temporal Consistency ─────────────────────────────────────
-        if is_real and not is_multi_face_lockdown:
-            self.consecutive_real_frames += 1
-        # (counter already reset in the block above for failure cases)
+        # ── Combined failure reset / RULE 2: Temporal Consistency ────────────
+        # Any blocking rule resets the temporal counter.
+        if blocked_by is None:
+            consecutive = self.consecutive_real_frames + 1
+        else:
+            consecutive = 0
+            frame.is_real = False
+        self.consecutive_real_frames = consecutive
 
-        is_fully_validated = self.consecutive_real_frames >= TEMPORAL_CONSISTENCY_FRAMES
+        is_fully_validated = consecutive >= TEMPORAL_CONSISTENCY_FRAMES
 
         # ── Human-readable label ──────────────────────────────────────────────
-        if is_multi_face_lockdown:
+        if blocked_by == RULE_LOCKDOWN:
             label = "ANTI-TAILGATE: ONE PERSON ONLY"
-        elif too_close:
+        elif blocked_by == RULE_PROXIMITY:
             label = "MOVE FURTHER AWAY"
+        elif blocked_by == RULE_LIVENESS:
+            label = f"SPOOF/FAKE ({frame.liveness_conf:.2f})"
         elif is_fully_validated:
-            label = f"REAL ({liveness_conf:.2f})"
-        elif is_real:
-            label = f"HOLD STILL... ({self.consecutive_real_frames}/{TEMPORAL_CONSISTENCY_FRAMES})"
+            label = f"REAL ({frame.liveness_conf:.2f})"
         else:
-            label = f"SPOOF/FAKE ({liveness_conf:.2f})"
+            label = f"HOLD STILL... ({consecutive}/{TEMPORAL_CONSISTENCY_FRAMES})"
 
         return LivenessResult(
-            is_real=is_real,
+            is_real=frame.is_real,
             is_fully_validated=is_fully_validated,
-            is_multi_face_lockdown=is_multi_face_lockdown,
-            too_close=too_close,
-            liveness_conf=liveness_conf,
-            consecutive_frames=self.consecutive_real_frames,
+            is_multi_face_lockdown=frame.lockdown,
+            too_close=frame.too_close,
+            liveness_conf=frame.liveness_conf,
+            consecutive_frames=consecutive,
             label=label,
+            blocked_by=blocked_by,
+            rule_ms=rule_ms,
         )
@@ -0,0 +1,164 @@
+"""
+Liveness state store - temporal-consistency counters keyed by session and track.
+
+The consecutive-real-frame counter used to live on the LivenessChecker of a
+WebSocket handler, so every reconnect of the Pi dropped the streak. The Pi
+now names its session (ws://.../ws?session=<id>) and the counters live here,
+keyed by (session, track_id), so a short reconnect resumes the streak.
+
+A counter that has not been updated for LIVENESS_STATE_TTL seconds counts as
+0 and is evicted: a long gap is treated like the person leaving. A no_face
+message still wipes every counter of its session (Ghost Blink). Frames without
+a track ID (track_id None, e.g. /ws clients without a face tracker) share one
+counter per session, separate from every real track including track 0.
+
+Trust: the session id is a bearer name chosen by the client, not an
+authenticated identity. Anyone who can reach /ws and knows a session id can
+resume its streaks or wipe them, so the backend is assumed to sit on the
+Pi's trusted network; the Pi uses a random 128-bit id that is never shown.
+Ids must match SESSION_ID_PATTERN (see parse_session).
+
+Two backends:
+  - MemoryStateStore: a dict in this process (single worker)
+  - SQLiteStateStore: a small SQLite file (WAL) shared by all worker processes
+    (`uvicorn api:app --workers N`)
+"""
+
+import os
+import re
+import time
+import sqlite3
+
+try:
+    from config import LIVENESS_STATE_STORE, LIVENESS_STATE_TTL, LIVENESS_STATE_DB_PATH
+except ImportError:
+    from .config import LIVENESS_STATE_STORE, LIVENESS_STATE_TTL, LIVENESS_STATE_DB_PATH
+
+# Session ids the client may choose: short, URL and log safe (uuid4().hex fits)
+SESSION_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{8,64}")
+
+# SQLite key of untracked frames (track_id None); Pi track IDs are >= 0
+_UNTRACKED = -1
+
+
+def parse_session(value):
+    """
+    Validate a client-supplied session id.
+
+    Args:
+        value: ?session=<id> query parameter, or None
+
+    Returns:
+        the id, or None if missing or not matching SESSION_ID_PATTERN
+    """
+    if value is None or not SESSION_ID_PATTERN.fullmatch(value):
+        return None
+    return value
+
+
+class MemoryStateStore:
+    """In-process counters with TTL eviction."""
+
+    def __init__(self, ttl=None):
+        self.ttl = LIVENESS_STATE_TTL if ttl is None else ttl
+        self._sessions = {}         # session -> {track_id or None: (frames, updated)}
+        self._next_sweep = 0.0
+
+    def get(self, session, track_id):
+        """Consecutive real frames of a track (0 if unknown or expired)."""
+        frames, updated = self._sessions.get(session, {}).get(track_id, (0, 0.0))
+        return frames if time.time() - updated <= self.ttl else 0
+
+    def set(self, session, track_id, frames):
+        now = time.time()
+        self._sessions.setdefault(session, {})[track_id] = (frames, now)
+        if now >= self._next_sweep:
+            self._sweep(now)
+
+    def reset_session(self, session):
+        """Ghost Blink: forget every track of a session."""
+        self._sessions.pop(session, None)
+
+    def _sweep(self, now):
+        """Evict expired counters (at most once per TTL)."""
+        self._next_sweep = now + self.ttl
+        for session in list(self._sessions):
+            tracks = self._sessions[session]
+            for track_id in [t for t, (_, updated) in tracks.items() if now - updated > self.ttl]:
+                del tracks[track_id]
+            if not tracks:
+                del self._sessions[session]
+
+    def stats(self):
+        self._sweep(time.time())
+        return {
+            "backend": "memory",
+            "sessions": len(self._sessions),
+            "tracks": sum(len(tracks) for tracks in self._sessions.values()),
+        }
+
+
+class SQLiteStateStore:
+    """
+    Counters in a SQLite file, visible to every worker process.
+    Each call is a single short autocommit statement.
+    """
+
+    def __init__(self, db_path=None, ttl=None):
+        self.ttl = LIVENESS_STATE_TTL if ttl is None else ttl
+        self.db_path = db_path or LIVENESS_STATE_DB_PATH
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+
+        self._conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # losing a streak on power loss is fine
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS liveness_state ("
+            " session TEXT NOT NULL, track_id INTEGER NOT NULL,"
+            " frames INTEGER NOT NULL, updated REAL NOT NULL,"
+            " PRIMARY KEY (session, track_id))"
+        )
+        self._next_sweep = 0.0
+        print(f"[LivenessState] SQLite store: {self.db_path} (TTL {self.ttl}s)")
+
+    def get(self, session, track_id):
+        """Consecutive real frames of a track (0 if unknown or expired)."""
+        row = self._conn.execute(
+            "SELECT frames FROM liveness_state WHERE session = ? AND track_id = ? AND updated >= ?",
+            (session, _UNTRACKED if track_id is None else track_id, time.time() - self.ttl),
+        ).fetchone()
+        return row[0] if row else 0
+
+    def set(self, session, track_id, frames):
+        now = time.time()
+        self._conn.execute(
+            "INSERT INTO liveness_state (session, track_id, frames, updated) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (session, track_id) DO UPDATE SET frames = excluded.frames, updated = excluded.updated",
+            (session, _UNTRACKED if track_id is None else track_id, frames, now),
+        )
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.ttl
+            self._conn.execute("DELETE FROM liveness_state WHERE updated < ?", (now - self.ttl,))
+
+    def reset_session(self, session):
+        """Ghost Blink: forget every track of a session (in all workers)."""
+        self._conn.execute("DELETE FROM liveness_state WHERE session = ?", (session,))
+
+    def stats(self):
+        sessions, tracks = self._conn.execute(
+            "SELECT COUNT(DISTINCT session), COUNT(*) FROM liveness_state WHERE updated >= ?",
+            (time.time() - self.ttl,),
+        ).fetchone()
+        return {"backend": "sqlite", "sessions": sessions, "tracks": tracks}
+
+
+def create_state_store(kind=None):
+    """
+    Build the store selected by LIVENESS_STATE_STORE ("memory" or "sqlite").
+    """
+    kind = kind or LIVENESS_STATE_STORE
+    if kind == "memory":
+        return MemoryStateStore()
+    if kind == "sqlite":
+        return SQLiteStateStore()
+    raise ValueError(f"Unknown liveness state store '{kind}' (expected 'memory' or 'sqlite')")
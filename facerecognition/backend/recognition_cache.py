@@ -0,0 +1,138 @@
+"""
+Recognition cache - results of repeated /recognize uploads.
+
+Kiosk clients and scripts/test_recognition.py often POST the same JPEG bytes
+again (retries, duplicate sends), and every call re-ran decode, InsightFace
+and the DB search. Entries are keyed by a BLAKE2 hash of the upload:
+
+  - the embedding (or "no face") is kept for RECOGNIZE_CACHE_TTL seconds;
+    the model does not change while the server runs
+  - the match is tagged with FaceDatabase.version and only reused while the
+    database is unchanged; after an enroll / remove it is recomputed from the
+    cached embedding (one DB search, no decode or inference)
+
+At most RECOGNIZE_CACHE_SIZE entries are kept, least recently used first out.
+"""
+
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    from config import RECOGNIZE_CACHE_SIZE, RECOGNIZE_CACHE_TTL
+except ImportError:
+    from .config import RECOGNIZE_CACHE_SIZE, RECOGNIZE_CACHE_TTL
+
+
+class CacheEntry:
+    """Cached result of one upload."""
+
+    __slots__ = ("embedding", "created", "match", "version")
+
+    def __init__(self, embedding):
+        self.embedding = embedding      # (512,) or None if no face was detected
+        self.created = time.monotonic()
+        self.match = None               # face_db.recognize() result ...
+        self.version = None             # ... for this FaceDatabase.version
+
+
+class RecognitionCache:
+    """
+    Bounded LRU cache for /recognize (thread-safe, used from the worker pool).
+
+    Usage:
+        key = cache.key(contents)
+        entry = cache.get(key)
+        if entry is None:
+            entry = cache.put(key, recognizer.get_embedding(img))
+        match = cache.match(entry, version)
+        if match is None:
+            match = face_db.recognize(entry.embedding)
+            cache.set_match(entry, match, version)
+    """
+
+    def __init__(self, max_entries=None, ttl=None):
+        self.max_entries = RECOGNIZE_CACHE_SIZE if max_entries is None else max_entries
+        self.ttl = RECOGNIZE_CACHE_TTL if ttl is None else ttl
+        self._entries = OrderedDict()   # key -> CacheEntry, least recently used first
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0           # embedding reused (no decode / inference)
+        self.misses = 0
+        self.match_hits = 0     # match reused too (no DB search)
+        self.rematches = 0      # database changed since the match was cached
+        self.expired = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @staticmethod
+    def key(contents):
+        """Content hash of an upload."""
+        return hashlib.blake2b(contents, digest_size=16).digest()
+
+    def get(self, key):
+        """
+        Returns:
+            the CacheEntry for `key`, or None (miss or expired)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.created > self.ttl:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, embedding):
+        """Cache the embedding of an upload; returns its CacheEntry."""
+        entry = CacheEntry(embedding)
+        if not self.enabled:
+            return entry
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def match(self, entry, version):
+        """Cached match of an entry if it was computed at this database version, else None."""
+        with self._lock:
+            if entry.match is None:
+                return None
+            if entry.version != version:
+                self.rematches += 1
+                return None
+            self.match_hits += 1
+            return dict(entry.match)
+
+    def set_match(self, entry, match, version):
+        with self._lock:
+            entry.match = dict(match)
+            entry.version = version
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "match_hits": self.match_hits,
+                "rematches": self.rematches,
+                "expired": self.expired,
+                "evictions": self.evictions,
+            }
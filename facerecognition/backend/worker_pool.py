@@ -0,0 +1,80 @@
+"""
+WorkerPool - bounded thread pool for blocking work in the API.
+
+FastAPI handlers are `async def`, so image decoding, InsightFace and database
+calls made directly inside them run on the event loop and stall every other
+socket (and the health check) for their whole duration. Handlers hand that
+work to this pool instead and await the result.
+
+Back-pressure: at most WORKER_POOL_MAX_PENDING calls may be running or queued.
+Beyond that, run() raises PoolSaturated straight away instead of letting the
+queue (and every client's latency) grow without bound; the API answers REST
+calls with 503 + Retry-After and skips the WebSocket frame.
+
+Usage:
+    pool = WorkerPool()
+    img = await pool.run(decode_upload_file, contents)
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from config import WORKER_POOL_SIZE, WORKER_POOL_MAX_PENDING
+except ImportError:
+    from .config import WORKER_POOL_SIZE, WORKER_POOL_MAX_PENDING
+
+
+class PoolSaturated(Exception):
+    """Raised when the pool already holds WORKER_POOL_MAX_PENDING calls."""
+
+
+class WorkerPool:
+    """
+    ThreadPoolExecutor with a cap on outstanding calls.
+    OpenCV, NumPy and ONNX Runtime release the GIL, so threads run in parallel.
+    """
+
+    def __init__(self, max_workers=None, max_pending=None):
+        self.max_workers = max_workers or WORKER_POOL_SIZE
+        self.max_pending = max_pending or WORKER_POOL_MAX_PENDING
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="api-worker")
+
+        # Only touched from the event loop thread, so no lock needed
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        print(f"[WorkerPool] {self.max_workers} threads, max {self.max_pending} pending calls")
+
+    async def run(self, fn, *args):
+        """
+        Run fn(*args) on a worker thread and return its result.
+
+        Raises:
+            PoolSaturated: if max_pending calls are already outstanding.
+        """
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PoolSaturated(f"{self.pending} calls pending")
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def stats(self):
+        """Pool size, outstanding calls and rejection counters."""
+        return {
+            "workers": self.max_workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        """Wait for running calls and stop the threads."""
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,95 @@
+"""
+Binary WebSocket frame protocol between the Raspberry Pi and the backend.
+
+Instead of a JSON text frame carrying a base64 JPEG (+33% bytes, plus a
+json.loads and a b64decode copy per frame), the Pi sends one binary frame:
+
+    header (little-endian, 44 bytes for version 4)
+        B   version            4
+        B   type               MSG_RECOGNIZE / MSG_NO_FACE
+        H   face_count         faces the Pi detected in this frame
+        I   seq                correlation id, echoed in the JSON response   (v2+)
+        I   track_id           Pi-side face track (0 = untracked), echoed    (v3+)
+        I   face_len           bytes of the face JPEG                        (v4)
+        d   timestamp          Pi time.time()
+        4h  box                x1, y1, x2, y2 of the crop in frame pixels
+        f   face_height_ratio  face height / frame height
+        f   confidence         detection confidence
+        f   frame_scale        full-frame JPEG width / camera width (0 = none) (v4)
+    payload
+        raw JPEG bytes of the cropped face (empty for MSG_NO_FACE), then
+        (v4, optional) a downscaled JPEG of the whole camera frame
+
+Older versions simply lack the marked fields (v1 28 bytes, v2 32, v3 36) and
+carry only the face JPEG. A client asks for the protocol with one of the
+BINARY_SUBPROTOCOLS WebSocket subprotocols; the backend dispatches on the
+frame kind, so old clients keep sending JSON text. Responses stay JSON text
+frames. The Pi side packs the same layouts in raspberry_pi/sender.py;
+tests/test_ws_protocol.py round-trips every version between the two.
+"""
+
+import struct
+
+# Supported subprotocols, preferred first
+BINARY_SUBPROTOCOLS = ("kamera.face.v4", "kamera.face.v3", "kamera.face.v2", "kamera.face.v1")
+
+_BOX_FIELDS = ("timestamp", "x1", "y1", "x2", "y2", "face_height_ratio", "confidence")
+FRAME_HEADERS = {
+    1: (struct.Struct("<BBHd4hff"), ("version", "type", "face_count") + _BOX_FIELDS),
+    2: (struct.Struct("<BBHId4hff"), ("version", "type", "face_count", "seq") + _BOX_FIELDS),
+    3: (struct.Struct("<BBHIId4hff"), ("version", "type", "face_count", "seq", "track_id") + _BOX_FIELDS),
+    4: (struct.Struct("<BBHIIId4hfff"),
+        ("version", "type", "face_count", "seq", "track_id", "face_len") + _BOX_FIELDS + ("frame_scale",)),
+}
+
+MSG_RECOGNIZE = 1
+MSG_NO_FACE = 2
+_MESSAGE_TYPES = {MSG_RECOGNIZE: "recognize", MSG_NO_FACE: "no_face"}
+
+
+class FrameError(ValueError):
+    """Raised for a binary frame that does not follow the protocol."""
+
+
+def unpack_frame(data):
+    """
+    Parse a binary frame into the same dict shape as the JSON messages.
+
+    Args:
+        data: bytes of one binary WebSocket message
+
+    Returns:
+        dict with type, seq (None before version 2), track_id (None if
+        untracked or before version 3), timestamp, box, face_height_ratio,
+        face_count, confidence, "face": a zero-copy memoryview of the face
+        JPEG bytes and, if the Pi sent one, "frame" (memoryview of the
+        full-frame JPEG) and "frame_scale"
+    """
+    spec = FRAME_HEADERS.get(data[0]) if data else None
+    if spec is None:
+        raise FrameError(f"Unsupported frame version {data[0] if data else None}")
+    header, names = spec
+    if len(data) < header.size:
+        raise FrameError(f"Frame too short ({len(data)} bytes)")
+
+    fields = dict(zip(names, header.unpack_from(data)))
+    payload = memoryview(data)[header.size:]
+    face_len = fields.get("face_len", len(payload))
+    if face_len > len(payload):
+        raise FrameError(f"Face length {face_len} exceeds payload ({len(payload)} bytes)")
+
+    message = {
+        "type": _MESSAGE_TYPES.get(fields["type"], ""),
+        "seq": fields.get("seq"),
+        "track_id": fields.get("track_id") or None,
+        "timestamp": fields["timestamp"],
+        "box": [fields["x1"], fields["y1"], fields["x2"], fields["y2"]],
+        "face_height_ratio": fields["face_height_ratio"],
+        "face_count": fields["face_count"],
+        "confidence": fields["confidence"],
+        "face": payload[:face_len],
+    }
+    if fields.get("frame_scale") and face_len < len(payload):
+        message["frame"] = payload[face_len:]
+        message["frame_scale"] = fields["frame_scale"]
+    return message
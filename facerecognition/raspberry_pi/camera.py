@@ -2,11 +2,19 @@
 Camera module for Raspberry Pi.
 Handles camera initialization, frame capture, and cleanup.
 Supports both USB cameras and Raspberry Pi Camera Module.
+
+By default frames are captured on a background thread into a small ring
+buffer (CAMERA_BUFFER_SIZE, 1 = latest frame only), so Haar detection and
+capture overlap and read() always returns the freshest frame instead of one
+queued in the V4L2 buffers. Frames that are overwritten before the main loop
+reads them are counted as dropped.
 """
 
 import cv2
 import time
-from config import CAMERA_INDEX, CAMERA_WIDTH, CAMERA_HEIGHT, CAMERA_FPS
+import threading
+from collections import deque
+from config import CAMERA_INDEX, CAMERA_WIDTH, CAMERA_HEIGHT, CAMERA_FPS, CAMERA_THREADED, CAMERA_BUFFER_SIZE
 
 
 class Camera:
@@ -14,14 +22,30 @@ class Camera:
     Camera wrapper with auto-reconnect and frame rate management.
     """
 
-    def __init__(self, index=None, width=None, height=None, fps=None):
+    def __init__(self, index=None, width=None, height=None, fps=None, threaded=None, buffer_size=None):
         self.index = index or CAMERA_INDEX
         self.width = width or CAMERA_WIDTH
         self.height = height or CAMERA_HEIGHT
         self.fps = fps or CAMERA_FPS
+        self.threaded = CAMERA_THREADED if threaded is None else threaded
         self.cap = None
         self._connect()
 
+        # Capture thread state: unread frames (oldest first) + counters
+        self._frames = deque(maxlen=buffer_size or CAMERA_BUFFER_SIZE)
+        self._lock = threading.Lock()
+        self._capture_times = deque(maxlen=30)
+        self.captured = 0
+        self.delivered = 0
+        self.dropped = 0
+
+        self._running = False
+        self._thread = None
+        if self.threaded:
+            self._running = True
+            self._thread = threading.Thread(target=self._capture_loop, name="camera-capture", daemon=True)
+            self._thread.start()
+
     def _connect(self):
         """Initialize or reconnect the camera."""
         if self.cap is not None:
@@ -37,6 +61,7 @@ class Camera:
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
         self.cap.set(cv2.CAP_PROP_FPS, self.fps)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # don't queue stale frames in the driver (if supported)
 
         # Read actual settings
         actual_w = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
@@ -44,9 +69,9 @@ class Camera:
         actual_fps = int(self.cap.get(cv2.CAP_PROP_FPS))
         print(f"[Camera] Connected: {actual_w}x{actual_h} @ {actual_fps}fps")
 
-    def read(self):
+    def _grab(self):
         """
-        Read a frame from the camera.
+        Blocking read of the next frame from the device, reconnecting on failure.
 
         Returns:
             frame: BGR image (numpy array), or None if read failed
@@ -70,8 +95,87 @@ class Camera:
 
         return frame
 
+    def _capture_loop(self):
+        """Background thread: keep the ring buffer filled with the newest frames."""
+        while self._running:
+            frame = self._grab()
+            if frame is None:
+                if self.cap is None or not self.cap.isOpened():
+                    time.sleep(1)  # camera gone: don't spin on reconnect attempts
+                continue
+
+            with self._lock:
+                if len(self._frames) == self._frames.maxlen:
+                    self.dropped += 1  # oldest unread frame is overwritten
+                self._frames.append(frame)
+                self._capture_times.append(time.monotonic())
+                self.captured += 1
+
+    def read(self):
+        """
+        Read the freshest frame from the camera.
+
+        Threaded mode never blocks: returns the newest frame captured since
+        the previous call (older unread frames are dropped), or None if no new
+        frame has arrived yet. Unthreaded mode reads synchronously.
+
+        Returns:
+            frame: BGR image (numpy array), or None if no (new) frame
+        """
+        if not self.threaded:
+            return self._grab()
+
+        with self._lock:
+            if not self._frames:
+                return None
+            frame = self._frames.pop()
+            self.dropped += len(self._frames)
+            self._frames.clear()
+            self.delivered += 1
+        return frame
+
+    def read_all(self):
+        """
+        All buffered unread frames, oldest first (threaded mode, CAMERA_BUFFER_SIZE > 1).
+
+        Returns:
+            list of BGR images (possibly empty)
+        """
+        if not self.threaded:
+            frame = self._grab()
+            return [] if frame is None else [frame]
+
+        with self._lock:
+            frames = list(self._frames)
+            self._frames.clear()
+            self.delivered += len(frames)
+        return frames
+
+    def stats(self):
+        """
+        Capture statistics.
+
+        Returns:
+            dict with capture_fps (over the last 30 frames), captured,
+            delivered and dropped frame counts
+        """
+        with self._lock:
+            times = list(self._capture_times)
+            captured, delivered, dropped = self.captured, self.delivered, self.dropped
+        fps = (len(times) - 1) / (times[-1] - times[0]) if len(times) > 1 and times[-1] > times[0] else 0.0
+        return {
+            "capture_fps": round(fps, 1),
+            "captured": captured,
+            "delivered": delivered,
+            "dropped": dropped,
+        }
+
     def release(self):
-        """Release the camera resource."""
+        """Stop the capture thread and release the camera resource."""
+        if self._thread is not None:
+            self._running = False
+            self._thread.join(timeout=2)
+            self._thread = None
         if self.cap is not None:
             self.cap.release()
             self.cap = None
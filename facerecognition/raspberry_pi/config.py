@@ -7,12 +7,20 @@ BACKEND_HOST = "127.0.0.1"  # Local system for testing
 BACKEND_PORT = 8000
 BACKEND_WS_URL = f"ws://{BACKEND_HOST}:{BACKEND_PORT}/ws"
 BACKEND_HTTP_URL = f"http://{BACKEND_HOST}:{BACKEND_PORT}"
+WS_BINARY_FRAMES = True     # Send header + raw JPEG frames (falls back to JSON on older backends)
+WS_MAX_IN_FLIGHT = 3        # Frames sent without waiting for a response before new ones are skipped
+WS_RESPONSE_TIMEOUT = 5.0   # Seconds before an unanswered frame is forgotten (late reply = stale)
+WS_SEND_FULL_FRAME = False  # Also send a downscaled full frame (used by the backend only with LIVENESS_INPUT = "detected")
+FULL_FRAME_WIDTH = 320      # Width of that frame (aspect kept)
+FULL_FRAME_JPEG_QUALITY = 70
 
 # ---- Camera ----
 CAMERA_INDEX = 0            # 0 for default camera, or path like "/dev/video0"
 CAMERA_WIDTH = 640
 CAMERA_HEIGHT = 480
 CAMERA_FPS = 30
+CAMERA_THREADED = True      # Capture on a background thread; read() returns the freshest frame
+CAMERA_BUFFER_SIZE = 1      # Unread frames kept by the capture thread (1 = latest only)
 
 # ---- Face Detection (Haar Cascade) ----
 # Scale factor: how much the image size is reduced at each scale (lower = more accurate but slower)
@@ -21,8 +29,53 @@ DETECTION_SCALE_FACTOR = 1.2    # 1.1 = very accurate/slow, 1.3 = fast/less accu
 # Min neighbors: how many neighbors each candidate rectangle should have (higher = fewer false positives)
 DETECTION_MIN_NEIGHBORS = 5     # 3 = more detections, 7 = stricter filtering
 
+# Detection scale: the cascade runs on the gray image resized by this factor,
+# boxes are mapped back and crops are cut from the full-resolution frame.
+# MIN_FACE_SIZE stays in full-resolution pixels; the cascade window is 24 px,
+# so faces smaller than 24 / DETECTION_SCALE px are not found.
+# Compare FPS and recall with scripts/benchmark_detection_scale.py.
+DETECTION_SCALE = 0.75          # 1.0 = native; 0.5 is ~2x faster but misses small (distant, tailgating) faces
+
+# Motion gate: frame differencing on a small blurred gray image. Static scenes
+# skip the cascade (previous boxes are re-cropped from the new frame).
+MOTION_GATE = True
+MOTION_WIDTH = 160              # Width of the downscaled motion image (aspect kept)
+MOTION_PIXEL_DELTA = 20         # Gray-level change that counts a pixel as moving
+MOTION_MIN_FRACTION = 0.005     # Fraction of moving pixels that counts as motion
+
+# Region of interest: while a face is tracked, the cascade only scans around
+# the previous boxes (expanded by this fraction of the box size per side),
+# plus a full-frame rescan every DETECTION_FULL_SCAN_EVERY frames.
+DETECTION_ROI_EXPAND = 0.5
+DETECTION_FULL_SCAN_EVERY = 10
+
+# ---- Tracking ----
+# Boxes are linked across frames (IoU, then centroid distance) into tracks.
+# Each track sends its best crop of the send window, tagged with its track ID,
+# so the backend keeps liveness state per person.
+TRACK_IOU_THRESHOLD = 0.3       # Min IoU to continue a track
+TRACK_MAX_DISTANCE = 0.5        # Centroid fallback: max distance as a fraction of the box width
+TRACK_MAX_MISSED = 5            # Frames a track survives without a matching box
+TRACK_IDENTIFIED_RESEND = 5.0   # Seconds between re-sends of a validated, matched track
+
+# Crop quality: size x sharpness x frontalness, each scored 0..1
+QUALITY_REF_SIZE = 112          # Crop size (px) that gets full size marks (ArcFace input size)
+QUALITY_SHARPNESS_REF = 150.0   # Laplacian variance (at 96x96) that gets full sharpness marks
+
+# Crops failing any of these are not uploaded (they would fail MiniFASNet /
+# ArcFace and reset the backend's consecutive-frame counter). They still count
+# as faces for the anti-tailgating rule.
+QUALITY_REJECT = True
+QUALITY_MIN_SHARPNESS = 40.0    # Laplacian variance at 96x96 (sharp faces ~200+, motion blur < 20)
+QUALITY_MIN_BRIGHTNESS = 40     # Mean gray level (underexposed below)
+QUALITY_MAX_BRIGHTNESS = 220    # Mean gray level (blown out above)
+QUALITY_MIN_CONTRAST = 20       # Gray-level standard deviation (flat / backlit faces below)
+
 # ---- Processing ----
-SEND_INTERVAL = 1.0         # Minimum seconds between sending frames to backend
+SEND_INTERVAL = 1.0         # Seconds between sends while a face is in view (HTTP mode: always)
+SEND_INTERVAL_STREAK = 0.15 # WebSocket: while the backend counts a "HOLD STILL n/5" streak (~7 Hz)
+SEND_INTERVAL_IDLE = 3.0    # WebSocket: no_face heartbeat and during anti-tailgating lockdown
+                            # (all capped by the backend's advertised max_rate_hz)
 FACE_PADDING = 20           # Extra pixels around detected face crop
 JPEG_QUALITY = 85           # JPEG compression quality (lower = smaller file)
 MIN_FACE_SIZE = 60          # Minimum face size in pixels (width or height)
@@ -6,32 +6,141 @@ Best for: Frontal face detection (person looking at camera)
 - Ultra-fast on CPU (~15-25 FPS on Pi 4)
 - Built into OpenCV, no extra model downloads needed
 - Low memory footprint (~10 MB)
+
+To save CPU, the cascade runs on a downscaled gray image (DETECTION_SCALE);
+boxes are mapped back and crops are cut from the full-resolution frame, so
+the backend still gets full-quality faces. It also does not scan every frame:
+- Motion gate: a cheap difference of small blurred gray images. In a static
+  scene the previous boxes are reused (re-cropped from the new frame), so an
+  empty doorway costs almost nothing.
+- ROI: while faces are tracked and nothing moves elsewhere, only the
+  expanded regions around the previous boxes are scanned. A full-frame scan
+  runs when there is motion outside those regions (a newcomer must not stay
+  unseen, see RULE 5 anti-tailgating), when a ROI loses its face, when the
+  caller asks for one (detect(full_scan=True), e.g. during a HOLD STILL
+  streak) and every DETECTION_FULL_SCAN_EVERY frames.
+
+Every crop gets a quality assessment (crop_quality): blurry, under/over-
+exposed, flat or clipped-small crops are marked rejected so the caller can
+skip uploading them, and the score lets it pick the best crop of a window.
 """
 
 import cv2
+import numpy as np
 try:
     from config import (
         DETECTION_SCALE_FACTOR,
         DETECTION_MIN_NEIGHBORS,
+        DETECTION_SCALE,
         FACE_PADDING,
         MIN_FACE_SIZE,
+        MOTION_GATE,
+        MOTION_WIDTH,
+        MOTION_PIXEL_DELTA,
+        MOTION_MIN_FRACTION,
+        DETECTION_ROI_EXPAND,
+        DETECTION_FULL_SCAN_EVERY,
+        QUALITY_REF_SIZE,
+        QUALITY_SHARPNESS_REF,
+        QUALITY_REJECT,
+        QUALITY_MIN_SHARPNESS,
+        QUALITY_MIN_BRIGHTNESS,
+        QUALITY_MAX_BRIGHTNESS,
+        QUALITY_MIN_CONTRAST,
     )
 except ImportError:
     from .config import (
         DETECTION_SCALE_FACTOR,
         DETECTION_MIN_NEIGHBORS,
+        DETECTION_SCALE,
         FACE_PADDING,
         MIN_FACE_SIZE,
+        MOTION_GATE,
+        MOTION_WIDTH,
+        MOTION_PIXEL_DELTA,
+        MOTION_MIN_FRACTION,
+        DETECTION_ROI_EXPAND,
+        DETECTION_FULL_SCAN_EVERY,
+        QUALITY_REF_SIZE,
+        QUALITY_SHARPNESS_REF,
+        QUALITY_REJECT,
+        QUALITY_MIN_SHARPNESS,
+        QUALITY_MIN_BRIGHTNESS,
+        QUALITY_MAX_BRIGHTNESS,
+        QUALITY_MIN_CONTRAST,
     )
 
 
+def iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes."""
+    ix = max(0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def crop_quality(face_img):
+    """
+    Assess how useful a face crop is for recognition.
+
+    The score is the product of:
+      size:      shorter side relative to QUALITY_REF_SIZE
+      sharpness: Laplacian variance at 96x96 relative to QUALITY_SHARPNESS_REF
+                 (motion blur and defocus flatten the edges)
+      frontal:   left/right mirror symmetry (turned heads are asymmetric)
+
+    Args:
+        face_img: BGR face crop
+
+    Returns:
+        dict with score (0..1), the raw sharpness (Laplacian variance),
+        brightness (mean gray), contrast (gray std) and reject: None, or
+        "too_small" / "blurry" / "dark" / "bright" / "low_contrast"
+    """
+    h, w = face_img.shape[:2]
+    if min(h, w) == 0:
+        return {"score": 0.0, "sharpness": 0.0, "brightness": 0.0, "contrast": 0.0, "reject": "too_small"}
+
+    gray = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
+    gray = cv2.resize(gray, (96, 96), interpolation=cv2.INTER_AREA)
+    laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
+    mean, std = cv2.meanStdDev(gray)
+    brightness, contrast = float(mean[0, 0]), float(std[0, 0])
+
+    size = min(1.0, min(h, w) / QUALITY_REF_SIZE)
+    sharpness = min(1.0, laplacian_var / QUALITY_SHARPNESS_REF)
+    frontal = 1.0 - min(1.0, cv2.absdiff(gray, cv2.flip(gray, 1)).mean() / 64.0)
+
+    if min(h, w) < MIN_FACE_SIZE:
+        reject = "too_small"    # clipped at the frame edge
+    elif laplacian_var < QUALITY_MIN_SHARPNESS:
+        reject = "blurry"
+    elif brightness < QUALITY_MIN_BRIGHTNESS:
+        reject = "dark"
+    elif brightness > QUALITY_MAX_BRIGHTNESS:
+        reject = "bright"
+    elif contrast < QUALITY_MIN_CONTRAST:
+        reject = "low_contrast"
+    else:
+        reject = None
+
+    return {
+        "score": size * sharpness * frontal,
+        "sharpness": laplacian_var,
+        "brightness": brightness,
+        "contrast": contrast,
+        "reject": reject,
+    }
+
+
 class FaceDetector:
     """
     CPU-optimized face detector using Haar Cascade classifier.
     Ideal for frontal face detection on Raspberry Pi.
     """
 
-    def __init__(self):
+    def __init__(self, motion_gate=None, detection_scale=None, quality_reject=None):
         # Load built-in Haar Cascade - no download needed!
         cascade_path = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
         self.face_cascade = cv2.CascadeClassifier(cascade_path)
@@ -39,42 +148,168 @@ class FaceDetector:
         if self.face_cascade.empty():
             raise RuntimeError(f"Failed to load Haar Cascade from {cascade_path}")
 
+        self.motion_gate = MOTION_GATE if motion_gate is None else motion_gate
+        self.scale = detection_scale or DETECTION_SCALE
+        self.quality_reject = QUALITY_REJECT if quality_reject is None else quality_reject
+        # Cascade min size in downscaled pixels (the 24 px window is the floor)
+        self._min_size = max(24, round(MIN_FACE_SIZE * self.scale))
+
+        # Motion / ROI state
+        self._prev_small = None
+        self._last_rects = []       # (x, y, w, h) raw cascade boxes of the previous frame
+        self._frames_since_full = 0
+
+        # Counters
+        self.frames = 0
+        self.static_skips = 0
+        self.roi_scans = 0
+        self.full_scans = 0
+        self.outside_motion_scans = 0   # full scans forced by motion outside the ROIs
+        self.crops = 0
+        self.rejected = {}          # reject reason -> crops
+
         print("[FaceDetector] Initialized with Haar Cascade (CPU)")
         print(f"[FaceDetector] Scale Factor: {DETECTION_SCALE_FACTOR}")
         print(f"[FaceDetector] Min Neighbors: {DETECTION_MIN_NEIGHBORS}")
+        print(f"[FaceDetector] Detection scale: {self.scale}")
+        print(f"[FaceDetector] Motion gate: {'on' if self.motion_gate else 'off'}")
+        print(f"[FaceDetector] Quality reject: {'on' if self.quality_reject else 'off'}")
+
+    # ── Cascade ─────────────────────────────────────────────────
+
+    def _cascade(self, gray, offset=(0, 0)):
+        """
+        Run the cascade on a gray image (full frame or ROI) at self.scale.
 
-    def detect(self, frame):
+        Returns:
+            list of (x, y, w, h) in full-resolution frame coordinates
+        """
+        if self.scale != 1.0:
+            h, w = gray.shape[:2]
+            size = (max(1, round(w * self.scale)), max(1, round(h * self.scale)))
+            gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+        gray = cv2.equalizeHist(gray)  # better detection under varying lighting
+        detections = self.face_cascade.detectMultiScale(
+            gray,
+            scaleFactor=DETECTION_SCALE_FACTOR,
+            minNeighbors=DETECTION_MIN_NEIGHBORS,
+            minSize=(self._min_size, self._min_size),
+            flags=cv2.CASCADE_SCALE_IMAGE,
+        )
+        ox, oy = offset
+        inv = 1.0 / self.scale
+        return [
+            (round(x * inv) + ox, round(y * inv) + oy, round(fw * inv), round(fh * inv))
+            for (x, y, fw, fh) in detections
+        ]
+
+    def _expand(self, rect, w, h):
+        """Expanded ROI (x1, y1, x2, y2) around a previous box, clipped to the frame."""
+        x, y, fw, fh = rect
+        dx, dy = int(fw * DETECTION_ROI_EXPAND), int(fh * DETECTION_ROI_EXPAND)
+        return max(0, x - dx), max(0, y - dy), min(w, x + fw + dx), min(h, y + fh + dy)
+
+    # ── Motion gate ─────────────────────────────────────────────
+
+    def _motion(self, gray):
+        """
+        Compare with the previous frame at MOTION_WIDTH.
+
+        Returns:
+            bool mask of moving pixels at MOTION_WIDTH if enough pixels
+            changed, else None; on the first frame every pixel counts as moving
+        """
+        h, w = gray.shape[:2]
+        scale = MOTION_WIDTH / w
+        small = cv2.resize(gray, (MOTION_WIDTH, max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+        small = cv2.GaussianBlur(small, (5, 5), 0)
+
+        prev, self._prev_small = self._prev_small, small
+        if prev is None or prev.shape != small.shape:
+            return np.ones(small.shape, dtype=bool)
+
+        moving = cv2.absdiff(small, prev) > MOTION_PIXEL_DELTA
+        return moving if np.count_nonzero(moving) >= MOTION_MIN_FRACTION * moving.size else None
+
+    @staticmethod
+    def _moving_outside(moving, rois, w):
+        """True if the motion mask has motion (MOTION_MIN_FRACTION) outside every ROI."""
+        outside = moving.copy()
+        scale = moving.shape[1] / w
+        for x1, y1, x2, y2 in rois:
+            # Round outwards: a newcomer's motion is much larger than a pixel
+            outside[int(y1 * scale):int(np.ceil(y2 * scale)), int(x1 * scale):int(np.ceil(x2 * scale))] = False
+        return np.count_nonzero(outside) >= MOTION_MIN_FRACTION * outside.size
+
+    # ── Detection ───────────────────────────────────────────────
+
+    def _find_rects(self, gray, full_scan=False):
+        """Raw face boxes for this frame, scanning as little as possible."""
+        h, w = gray.shape[:2]
+        self.frames += 1
+        self._frames_since_full += 1
+
+        full_due = full_scan or self._frames_since_full >= DETECTION_FULL_SCAN_EVERY
+
+        if self.motion_gate and not full_due:
+            moving = self._motion(gray)
+            if moving is None:
+                self.static_skips += 1
+                return self._last_rects
+
+            rois = [self._expand(r, w, h) for r in self._last_rects]
+            if rois and self._moving_outside(moving, rois, w):
+                self.outside_motion_scans += 1  # someone may be entering: look everywhere
+            elif rois:
+                rects = []
+                for x1, y1, x2, y2 in rois:
+                    if min(x2 - x1, y2 - y1) * self.scale >= self._min_size:
+                        rects.extend(self._cascade(gray[y1:y2, x1:x2], offset=(x1, y1)))
+                self.roi_scans += 1
+                # Overlapping ROIs of neighbouring faces can find the same face twice
+                unique = []
+                for r in rects:
+                    if all(iou(r, u) < 0.3 for u in unique):
+                        unique.append(r)
+                if len(unique) >= len(self._last_rects):
+                    return unique
+                # A tracked face left its ROI: look everywhere
+        elif self.motion_gate:
+            self._motion(gray)  # keep the reference frame current
+
+        self.full_scans += 1
+        self._frames_since_full = 0
+        return self._cascade(gray)
+
+    def detect(self, frame, full_scan=False):
         """
         Detect frontal faces in a frame.
 
         Args:
-            frame: BGR image (numpy array) from camera
+            frame:     BGR image (numpy array) from camera
+            full_scan: scan the whole frame even if ROIs / the motion gate
+                       would allow less (e.g. while a liveness streak runs,
+                       so a second face triggers the lockdown at once)
 
         Returns:
             list of dicts, each containing:
                 - 'box': (x1, y1, x2, y2) bounding box
                 - 'confidence': 1.0 (Haar doesn't provide confidence)
                 - 'face': cropped face image (numpy array)
+                - 'quality': crop_quality() dict; its 'reject' is always
+                  None when quality rejection is off
         """
         h, w = frame.shape[:2]
 
         # Convert to grayscale (Haar works on grayscale)
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
-        # Equalize histogram for better detection under varying lighting
-        gray = cv2.equalizeHist(gray)
-
-        # Detect faces
-        detections = self.face_cascade.detectMultiScale(
-            gray,
-            scaleFactor=DETECTION_SCALE_FACTOR,
-            minNeighbors=DETECTION_MIN_NEIGHBORS,
-            minSize=(MIN_FACE_SIZE, MIN_FACE_SIZE),
-            flags=cv2.CASCADE_SCALE_IMAGE,
-        )
+        rects = self._find_rects(gray, full_scan=full_scan)
+        self._last_rects = rects
 
         faces = []
-        for (x, y, fw, fh) in detections:
+        for (x, y, fw, fh) in rects:
             # Add padding around face
             x1 = max(0, x - FACE_PADDING)
             y1 = max(0, y - FACE_PADDING)
@@ -84,14 +319,41 @@ class FaceDetector:
             # Crop face region (from original BGR frame, not grayscale)
             face_img = frame[y1:y2, x1:x2].copy()
 
+            quality = crop_quality(face_img)
+            self.crops += 1
+            if not self.quality_reject:
+                quality["reject"] = None
+            elif quality["reject"]:
+                self.rejected[quality["reject"]] = self.rejected.get(quality["reject"], 0) + 1
+
             faces.append({
                 "box": (x1, y1, x2, y2),
                 "confidence": 1.0,
                 "face": face_img,
+                "quality": quality,
             })
 
         return faces
 
+    def stats(self):
+        """
+        How often the cascade actually ran.
+
+        Returns:
+            dict with frames, static_skips (no motion, boxes reused),
+            roi_scans, full_scans (outside_motion_scans of them forced by
+            motion outside the ROIs), crops and rejected (crops per reject reason)
+        """
+        return {
+            "frames": self.frames,
+            "static_skips": self.static_skips,
+            "roi_scans": self.roi_scans,
+            "full_scans": self.full_scans,
+            "outside_motion_scans": self.outside_motion_scans,
+            "crops": self.crops,
+            "rejected": dict(self.rejected),
+        }
+
     def draw_detections(self, frame, faces):
         """
         Draw bounding boxes on frame (for debugging).
@@ -107,14 +369,19 @@ class FaceDetector:
         for face in faces:
             x1, y1, x2, y2 = face["box"]
 
+            # Rejected crops (not uploaded) in red with the reason
+            reject = face.get("quality", {}).get("reject")
+            color = (0, 0, 255) if reject else (0, 255, 0)
+            label = reject.upper() if reject else "FACE"
+
             # Draw bounding box
-            cv2.rectangle(display, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            cv2.rectangle(display, (x1, y1), (x2, y2), color, 2)
 
-            # Draw "FACE" label
+            # Draw label
             label_y = y1 - 10 if y1 - 10 > 10 else y1 + 20
             cv2.putText(
-                display, "FACE", (x1, label_y),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2,
+                display, label, (x1, label_y),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2,
             )
 
         return display
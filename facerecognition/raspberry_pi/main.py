@@ -4,7 +4,8 @@ Main entry point for Raspberry Pi face detection.
 Pipeline:
 1. Capture frame from camera
 2. Detect faces using OpenCV DNN (CPU)
-3. Send cropped face(s) to backend for recognition
+3. Track faces across frames (WebSocket mode) and send each track's best
+   crop to the backend for recognition
 4. Display results (optional, for debugging)
 
 Usage:
@@ -21,8 +22,10 @@ import asyncio
 import argparse
 from camera import Camera
 from face_detector import FaceDetector
+from tracker import FaceTracker
+from send_rate import SendRate, STREAK
 from sender import WebSocketSender, HTTPSender
-from config import SEND_INTERVAL
+from config import SEND_INTERVAL, WS_SEND_FULL_FRAME
 
 
 def parse_args():
@@ -42,11 +45,14 @@ async def run_websocket_mode(display=False):
     """Main loop using WebSocket for real-time communication."""
     camera = Camera()
     detector = FaceDetector()
+    tracker = FaceTracker()
+    rate = SendRate()
     sender = WebSocketSender()
 
     await sender.connect()
 
-    last_send_time = 0
+    last_face_count = 0
+    reset_pending = False   # a no_face reset that could not be sent yet
     frame_count = 0
     fps_start = time.time()
 
@@ -57,10 +63,17 @@ async def run_websocket_mode(display=False):
         while True:
             frame = camera.read()
             if frame is None:
+                await asyncio.sleep(0.005)  # no new frame captured yet
                 continue
 
-            # Detect faces
-            faces = detector.detect(frame)
+            # Detect faces and follow them across frames (keeps each track's best crop).
+            # During a HOLD STILL streak every frame is scanned in full, so a
+            # second person is seen (RULE 5 lockdown) before the streak can unlock.
+            faces = detector.detect(frame, full_scan=rate.mode == STREAK)
+            if WS_SEND_FULL_FRAME:
+                for face_data in faces:
+                    face_data["frame"] = frame  # sent along with the crop if it is a track's best
+            tracker.update(faces)
             frame_count += 1
             frame_h = frame.shape[0]  # Frame height for proximity rule
 
@@ -68,36 +81,75 @@ async def run_websocket_mode(display=False):
             if frame_count % 30 == 0:
                 elapsed = time.time() - fps_start
                 fps = frame_count / elapsed
-                print(f"[Main] FPS: {fps:.1f} | Faces detected: {len(faces)}")
+                cam = camera.stats()
+                det = detector.stats()
+                trk = tracker.stats()
+                print(f"[Main] FPS: {fps:.1f} | Capture FPS: {cam['capture_fps']:.1f} | "
+                      f"Dropped: {cam['dropped']} | Faces detected: {len(faces)} | "
+                      f"Scans full/ROI/skipped: {det['full_scans']}/{det['roi_scans']}/{det['static_skips']} | "
+                      f"Send: {rate.mode} every {rate.interval():.2f}s | "
+                      f"Tracks: {trk['active']} | Uploads avoided (identified/bad crops): "
+                      f"{trk['suppressed']}/{trk['avoided']} {det['rejected']}")
 
             current_time = time.time()
 
+            # A person joining or leaving changes the anti-tailgating picture:
+            # identified tracks must be checked again
+            if len(faces) != last_face_count:
+                tracker.reset_identified()
+                last_face_count = len(faces)
+
+            # Send rate follows the backend state (fast during a HOLD STILL streak)
+            send_due = rate.due(current_time, len(faces))
+
             # ── RULE 4: Ghost Blink Fix ─────────────────────────────────────
             # When no face is in frame, notify backend to reset its counter.
-            if not faces and (current_time - last_send_time) >= SEND_INTERVAL:
-                await sender.send_no_face()
-                last_send_time = current_time
-
-            # Send faces to backend (rate-limited)
-            elif faces and (current_time - last_send_time) >= SEND_INTERVAL:
+            # A reset that could not be sent (not connected) is not counted
+            # as sent: it is retried on the next loop.
+            if not faces and send_due:
+                reset_pending = await sender.send_no_face() is None
+                if not reset_pending:
+                    rate.sent(current_time)
+
+            # The face came back before the reset got through: deliver the
+            # reset first, and send no faces until it is, so the old streak
+            # cannot continue.
+            elif faces and send_due and reset_pending:
+                reset_pending = await sender.send_no_face() is None
+
+            # Send each track's best crop of the interval (rate-limited)
+            elif faces and send_due:
                 face_count = len(faces)  # Total faces for anti-tailgating rule
-                for face_data in faces:
-                    result = await sender.send_face(
+                for track in tracker.due(current_time):
+                    face_data = track.take_best()
+                    # Returns once the frame is written; the response shows up
+                    # in sender.results a round-trip later
+                    if await sender.send_face(
                         face_data["face"],
                         face_data["box"],
                         face_data["confidence"],
                         frame_h,
                         face_count,
-                    )
-
-                    if result:
-                        name  = result.get("name", "unknown")
-                        score = result.get("score", 0)
-                        label = result.get("label", "")
-                        validated = result.get("is_validated", False)
-                        print(f"  → {label} | {name} (score: {score:.3f}) | validated: {validated}")
-
-                last_send_time = current_time
+                        track_id=track.id,
+                        frame=face_data.get("frame"),
+                    ) is not None:
+                        track.last_sent = current_time
+
+                rate.sent(current_time)
+
+            # Responses that arrived since the last frame
+            for result in sender.poll_results():
+                tracker.on_result(result)
+                rate.on_result(result)
+                if "name" not in result:
+                    continue  # no_face acknowledgement / busy
+                name  = result.get("name", "unknown")
+                score = result.get("score", 0)
+                label = result.get("label", "")
+                validated = result.get("is_validated", False)
+                print(f"  → [track {result.get('track_id')}] {label} | {name} (score: {score:.3f}) "
+                      f"| validated: {validated} | {result['rtt_ms']:.0f} ms "
+                      f"(server {result.get('server_ms', 0):.0f} ms)")
 
             # Display frame (optional)
             if display:
@@ -124,6 +176,7 @@ def run_http_mode(display=False):
     detector = FaceDetector()
     sender = HTTPSender()
 
+    avoided = 0  # faces not uploaded because the crop was rejected
     last_send_time = 0
     frame_count = 0
     fps_start = time.time()
@@ -135,6 +188,7 @@ def run_http_mode(display=False):
         while True:
             frame = camera.read()
             if frame is None:
+                time.sleep(0.005)  # no new frame captured yet
                 continue
 
             # Detect faces
@@ -145,13 +199,21 @@ def run_http_mode(display=False):
             if frame_count % 30 == 0:
                 elapsed = time.time() - fps_start
                 fps = frame_count / elapsed
-                print(f"[Main] FPS: {fps:.1f} | Faces detected: {len(faces)}")
+                cam = camera.stats()
+                det = detector.stats()
+                print(f"[Main] FPS: {fps:.1f} | Capture FPS: {cam['capture_fps']:.1f} | "
+                      f"Dropped: {cam['dropped']} | Faces detected: {len(faces)} | "
+                      f"Scans full/ROI/skipped: {det['full_scans']}/{det['roi_scans']}/{det['static_skips']} | "
+                      f"Uploads avoided (bad crops): {avoided} {det['rejected']}")
 
             current_time = time.time()
 
             # Send faces to backend (rate-limited)
             if faces and (current_time - last_send_time) >= SEND_INTERVAL:
                 for face_data in faces:
+                    if face_data["quality"]["reject"]:
+                        avoided += 1
+                        continue
                     result = sender.send_face(
                         face_data["face"],
                         face_data["box"],
@@ -0,0 +1,96 @@
+"""
+Adaptive send rate for the WebSocket main loop.
+
+The backend needs TEMPORAL_CONSISTENCY_FRAMES consecutive real frames before
+the door opens, so a fixed 1 s interval means 5 s of standing still. The
+send interval follows the backend state reported in its responses instead:
+
+    streak    "HOLD STILL n/5" (counting up)       SEND_INTERVAL_STREAK
+    normal    face in view, no streak / validated   SEND_INTERVAL
+    lockdown  anti-tailgating lockdown              SEND_INTERVAL_IDLE
+    idle      no face (no_face heartbeat)           SEND_INTERVAL_IDLE
+
+A change in the number of faces in view sends right away (e.g. the first
+no_face after someone leaves resets the backend counter without waiting for
+the heartbeat). Every interval is capped by the backend's advertised
+"max_rate_hz".
+"""
+
+from config import SEND_INTERVAL, SEND_INTERVAL_STREAK, SEND_INTERVAL_IDLE
+
+IDLE = "idle"
+NORMAL = "normal"
+STREAK = "streak"
+LOCKDOWN = "lockdown"
+
+_INTERVALS = {
+    IDLE: SEND_INTERVAL_IDLE,
+    NORMAL: SEND_INTERVAL,
+    STREAK: SEND_INTERVAL_STREAK,
+    LOCKDOWN: SEND_INTERVAL_IDLE,
+}
+
+
+class SendRate:
+    """
+    Decides when the main loop sends next.
+
+    Usage:
+        rate = SendRate()
+        if rate.due(time.time(), len(faces)):
+            ...send faces or no_face...
+            rate.sent(time.time())
+        rate.on_result(response)
+    """
+
+    def __init__(self):
+        self.mode = IDLE
+        self.max_rate_hz = None     # advertised by the backend
+        self._last_send = 0.0
+        self._face_count = 0
+        self._changed = False
+
+    def on_result(self, result):
+        """Update the mode (and the rate cap) from a backend response."""
+        if result.get("max_rate_hz"):
+            self.max_rate_hz = float(result["max_rate_hz"])
+        if "consecutive_frames" not in result or not self._face_count:
+            return  # no_face ack, busy / error reply, or the face already left
+
+        if result.get("lockdown"):
+            self.mode = LOCKDOWN
+        elif not result.get("is_validated") and result.get("consecutive_frames", 0) > 0:
+            self.mode = STREAK
+        else:
+            self.mode = NORMAL
+
+    def interval(self):
+        """Current send interval in seconds (backend rate cap applied)."""
+        interval = _INTERVALS[self.mode]
+        if self.max_rate_hz:
+            interval = max(interval, 1.0 / self.max_rate_hz)
+        return interval
+
+    def due(self, now, face_count):
+        """
+        Args:
+            now:        time.time()
+            face_count: faces detected in the current frame
+
+        Returns:
+            True if the loop should send this frame
+        """
+        if face_count != self._face_count:
+            self._face_count = face_count
+            self.mode = NORMAL if face_count else IDLE
+            self._changed = True
+
+        elapsed = now - self._last_send
+        if self._changed and (not self.max_rate_hz or elapsed >= 1.0 / self.max_rate_hz):
+            return True
+        return elapsed >= self.interval()
+
+    def sent(self, now):
+        """Record a send."""
+        self._last_send = now
+        self._changed = False
@@ -6,11 +6,61 @@ Supports both WebSocket (real-time) and HTTP (fallback) modes.
 import cv2
 import json
 import time
+import uuid
 import base64
+import struct
 import asyncio
 import requests
 import websockets
-from config import BACKEND_WS_URL, BACKEND_HTTP_URL, JPEG_QUALITY
+from config import (
+    BACKEND_WS_URL, BACKEND_HTTP_URL, JPEG_QUALITY,
+    WS_BINARY_FRAMES, WS_MAX_IN_FLIGHT, WS_RESPONSE_TIMEOUT,
+    FULL_FRAME_WIDTH, FULL_FRAME_JPEG_QUALITY,
+)
+
+# Binary frame protocol: header + raw JPEG bytes.
+# Must match backend/ws_protocol.py (tests/test_ws_protocol.py round-trips every version).
+BINARY_SUBPROTOCOL = "kamera.face.v4"
+FRAME_VERSION = 4
+FRAME_HEADERS = {
+    1: struct.Struct("<BBHd4hff"),
+    2: struct.Struct("<BBHId4hff"),
+    3: struct.Struct("<BBHIId4hff"),
+    4: struct.Struct("<BBHIIId4hfff"),
+}
+MSG_RECOGNIZE = 1
+MSG_NO_FACE = 2
+
+
+def encode_face_jpeg(face_img, quality=JPEG_QUALITY):
+    """
+    Encode a face image to JPEG bytes.
+
+    Args:
+        face_img: BGR numpy array of cropped face
+        quality:  JPEG quality (default JPEG_QUALITY)
+
+    Returns:
+        JPEG bytes
+    """
+    encode_params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    _, buffer = cv2.imencode(".jpg", face_img, encode_params)
+    return buffer.tobytes()
+
+
+def encode_full_frame(frame):
+    """
+    Downscale the camera frame to FULL_FRAME_WIDTH and encode it, so the
+    backend's anti-spoof model sees the surroundings of the face.
+
+    Returns:
+        (JPEG bytes, scale = encoded width / camera width)
+    """
+    h, w = frame.shape[:2]
+    scale = min(1.0, FULL_FRAME_WIDTH / w)
+    if scale < 1.0:
+        frame = cv2.resize(frame, (FULL_FRAME_WIDTH, round(h * scale)), interpolation=cv2.INTER_AREA)
+    return encode_face_jpeg(frame, FULL_FRAME_JPEG_QUALITY), scale
 
 
 def encode_face(face_img):
@@ -23,38 +73,155 @@ def encode_face(face_img):
     Returns:
         base64 encoded JPEG string
     """
-    encode_params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]
-    _, buffer = cv2.imencode(".jpg", face_img, encode_params)
-    return base64.b64encode(buffer).decode("utf-8")
+    return base64.b64encode(encode_face_jpeg(face_img)).decode("utf-8")
+
+
+def pack_frame(msg_type, seq, timestamp, box=(0, 0, 0, 0), face_height_ratio=0.0,
+               face_count=0, confidence=0.0, jpeg=b"", track_id=None,
+               frame_jpeg=b"", frame_scale=0.0, version=FRAME_VERSION):
+    """
+    Build one binary WebSocket frame: fixed header, face JPEG, optional full-frame JPEG.
+
+    `version` selects an older header layout (the sender always uses
+    FRAME_VERSION); fields a version lacks are left out: seq before v2,
+    track_id before v3, face_len, frame_scale and the full frame before v4.
+    """
+    x1, y1, x2, y2 = (int(v) for v in box)
+    fields = [version, msg_type, face_count]
+    if version >= 2:
+        fields.append(seq)
+    if version >= 3:
+        fields.append(track_id or 0)
+    if version >= 4:
+        fields.append(len(jpeg))
+    fields += [timestamp, x1, y1, x2, y2, face_height_ratio, confidence]
+    if version < 4:
+        return FRAME_HEADERS[version].pack(*fields) + jpeg
+    fields.append(frame_scale if frame_jpeg else 0.0)
+    return FRAME_HEADERS[version].pack(*fields) + jpeg + frame_jpeg
 
 
 class WebSocketSender:
     """
     Real-time face sender using WebSocket connection.
     Maintains persistent connection for low-latency communication.
+
+    Pipelined: send_face / send_no_face return as soon as the frame is
+    written, so detection keeps running while up to WS_MAX_IN_FLIGHT frames
+    wait for the backend. A background reader matches each response to its
+    frame by sequence number and puts it on `results` (an asyncio.Queue);
+    responses for frames that timed out are dropped as stale.
     """
 
-    def __init__(self):
+    def __init__(self, max_in_flight=None, response_timeout=None):
         self.ws = None
         self.connected = False
+        self.binary = False  # True once the backend accepted binary frames
+        # Names this run to the backend, which keeps the liveness streak
+        # across reconnects of the same session
+        self.session = uuid.uuid4().hex
+        self.url = f"{BACKEND_WS_URL}?session={self.session}"
+
+        self.max_in_flight = max_in_flight or WS_MAX_IN_FLIGHT
+        self.response_timeout = response_timeout or WS_RESPONSE_TIMEOUT
+        self.results = asyncio.Queue()
+        self._seq = 0
+        self._in_flight = {}  # seq -> time.monotonic() when sent
+        self._reader = None
+
+        # Counters
+        self.sent = 0
+        self.skipped = 0   # frames not sent because max_in_flight were pending
+        self.stale = 0     # responses dropped (timed out or superseded)
 
     async def connect(self):
-        """Establish WebSocket connection to backend."""
+        """Establish WebSocket connection to backend (binary frames if it supports them)."""
         try:
             self.ws = await websockets.connect(
-                BACKEND_WS_URL,
+                self.url,
                 ping_interval=20,
                 ping_timeout=10,
+                subprotocols=[BINARY_SUBPROTOCOL] if WS_BINARY_FRAMES else None,
             )
             self.connected = True
-            print(f"[WebSocket] Connected to {BACKEND_WS_URL}")
+            # Older backends ignore the subprotocol: stay on JSON frames
+            self.binary = self.ws.subprotocol == BINARY_SUBPROTOCOL
+            self._in_flight.clear()
+            self._reader = asyncio.create_task(self._read_responses())
+            print(f"[WebSocket] Connected to {BACKEND_WS_URL} ({'binary' if self.binary else 'JSON'} frames)")
         except Exception as e:
             self.connected = False
             print(f"[WebSocket] Connection failed: {e}")
 
-    async def send_face(self, face_img, box, confidence, frame_height, face_count):
+    async def _read_responses(self):
+        """Background task: match responses to in-flight frames and queue them."""
+        try:
+            async for raw in self.ws:
+                response = json.loads(raw)
+                seq = response.get("seq")
+                if seq is None and self._in_flight:
+                    seq = min(self._in_flight)  # backend without seq echo answers in order
+
+                sent_at = self._in_flight.pop(seq, None)
+                if sent_at is None or time.monotonic() - sent_at > self.response_timeout:
+                    self.stale += 1
+                    continue
+                # The backend answers in order: older frames still pending were lost
+                for older in [s for s in self._in_flight if s < seq]:
+                    del self._in_flight[older]
+                    self.stale += 1
+
+                response["rtt_ms"] = round((time.monotonic() - sent_at) * 1000, 1)
+                self.results.put_nowait(response)
+        except websockets.exceptions.ConnectionClosed as e:
+            print(f"[WebSocket] Error: {e}, reconnecting...")
+        finally:
+            self.connected = False
+            self._in_flight.clear()
+
+    def _expire(self):
+        """Forget frames whose response is overdue; a late response is then stale."""
+        deadline = time.monotonic() - self.response_timeout
+        for seq in [s for s, sent_at in self._in_flight.items() if sent_at < deadline]:
+            del self._in_flight[seq]
+
+    async def _ready(self, capped=True):
+        """
+        Connect if needed; False if unavailable or (when `capped`)
+        max_in_flight frames are pending.
         """
-        Send a detected face to the backend for recognition.
+        if not self.connected:
+            await self.connect()
+            if not self.connected:
+                return False
+
+        self._expire()
+        if capped and len(self._in_flight) >= self.max_in_flight:
+            self.skipped += 1
+            return False
+        return True
+
+    async def _send(self, payload, seq):
+        """Write one frame and register it as in flight. Returns seq or None."""
+        self._in_flight[seq] = time.monotonic()
+        try:
+            await self.ws.send(payload)
+        except websockets.exceptions.ConnectionClosed as e:
+            print(f"[WebSocket] Error: {e}, reconnecting...")
+            self.connected = False
+            self._in_flight.pop(seq, None)
+            return None
+        self.sent += 1
+        return seq
+
+    def _next_seq(self):
+        self._seq = (self._seq + 1) & 0xFFFFFFFF
+        return self._seq
+
+    async def send_face(self, face_img, box, confidence, frame_height, face_count, track_id=None, frame=None):
+        """
+        Send a detected face to the backend for recognition (non-blocking).
+        The response arrives later on `results` with the same "seq".
 
         Args:
             face_img:      Cropped face image (numpy array)
@@ -62,73 +229,91 @@ class WebSocketSender:
             confidence:    Detection confidence
             frame_height:  Full frame height in pixels (for proximity rule)
             face_count:    Total faces detected this frame (for anti-tailgating rule)
+            track_id:      Pi-side track of this face (the backend keeps liveness
+                           state per track and echoes it); None = untracked
+            frame:         Full camera frame the face was cropped from; if
+                           given, a FULL_FRAME_WIDTH copy is sent along for
+                           the backend's anti-spoof model
 
         Returns:
-            dict with recognition result, or None on failure
+            seq of the frame sent, or None if skipped (not connected or too
+            many frames in flight)
         """
-        if not self.connected:
-            await self.connect()
-            if not self.connected:
-                return None
+        if not await self._ready():
+            return None
 
-        try:
-            x1, y1, x2, y2 = box
-            face_height = y2 - y1
-            face_height_ratio = face_height / frame_height if frame_height > 0 else 0.0
+        x1, y1, x2, y2 = box
+        face_height = y2 - y1
+        face_height_ratio = face_height / frame_height if frame_height > 0 else 0.0
+        seq = self._next_seq()
+        frame_jpeg, frame_scale = encode_full_frame(frame) if frame is not None else (b"", 0.0)
 
-            payload = json.dumps({
+        if self.binary:
+            payload = pack_frame(
+                MSG_RECOGNIZE, seq, time.time(), box, face_height_ratio,
+                face_count, confidence, encode_face_jpeg(face_img), track_id,
+                frame_jpeg, frame_scale,
+            )
+        else:
+            message = {
                 "type": "recognize",
                 "face": encode_face(face_img),
                 "box": list(box),
                 "confidence": confidence,
                 "face_height_ratio": round(face_height_ratio, 4),
                 "face_count": face_count,
+                "track_id": track_id,
+                "seq": seq,
                 "timestamp": time.time(),
-            })
+            }
+            if frame_jpeg:
+                message["frame"] = base64.b64encode(frame_jpeg).decode("utf-8")
+                message["frame_scale"] = frame_scale
+            payload = json.dumps(message)
 
-            await self.ws.send(payload)
-            response = await asyncio.wait_for(self.ws.recv(), timeout=5.0)
-            return json.loads(response)
-
-        except (websockets.exceptions.ConnectionClosed, asyncio.TimeoutError) as e:
-            print(f"[WebSocket] Error: {e}, reconnecting...")
-            self.connected = False
-            return None
+        return await self._send(payload, seq)
 
     async def send_no_face(self):
         """
         Notify backend that no face is currently in the frame.
         This triggers the Ghost Blink Fix (Security Rule 4) on the backend,
-        resetting the consecutive real-frames counter.
+        resetting the consecutive real-frames counter. It is never held back
+        by the in-flight cap: a dropped reset would let the streak survive
+        the face leaving the frame.
 
         Returns:
-            dict with backend acknowledgement, or None on failure
+            seq of the frame sent, or None if not connected (retry next loop)
         """
-        if not self.connected:
-            await self.connect()
-            if not self.connected:
-                return None
+        if not await self._ready(capped=False):
+            return None
 
-        try:
+        seq = self._next_seq()
+        if self.binary:
+            payload = pack_frame(MSG_NO_FACE, seq, time.time())
+        else:
             payload = json.dumps({
                 "type": "no_face",
+                "seq": seq,
                 "timestamp": time.time(),
             })
-            await self.ws.send(payload)
-            response = await asyncio.wait_for(self.ws.recv(), timeout=5.0)
-            return json.loads(response)
+        return await self._send(payload, seq)
 
-        except (websockets.exceptions.ConnectionClosed, asyncio.TimeoutError) as e:
-            print(f"[WebSocket] Error: {e}, reconnecting...")
-            self.connected = False
-            return None
+    def poll_results(self):
+        """All responses received since the last call (never blocks)."""
+        results = []
+        while not self.results.empty():
+            results.append(self.results.get_nowait())
+        return results
 
     async def close(self):
         """Close WebSocket connection."""
         if self.ws:
             await self.ws.close()
             self.connected = False
-            print("[WebSocket] Disconnected")
+            print(f"[WebSocket] Disconnected (sent {self.sent}, skipped {self.skipped}, "
+                  f"stale responses {self.stale})")
+        if self._reader:
+            self._reader.cancel()
 
 
 class HTTPSender:
@@ -155,11 +340,7 @@ class HTTPSender:
             dict with recognition result, or None on failure
         """
         try:
-            # Encode face as JPEG
-            encode_params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]
-            _, buffer = cv2.imencode(".jpg", face_img, encode_params)
-
-            files = {"image": ("face.jpg", buffer.tobytes(), "image/jpeg")}
+            files = {"image": ("face.jpg", encode_face_jpeg(face_img), "image/jpeg")}
             data = {
                 "box": json.dumps(list(box)),
                 "confidence": str(confidence),
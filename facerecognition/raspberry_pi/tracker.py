@@ -0,0 +1,226 @@
+"""
+Face tracker - links Haar boxes across frames into tracks.
+
+Each detection is matched to an existing track by IoU (greedy, best pairs
+first), then by centroid distance for fast movers whose boxes no longer
+overlap. Unmatched detections start new tracks; tracks without a match for
+TRACK_MAX_MISSED frames are dropped.
+
+Between sends a track keeps only its best crop (crop_quality: size x
+sharpness x frontalness), so the backend gets one good image per person per
+SEND_INTERVAL instead of whatever the last frame happened to contain. Crops
+the detector rejected (blurry, badly exposed) are never picked; a track with
+no acceptable crop in the window is not sent at all. The
+track ID is sent with the frame and echoed in the response: the backend keeps
+liveness state per track, and once a track is validated and matched it is
+only re-sent every TRACK_IDENTIFIED_RESEND seconds.
+"""
+
+import math
+from face_detector import iou
+from config import (
+    TRACK_IOU_THRESHOLD,
+    TRACK_MAX_DISTANCE,
+    TRACK_MAX_MISSED,
+    TRACK_IDENTIFIED_RESEND,
+)
+
+
+def _xywh(box):
+    x1, y1, x2, y2 = box
+    return x1, y1, x2 - x1, y2 - y1
+
+
+def _centroid(box):
+    x1, y1, x2, y2 = box
+    return (x1 + x2) / 2, (y1 + y2) / 2
+
+
+class Track:
+    """One person followed across frames."""
+
+    def __init__(self, track_id, face_data):
+        self.id = track_id
+        self.box = face_data["box"]
+        self.hits = 0
+        self.missed = 0
+        self.best = None            # best face dict since the last send
+        self.best_quality = -1.0
+        self.last_sent = 0.0
+        self.identified = None      # name once the backend validated and matched the track
+        self.update(face_data)
+
+    def update(self, face_data):
+        """Follow the track to a new detection; keep the crop if it is the best so far."""
+        self.box = face_data["box"]
+        self.hits += 1
+        self.missed = 0
+        quality = face_data["quality"]
+        if not quality["reject"] and quality["score"] > self.best_quality:
+            self.best = face_data
+            self.best_quality = quality["score"]
+
+    def take_best(self):
+        """
+        Best crop of the send window; the next window starts empty.
+
+        Returns:
+            face dict from FaceDetector.detect(), or None
+        """
+        best = self.best
+        self.best = None
+        self.best_quality = -1.0
+        return best
+
+
+class FaceTracker:
+    """
+    Lightweight IoU / centroid tracker for Haar detections.
+
+    Usage:
+        tracker = FaceTracker()
+        faces = detector.detect(frame)
+        tracker.update(faces)                  # adds "track_id" to each face
+        for track in tracker.due(time.time()):
+            face = track.take_best()
+            ...send face with track.id...
+        tracker.on_result(response)            # backend response with "track_id"
+    """
+
+    def __init__(self, iou_threshold=None, max_missed=None):
+        self.iou_threshold = iou_threshold or TRACK_IOU_THRESHOLD
+        self.max_missed = max_missed or TRACK_MAX_MISSED
+        self.tracks = {}            # track_id -> Track
+        self._next_id = 1           # 0 means "no track" on the wire
+
+        # Counters
+        self.created = 0
+        self.suppressed = 0         # sends skipped for already identified tracks
+        self.avoided = 0            # sends skipped because every crop in the window was rejected
+
+    def _new_id(self):
+        track_id = self._next_id
+        self._next_id = self._next_id % 0xFFFFFFFF + 1
+        return track_id
+
+    def _match(self, faces):
+        """
+        Assign detections to tracks.
+
+        Returns:
+            dict face index -> track_id
+        """
+        pairs = []
+        for i, face in enumerate(faces):
+            for track_id, track in self.tracks.items():
+                overlap = iou(_xywh(face["box"]), _xywh(track.box))
+                if overlap >= self.iou_threshold:
+                    pairs.append((overlap, i, track_id))
+
+        matches, used = {}, set()
+        for _, i, track_id in sorted(pairs, reverse=True):
+            if i not in matches and track_id not in used:
+                matches[i] = track_id
+                used.add(track_id)
+
+        # Centroid fallback for boxes that moved too far to overlap
+        for i, face in enumerate(faces):
+            if i in matches:
+                continue
+            cx, cy = _centroid(face["box"])
+            best_id, best_dist = None, None
+            for track_id, track in self.tracks.items():
+                if track_id in used:
+                    continue
+                tx, ty = _centroid(track.box)
+                dist = math.hypot(cx - tx, cy - ty)
+                limit = TRACK_MAX_DISTANCE * (track.box[2] - track.box[0])
+                if dist <= limit and (best_dist is None or dist < best_dist):
+                    best_id, best_dist = track_id, dist
+            if best_id is not None:
+                matches[i] = best_id
+                used.add(best_id)
+
+        return matches
+
+    def update(self, faces):
+        """
+        Update tracks with this frame's detections.
+
+        Args:
+            faces: list of face dicts from FaceDetector.detect(); each gets a
+                   "track_id" key
+
+        Returns:
+            list of the tracks seen in this frame
+        """
+        matches = self._match(faces)
+        seen = []
+        for i, face in enumerate(faces):
+            track_id = matches.get(i)
+            if track_id is None:
+                track_id = self._new_id()
+                self.tracks[track_id] = Track(track_id, face)
+                self.created += 1
+            else:
+                self.tracks[track_id].update(face)
+            face["track_id"] = track_id
+            seen.append(self.tracks[track_id])
+
+        seen_ids = {track.id for track in seen}
+        for track_id in list(self.tracks):
+            if track_id not in seen_ids:
+                track = self.tracks[track_id]
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    del self.tracks[track_id]
+
+        return seen
+
+    def due(self, now):
+        """
+        Tracks to send this interval: every track seen in the current frame
+        with an acceptable crop, except identified ones until
+        TRACK_IDENTIFIED_RESEND has passed.
+        """
+        tracks = []
+        for track in self.tracks.values():
+            if track.missed:
+                continue
+            if track.best is None:
+                self.avoided += 1
+                continue
+            if track.identified and now - track.last_sent < TRACK_IDENTIFIED_RESEND:
+                self.suppressed += 1
+                track.take_best()  # the next send should carry a fresh crop
+                continue
+            tracks.append(track)
+        return tracks
+
+    def on_result(self, result):
+        """Mark a track identified (or not) from a backend response carrying its track_id."""
+        track = self.tracks.get(result.get("track_id"))
+        if track is None or "is_validated" not in result:
+            return
+        if result.get("is_validated") and result.get("matched"):
+            track.identified = result.get("name")
+        else:
+            track.identified = None
+
+    def reset_identified(self):
+        """Make every track send again (e.g. the number of people in view changed)."""
+        for track in self.tracks.values():
+            track.identified = None
+
+    def stats(self):
+        """
+        Returns:
+            dict with active tracks, tracks created, suppressed sends
+            (identified) and avoided sends (no acceptable crop)
+        """
+        return {
+            "active": len(self.tracks),
+            "created": self.created,
+            "suppressed": self.suppressed,
+            "avoided": self.avoided,
+        }
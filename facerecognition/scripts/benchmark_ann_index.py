@@ -0,0 +1,101 @@
+"""
+Benchmark the approximate (IVF) face index against exact search.
+
+Builds a FaceDatabase of synthetic unit-norm 512-d embeddings, queries it with
+noisy copies of enrolled identities (like real camera frames) and reports
+recall@1 against exact search plus median / p99 latency for each nprobe.
+The databases, and the enrolled_faces directory FaceDatabase creates, live in
+a temporary directory: nothing is written to backend/data.
+
+Usage:
+    python benchmark_ann_index.py
+    python benchmark_ann_index.py --size 200000 --nprobe 4 8 16 32 --noise 0.8
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend import face_database
+from backend.face_database import FaceDatabase, ExactIndex, IVFIndex, EMBEDDING_DIM
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark IVF vs exact face search")
+    parser.add_argument("--size", type=int, default=100_000, help="Number of enrolled identities")
+    parser.add_argument("--queries", type=int, default=1000, help="Number of queries")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64],
+                        help="IVF lists scanned per query")
+    parser.add_argument("--noise", type=float, default=0.6,
+                        help="Query noise norm relative to the unit embedding")
+    return parser.parse_args()
+
+
+def random_unit(n, rng):
+    x = rng.standard_normal((n, EMBEDDING_DIM)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def build_database(db_path, people, index):
+    """FaceDatabase holding `people` (one bulk checkpoint, no per-enroll log write)."""
+    db = FaceDatabase(db_path=db_path, index=index)
+    db.enroll_many(people)
+    return db
+
+
+def run(db, queries):
+    """Returns (best match names, per-query latencies in ms)."""
+    names, times = [], []
+    for q in queries:
+        start = time.perf_counter()
+        result = db.recognize(q, threshold=0.0)
+        times.append((time.perf_counter() - start) * 1000)
+        names.append(result["name"])
+    return names, np.array(times)
+
+
+def main():
+    args = parse_args()
+    rng = np.random.default_rng(0)
+
+    embeddings = random_unit(args.size, rng)
+    picks = rng.integers(0, args.size, args.queries)
+    queries = embeddings[picks] + args.noise * random_unit(args.queries, rng)
+    people = {f"person_{i:06d}": [emb] for i, emb in enumerate(embeddings)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        face_database.ENROLLED_FACES_DIR = os.path.join(tmp, "enrolled_faces")
+        start = time.perf_counter()
+        exact_db = build_database(os.path.join(tmp, "exact.json"), people, ExactIndex())
+        exact_s = time.perf_counter() - start
+        truth, exact_times = run(exact_db, queries)
+
+        # min_size=0: the bulk checkpoint trains the index
+        ivf = IVFIndex(min_size=0)
+        start = time.perf_counter()
+        ivf_db = build_database(os.path.join(tmp, "ivf.json"), people, ivf)
+        ivf_s = time.perf_counter() - start
+
+        print("=" * 64)
+        print(f"  IVF vs exact search: {args.size} identities, {args.queries} queries")
+        print(f"  {len(ivf.centroids)} lists, built + trained in {ivf_s:.2f} s (exact build {exact_s:.2f} s)")
+        print("=" * 64)
+        print(f"{'index':>12} | {'recall@1':>8} | {'median ms':>9} | {'p99 ms':>8}")
+        print("-" * 64)
+        print(f"{'exact':>12} | {1.0:8.4f} | {np.median(exact_times):9.3f} | "
+              f"{np.percentile(exact_times, 99):8.3f}")
+
+        for nprobe in args.nprobe:
+            ivf.nprobe = nprobe
+            names, times = run(ivf_db, queries)
+            recall = np.mean([a == b for a, b in zip(names, truth)])
+            print(f"{'ivf/' + str(nprobe):>12} | {recall:8.4f} | {np.median(times):9.3f} | "
+                  f"{np.percentile(times, 99):8.3f}")
+
+
+if __name__ == "__main__":
+    main()
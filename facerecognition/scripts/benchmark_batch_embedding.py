@@ -0,0 +1,104 @@
+"""
+Benchmark batched vs. sequential embedding extraction (FaceRecognizer).
+
+Times N enrollment-style images through:
+  - sequential:  full buffalo_l FaceAnalysis.get() per image (the old /enroll
+                 path: detection, genderage, 2D/3D landmarks and one ArcFace
+                 call each; FaceRecognizer.app now loads fewer modules, so it
+                 is built separately here)
+  - batched:     FaceRecognizer.get_embeddings_batch() (detection per image,
+                 one batched ArcFace call)
+
+Runs on whatever GPU_DEVICE_ID in backend/config.py selects (-1 = CPU with
+ONNX Runtime).
+
+Usage:
+    python benchmark_batch_embedding.py --image path/to/face.jpg
+    python benchmark_batch_embedding.py --image face.jpg --count 15 --repeats 5
+
+Results: not measured yet. The batched path and RECOGNITION_BATCH_SIZE = 32
+were written without InsightFace models or ONNX Runtime at hand, so the
+speedup is unverified. Record the output here (hardware, GPU_DEVICE_ID,
+--count) after the first run.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Set OpenMP fix BEFORE any CV2/Numpy imports!
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+import cv2
+import numpy as np
+from insightface.app import FaceAnalysis
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.config import INSIGHTFACE_MODEL, GPU_DEVICE_ID, DETECTION_SIZE
+from backend.face_recognizer import FaceRecognizer
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark batched embedding extraction")
+    parser.add_argument("--image", required=True, help="Face image (JPEG/PNG)")
+    parser.add_argument("--count", type=int, default=15, help="Images per enrollment (default: 15)")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per mode")
+    return parser.parse_args()
+
+
+def sequential(full_pack, images):
+    """The old path: full FaceAnalysis.get() per image."""
+    embeddings = []
+    for img in images:
+        faces = full_pack.get(img)
+        if faces:
+            embeddings.append(faces[0].embedding / np.linalg.norm(faces[0].embedding))
+    return embeddings
+
+
+def time_ms(fn, repeats):
+    fn()  # warm-up (ONNX Runtime allocates on first run)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times))
+
+
+def main():
+    args = parse_args()
+    img = cv2.imread(args.image)
+    if img is None:
+        print(f"ERROR: Cannot read image: {args.image}")
+        sys.exit(1)
+
+    # Slightly different copies so nothing can be cached between images
+    images = [cv2.convertScaleAbs(img, alpha=1.0, beta=i % 5) for i in range(args.count)]
+
+    # The old /enroll model: every module of the pack (INSIGHTFACE_MODULES not applied)
+    providers = ["CUDAExecutionProvider", "CPUExecutionProvider"] if GPU_DEVICE_ID >= 0 else ["CPUExecutionProvider"]
+    full_pack = FaceAnalysis(name=INSIGHTFACE_MODEL, providers=providers)
+    full_pack.prepare(ctx_id=GPU_DEVICE_ID, det_size=DETECTION_SIZE)
+    recognizer = FaceRecognizer()
+
+    seq_ms = time_ms(lambda: sequential(full_pack, images), args.repeats)
+    batch_ms = time_ms(lambda: recognizer.get_embeddings_batch(images), args.repeats)
+
+    # Both paths must agree on the embeddings
+    seq = sequential(full_pack, images)
+    batch = [e for e in recognizer.get_embeddings_batch(images) if e is not None]
+    agreement = min(float(np.dot(a, b)) for a, b in zip(seq, batch)) if seq and batch else float("nan")
+
+    print("=" * 50)
+    print(f"  {args.count} images, median of {args.repeats} runs")
+    print("=" * 50)
+    print(f"  Sequential FaceAnalysis.get : {seq_ms:8.1f} ms ({seq_ms / args.count:.1f} ms/image)")
+    print(f"  get_embeddings_batch        : {batch_ms:8.1f} ms ({batch_ms / args.count:.1f} ms/image)")
+    print(f"  Speedup                     : {seq_ms / batch_ms:8.2f}x")
+    print(f"  Min cosine(sequential, batch): {agreement:.4f}")
+
+
+if __name__ == "__main__":
+    main()
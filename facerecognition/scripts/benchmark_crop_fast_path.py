@@ -0,0 +1,89 @@
+"""
+Benchmark per-frame embedding latency for Pi face crops.
+
+Compares, on the same Haar-style face crop:
+  - before:  full buffalo_l FaceAnalysis.get() (SCRFD at DETECTION_SIZE plus
+             genderage, 2D/3D landmarks and ArcFace), as get_embedding used to do
+  - full:    FaceRecognizer.get_embedding(img)            (detector at DETECTION_SIZE + ArcFace)
+  - crop:    FaceRecognizer.get_embedding(img, crop=True) (detector at CROP_DETECTION_SIZE + ArcFace)
+
+Usage:
+    python benchmark_crop_fast_path.py --image path/to/face_crop.jpg
+    python benchmark_crop_fast_path.py --image crop.jpg --frames 200
+
+Results: not measured yet. The crop fast path and CROP_DETECTION_SIZE =
+(160, 160) were written without InsightFace models at hand, so neither the
+latency gain nor how often the small detector misses (and falls back to
+DETECTION_SIZE) is verified. Record the output here (hardware,
+GPU_DEVICE_ID, crop size) after the first run.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Set OpenMP fix BEFORE any CV2/Numpy imports!
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+import cv2
+import numpy as np
+from insightface.app import FaceAnalysis
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.config import INSIGHTFACE_MODEL, GPU_DEVICE_ID, DETECTION_SIZE, CROP_DETECTION_SIZE
+from backend.face_recognizer import FaceRecognizer
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the face-crop fast path")
+    parser.add_argument("--image", required=True, help="Cropped face image, like the Pi sends")
+    parser.add_argument("--frames", type=int, default=100, help="Timed frames per mode")
+    return parser.parse_args()
+
+
+def time_ms(fn, frames):
+    for _ in range(3):
+        fn()  # warm-up
+    times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return np.median(times), np.percentile(times, 99)
+
+
+def main():
+    args = parse_args()
+    crop = cv2.imread(args.image)
+    if crop is None:
+        print(f"ERROR: Cannot read image: {args.image}")
+        sys.exit(1)
+
+    providers = ["CUDAExecutionProvider", "CPUExecutionProvider"] if GPU_DEVICE_ID >= 0 else ["CPUExecutionProvider"]
+    full_pack = FaceAnalysis(name=INSIGHTFACE_MODEL, providers=providers)
+    full_pack.prepare(ctx_id=GPU_DEVICE_ID, det_size=DETECTION_SIZE)
+    recognizer = FaceRecognizer()
+
+    upscaled = FaceRecognizer._upscale_small(crop)
+    results = {
+        "before (all modules)": time_ms(lambda: full_pack.get(upscaled), args.frames),
+        f"full  det {DETECTION_SIZE[0]}": time_ms(lambda: recognizer.get_embedding(crop), args.frames),
+        f"crop  det {CROP_DETECTION_SIZE[0]}": time_ms(lambda: recognizer.get_embedding(crop, crop=True), args.frames),
+    }
+
+    faces = full_pack.get(upscaled)
+    fast = recognizer.get_embedding(crop, crop=True)
+    if faces and fast is not None:
+        ref = faces[0].embedding / np.linalg.norm(faces[0].embedding)
+        print(f"\nCosine(before, crop fast path): {float(np.dot(ref, fast)):.4f}")
+
+    print("=" * 50)
+    print(f"  Per-frame latency, {crop.shape[1]}x{crop.shape[0]} crop, {args.frames} frames")
+    print("=" * 50)
+    for name, (median, p99) in results.items():
+        print(f"  {name:<22}: median {median:7.2f} ms | p99 {p99:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark Haar detection at several detection scales on a recorded clip.
+
+Runs raspberry_pi FaceDetector (motion gate off, so every frame is scanned)
+over the same frames at each DETECTION_SCALE and reports:
+  - FPS of detect() (cascade + full-resolution crops)
+  - recall: fraction of the native-resolution (scale 1.0) boxes that are
+    found again (IoU >= --iou) at that scale
+  - extra: boxes not present at scale 1.0
+
+Usage:
+    python benchmark_detection_scale.py --video door_clip.mp4
+    python benchmark_detection_scale.py --video clip.mp4 --scales 1.0 0.75 0.5 0.33 --max-frames 300
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import cv2
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from raspberry_pi.face_detector import FaceDetector, iou
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark Haar detection scale")
+    parser.add_argument("--video", required=True, help="Recorded clip (any format OpenCV can read)")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1.0, 0.75, 0.5, 0.33],
+                        help="Detection scales to compare (1.0 is the reference)")
+    parser.add_argument("--max-frames", type=int, default=500, help="Frames read from the clip")
+    parser.add_argument("--iou", type=float, default=0.4, help="IoU that counts as the same face")
+    return parser.parse_args()
+
+
+def load_frames(path, max_frames):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def run(frames, scale):
+    """Returns (per-frame lists of (x, y, w, h) boxes, FPS)."""
+    detector = FaceDetector(motion_gate=False, detection_scale=scale)
+    boxes = []
+    start = time.perf_counter()
+    for frame in frames:
+        faces = detector.detect(frame)
+        boxes.append([(x1, y1, x2 - x1, y2 - y1) for (x1, y1, x2, y2) in (f["box"] for f in faces)])
+    return boxes, len(frames) / (time.perf_counter() - start)
+
+
+def main():
+    args = parse_args()
+    frames = load_frames(args.video, args.max_frames)
+    if not frames:
+        print(f"ERROR: Cannot read video: {args.video}")
+        sys.exit(1)
+
+    reference, _ = run(frames, 1.0)
+    total = sum(len(b) for b in reference)
+
+    results = []
+    for scale in args.scales:
+        boxes, fps = run(frames, scale)
+        found = extra = 0
+        for ref, got in zip(reference, boxes):
+            found += sum(any(iou(r, g) >= args.iou for g in got) for r in ref)
+            extra += sum(all(iou(g, r) < args.iou for r in ref) for g in got)
+        results.append((scale, fps, found / total if total else float("nan"), extra))
+
+    h, w = frames[0].shape[:2]
+    print("=" * 60)
+    print(f"  {len(frames)} frames at {w}x{h}, {total} faces at scale 1.0")
+    print("=" * 60)
+    print(f"{'scale':>6} | {'FPS':>7} | {'recall':>7} | {'extra':>6}")
+    print("-" * 60)
+    for scale, fps, recall, extra in results:
+        print(f"{scale:>6.2f} | {fps:7.1f} | {recall:7.3f} | {extra:>6}")
+
+
+if __name__ == "__main__":
+    main()
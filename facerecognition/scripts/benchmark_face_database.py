@@ -0,0 +1,102 @@
+"""
+Benchmark FaceDatabase lookup latency.
+
+Compares the vectorized embedding matrix used by FaceDatabase.recognize /
+search_top_k against the old per-person Python loop, on synthetic unit-norm
+512-d embeddings. The databases, and the enrolled_faces directory FaceDatabase
+creates, live in a temporary directory: nothing is written to backend/data.
+
+Usage:
+    python benchmark_face_database.py
+    python benchmark_face_database.py --sizes 100 10000 100000 --queries 200
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend import face_database
+from backend.face_database import FaceDatabase, EMBEDDING_DIM
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark face database search")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 100_000],
+                        help="Number of enrolled identities to test")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per size")
+    parser.add_argument("--legacy-queries", type=int, default=5,
+                        help="Queries per size for the slow per-person loop")
+    return parser.parse_args()
+
+
+def random_unit(n, rng):
+    x = rng.standard_normal((n, EMBEDDING_DIM)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def legacy_recognize(people, query):
+    """The original loop: one np.array() + dot per enrolled person."""
+    query = np.array(query)
+    query = query / np.linalg.norm(query)
+    best_name, best_score = "unknown", 0.0
+    for name, person in people.items():
+        similarity = float(np.dot(query, np.array(person["embedding"])))
+        if similarity > best_score:
+            best_name, best_score = name, similarity
+    return best_name, best_score
+
+
+def time_ms(fn, queries):
+    times = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        times.append((time.perf_counter() - start) * 1000)
+    return np.median(times), np.percentile(times, 99)
+
+
+def main():
+    args = parse_args()
+    rng = np.random.default_rng(0)
+
+    print("=" * 78)
+    print("  FaceDatabase lookup benchmark (median / p99 ms per query)")
+    print("=" * 78)
+    print(f"{'identities':>10} | {'legacy loop':>16} | {'recognize':>16} | {'search_top_k(5)':>16}")
+    print("-" * 78)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        face_database.ENROLLED_FACES_DIR = os.path.join(tmp, "enrolled_faces")
+        for n in args.sizes:
+            embeddings = random_unit(n, rng)
+            # Queries are noisy copies of enrolled people, like real frames
+            picks = rng.integers(0, n, args.queries)
+            queries = embeddings[picks] + 0.05 * random_unit(args.queries, rng)
+
+            names = [f"person_{i:06d}" for i in range(n)]
+            db = FaceDatabase(db_path=os.path.join(tmp, f"db_{n}.json"))
+            db.enroll_many({name: [emb] for name, emb in zip(names, embeddings)})
+            legacy_people = {
+                name: {"embedding": emb.tolist()}
+                for name, emb in zip(names, embeddings)
+            }
+
+            legacy = time_ms(lambda q: legacy_recognize(legacy_people, q),
+                             queries[:args.legacy_queries])
+            rec = time_ms(db.recognize, queries)
+            top = time_ms(lambda q: db.search_top_k(q, k=5), queries)
+
+            print(f"{n:>10} | {legacy[0]:7.3f} / {legacy[1]:6.3f} | "
+                  f"{rec[0]:7.3f} / {rec[1]:6.3f} | {top[0]:7.3f} / {top[1]:6.3f}")
+
+            # Sanity check: both paths agree on the winner
+            name, _ = legacy_recognize(legacy_people, queries[0])
+            assert db.recognize(queries[0], threshold=0.0)["name"] == name
+
+
+if __name__ == "__main__":
+    main()
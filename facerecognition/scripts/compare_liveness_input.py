@@ -0,0 +1,95 @@
+"""
+Compare MiniFASNet confidences for the two liveness inputs (LIVENESS_INPUT).
+
+LIVENESS_STRICT_THRESHOLD was tuned with MiniFASNet seeing the whole padded
+Haar crop ("crop"); the single-pass pipeline gives it the detector's face box
+("detected"). Run this on face crops saved from the Pi, sorted into real
+people and spoofs (photos, screens), to see whether the threshold still
+separates them before relying on "detected".
+
+For each input it reports how many real crops pass the threshold, how many
+spoofs get through, and the median confidence of each set, plus the lowest
+threshold at which "detected" lets no more spoofs through than "crop" does
+at LIVENESS_STRICT_THRESHOLD.
+
+Usage:
+    python compare_liveness_input.py --real crops/real --spoof crops/spoof
+    python compare_liveness_input.py --real crops/real --spoof crops/spoof --threshold 0.85
+"""
+
+import os
+import sys
+import glob
+import argparse
+
+# Set OpenMP fix BEFORE any CV2/Numpy imports!
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.config import LIVENESS_STRICT_THRESHOLD
+from backend.face_recognizer import FaceRecognizer
+from backend.face_pipeline import FacePipeline, FrameRequest
+
+INPUTS = ("crop", "detected")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare MiniFASNet inputs on labelled face crops")
+    parser.add_argument("--real", required=True, help="Directory of crops of real people")
+    parser.add_argument("--spoof", required=True, help="Directory of crops of photos / screens")
+    parser.add_argument("--threshold", type=float, default=LIVENESS_STRICT_THRESHOLD,
+                        help="Confidence cutoff to evaluate (default LIVENESS_STRICT_THRESHOLD)")
+    return parser.parse_args()
+
+
+def load_crops(directory):
+    paths = sorted(p for ext in ("jpg", "jpeg", "png") for p in glob.glob(os.path.join(directory, f"*.{ext}")))
+    crops = [cv2.imread(p) for p in paths]
+    return [c for c in crops if c is not None]
+
+
+def real_confidences(pipeline, crops):
+    """Confidence that each crop is real (0 when MiniFASNet calls it fake)."""
+    analyses = pipeline.analyze_batch([FrameRequest(face_img=c) for c in crops])
+    return np.array([a.spoof.confidence if a.spoof.is_real else 0.0 for a in analyses])
+
+
+def main():
+    args = parse_args()
+    real, spoof = load_crops(args.real), load_crops(args.spoof)
+    if not real or not spoof:
+        print("ERROR: Need at least one real and one spoof crop")
+        sys.exit(1)
+
+    recognizer = FaceRecognizer()
+    scores = {}
+    for kind in INPUTS:
+        pipeline = FacePipeline(recognizer, liveness_input=kind)
+        scores[kind] = (real_confidences(pipeline, real), real_confidences(pipeline, spoof))
+
+    print("=" * 72)
+    print(f"  MiniFASNet input comparison: {len(real)} real, {len(spoof)} spoof crops, "
+          f"threshold {args.threshold:.2f}")
+    print("=" * 72)
+    print(f"{'input':>10} | {'real passed':>11} | {'spoofs passed':>13} | {'median real':>11} | {'median spoof':>12}")
+    print("-" * 72)
+    for kind in INPUTS:
+        r, s = scores[kind]
+        print(f"{kind:>10} | {np.mean(r >= args.threshold):11.1%} | {np.mean(s >= args.threshold):13.1%} | "
+              f"{np.median(r):11.3f} | {np.median(s):12.3f}")
+
+    # Lowest "detected" threshold that lets no more spoofs through than "crop" does
+    allowed = int(np.sum(scores["crop"][1] >= args.threshold))
+    detected_real, detected_spoof = scores["detected"]
+    ranked = np.sort(detected_spoof)[::-1]
+    matched = float(np.nextafter(ranked[allowed], 1.0)) if allowed < len(ranked) else 0.0
+    print("-" * 72)
+    print(f"  'detected' needs a threshold of {matched:.3f} to let through at most {allowed} spoof(s) "
+          f"(real passed: {np.mean(detected_real >= matched):.1%})")
+
+
+if __name__ == "__main__":
+    main()
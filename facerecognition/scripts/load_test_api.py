@@ -0,0 +1,103 @@
+"""
+Load test: health-check latency under recognition load.
+
+Measures GET / latency on an idle server, then again while --clients threads
+hammer POST /recognize with a face image. With the blocking work on the
+worker pool the health check should stay flat; saturated requests come back
+as 503 (back-pressure) instead of piling up.
+
+Start the backend first (python api.py), then:
+
+Usage:
+    python load_test_api.py --image path/to/face.jpg
+    python load_test_api.py --image face.jpg --clients 32 --duration 20
+"""
+
+import sys
+import time
+import argparse
+import threading
+import requests
+import numpy as np
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Health-check latency under recognition load")
+    parser.add_argument("--server", default="http://localhost:8000", help="Backend server URL")
+    parser.add_argument("--image", required=True, help="Face image sent to /recognize")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent /recognize clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per phase")
+    parser.add_argument("--interval", type=float, default=0.05, help="Seconds between health checks")
+    return parser.parse_args()
+
+
+def probe_health(server, duration, interval):
+    """GET / repeatedly for `duration` seconds; returns latencies in ms."""
+    times = []
+    session = requests.Session()
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        start = time.perf_counter()
+        session.get(f"{server}/", timeout=30)
+        times.append((time.perf_counter() - start) * 1000)
+        time.sleep(interval)
+    return np.array(times)
+
+
+def recognize_client(server, image_bytes, stop, counts, lock):
+    session = requests.Session()
+    files = {"image": ("face.jpg", image_bytes, "image/jpeg")}
+    while not stop.is_set():
+        try:
+            status = session.post(f"{server}/recognize", files=files, timeout=60).status_code
+        except requests.RequestException:
+            status = "error"
+        with lock:
+            counts[status] = counts.get(status, 0) + 1
+
+
+def report(name, times):
+    print(f"  {name:<16}: median {np.median(times):7.2f} ms | p99 {np.percentile(times, 99):7.2f} ms | "
+          f"max {times.max():7.2f} ms ({len(times)} probes)")
+
+
+def main():
+    args = parse_args()
+    with open(args.image, "rb") as f:
+        image_bytes = f.read()
+
+    try:
+        requests.get(f"{args.server}/", timeout=5)
+    except requests.RequestException:
+        print(f"ERROR: Cannot connect to {args.server}. Is the backend running?")
+        sys.exit(1)
+
+    idle = probe_health(args.server, args.duration, args.interval)
+
+    stop = threading.Event()
+    counts, lock = {}, threading.Lock()
+    clients = [
+        threading.Thread(target=recognize_client, args=(args.server, image_bytes, stop, counts, lock), daemon=True)
+        for _ in range(args.clients)
+    ]
+    for t in clients:
+        t.start()
+    loaded = probe_health(args.server, args.duration, args.interval)
+    stop.set()
+    for t in clients:
+        t.join()
+
+    print("=" * 70)
+    print(f"  GET / latency, idle vs. {args.clients} /recognize clients ({args.duration:.0f} s each)")
+    print("=" * 70)
+    report("idle", idle)
+    report("under load", loaded)
+    total = sum(counts.values())
+    print(f"  /recognize      : {total} requests ({total / args.duration:.1f}/s), status counts {counts}")
+
+    stats = requests.get(f"{args.server}/stats", timeout=5).json()
+    print(f"  Worker pool     : {stats.get('pool')}")
+
+
+if __name__ == "__main__":
+    main()
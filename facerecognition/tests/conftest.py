@@ -0,0 +1,52 @@
+"""
+Shared pytest setup: backend modules import each other flat (`from config
+import ...`), like when api.py is started from backend/. Raspberry Pi modules
+do the same with their own config.py; load them with import_pi().
+
+Run from facerecognition/:  python -m pytest tests
+"""
+
+import os
+import sys
+import importlib
+
+import numpy as np
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT_DIR, "backend")
+PI_DIR = os.path.join(ROOT_DIR, "raspberry_pi")
+sys.path.insert(0, BACKEND_DIR)
+
+
+def import_pi(name):
+    """
+    Import a raspberry_pi module (as when main.py runs from raspberry_pi/).
+
+    Its `from config import ...` sees raspberry_pi/config.py; the backend's
+    config module is put back afterwards. None of the Pi module names clash
+    with backend ones.
+    """
+    backend_config = sys.modules.pop("config", None)
+    sys.path.insert(0, PI_DIR)
+    try:
+        return importlib.import_module(name)
+    finally:
+        sys.path.remove(PI_DIR)
+        sys.modules.pop("config", None)
+        if backend_config is not None:
+            sys.modules["config"] = backend_config
+
+
+def unit_vector(seed, dim=512):
+    """Deterministic random unit-norm embedding."""
+    v = np.random.default_rng(seed).normal(size=dim).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """face_db.json path in a temp dir; enrolled face images go there too."""
+    import face_database
+    monkeypatch.setattr(face_database, "ENROLLED_FACES_DIR", str(tmp_path / "enrolled_faces"))
+    return str(tmp_path / "face_db.json")
@@ -0,0 +1,194 @@
+"""Audit index: keyset pagination, filters, cursors, rebuild and rotation."""
+
+import os
+from datetime import datetime
+
+import pytest
+
+import audit_logger
+from audit_logger import AuditLogger, INDEX_NAME, list_segments
+from audit_index import decode_cursor
+
+
+@pytest.fixture
+def log_dir(tmp_path):
+    return str(tmp_path / "audit")
+
+
+@pytest.fixture
+def make_logger(log_dir, tmp_path):
+    loggers = []
+
+    def make():
+        logger = AuditLogger(log_dir=log_dir, legacy_path=str(tmp_path / "no_legacy.json"), index=True)
+        loggers.append(logger)
+        return logger
+
+    yield make
+    for logger in loggers:
+        logger.close()
+
+
+@pytest.fixture
+def frozen_clock(monkeypatch):
+    """Every log_event gets the same timestamp (events within one clock tick)."""
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls(2026, 10, 18, 12, 0, 0)
+
+    monkeypatch.setattr(audit_logger, "datetime", FrozenDatetime)
+
+
+def all_pages(logger, limit, **filters):
+    events, cursor, pages = [], None, 0
+    while True:
+        page = logger.query(limit=limit, cursor=cursor, **filters)
+        events += page["events"]
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return events, pages
+
+
+def log_numbered(logger, n, person="alice", event_type="DOOR_UNLOCK_SUCCESS"):
+    return [logger.log_event(event_type, person, 0.5, f"{person} {i}") for i in range(n)]
+
+
+def test_pages_over_equal_timestamps_have_no_gaps_or_duplicates(make_logger, frozen_clock):
+    logger = make_logger()
+    entries = log_numbered(logger, 25)
+
+    events, pages = all_pages(logger, limit=4)
+    assert pages == 7
+    # Ties on ts are broken by insertion order, newest first
+    assert events == entries[::-1]
+
+
+def test_page_boundary_on_the_last_event(make_logger):
+    logger = make_logger()
+    entries = log_numbered(logger, 6)
+
+    page = logger.query(limit=3)
+    assert page["events"] == entries[:2:-1]
+    page = logger.query(limit=3, cursor=page["next_cursor"])
+    assert page["events"] == entries[2::-1]
+    assert page["next_cursor"] is None
+
+
+def test_filters_with_pagination(make_logger, frozen_clock):
+    logger = make_logger()
+    alice = log_numbered(logger, 5, person="alice")
+    bob = log_numbered(logger, 7, person="bob")
+    failed = log_numbered(logger, 3, person="UNKNOWN", event_type="DOOR_UNLOCK_FAILED")
+
+    assert all_pages(logger, limit=2, person="bob")[0] == bob[::-1]
+    assert all_pages(logger, limit=2, event_type="DOOR_UNLOCK_FAILED")[0] == failed[::-1]
+    assert all_pages(logger, limit=2, person="alice", event_type="DOOR_UNLOCK_FAILED")[0] == []
+    assert all_pages(logger, limit=3, person="alice")[0] == alice[::-1]
+
+    summary = logger.summary()
+    assert summary["total"] == 15
+    assert summary["by_person"] == {"bob": 7, "alice": 5, "UNKNOWN": 3}
+
+
+def test_time_window(make_logger):
+    logger = make_logger()
+    entries = log_numbered(logger, 10)
+
+    start, end = entries[2]["timestamp"], entries[6]["timestamp"]
+    events, _ = all_pages(logger, limit=2, start=start, end=end)
+    assert events == entries[6:1:-1]
+
+
+@pytest.mark.parametrize("cursor", ["", "abc", "12.5", "12.5:x", "x:3"])
+def test_malformed_cursor_is_a_value_error(make_logger, cursor):
+    logger = make_logger()
+    log_numbered(logger, 2)
+
+    with pytest.raises(ValueError, match="malformed cursor"):
+        decode_cursor(cursor)
+    with pytest.raises(ValueError, match="malformed cursor"):
+        logger.query(cursor=cursor)
+
+
+def test_deleted_index_is_rebuilt_from_the_segments(make_logger, log_dir, monkeypatch):
+    monkeypatch.setattr(audit_logger, "AUDIT_ROTATE_BYTES", 800)
+    logger = make_logger()
+    entries = []
+    for _ in range(4):
+        entries += log_numbered(logger, 5)
+        logger.flush()
+    logger.close()
+    assert len(list_segments(log_dir)) > 1
+
+    for suffix in ("", "-wal", "-shm"):
+        path = os.path.join(log_dir, INDEX_NAME + suffix)
+        if os.path.exists(path):
+            os.remove(path)
+
+    logger = make_logger()
+    assert logger.index.stats()["events"] == 20
+    assert all_pages(logger, limit=6)[0] == entries[::-1]
+
+
+def test_index_follows_rotation(make_logger, log_dir, monkeypatch):
+    monkeypatch.setattr(audit_logger, "AUDIT_ROTATE_BYTES", 600)
+    logger = make_logger()
+    entries = []
+    for _ in range(6):
+        entries += log_numbered(logger, 4)
+        logger.flush()
+        # Pages stay readable right after each rotation: rows point at the
+        # renamed segment, not at the new active one
+        assert all_pages(logger, limit=5)[0] == entries[::-1]
+
+    assert logger.rotations >= 2
+    index_names = {name for name, in logger.index._conn.execute("SELECT name FROM segments")}
+    assert index_names == {os.path.basename(path) for _, path in list_segments(log_dir)}
+
+
+def test_catch_up_forgets_pruned_segments(make_logger, log_dir, monkeypatch):
+    monkeypatch.setattr(audit_logger, "AUDIT_ROTATE_BYTES", 600)
+    logger = make_logger()
+    entries = []
+    for _ in range(4):
+        entries += log_numbered(logger, 4)
+        logger.flush()
+    logger.close()
+    assert len(list_segments(log_dir)) > 1
+
+    oldest = list_segments(log_dir)[0][1]
+    with open(oldest, encoding="utf-8") as f:
+        dropped = sum(1 for _ in f)
+    os.remove(oldest)
+
+    logger = make_logger()
+    assert all_pages(logger, limit=5)[0] == entries[dropped:][::-1]
+
+
+def test_audit_endpoint_rejects_a_malformed_cursor(make_logger):
+    pytest.importorskip("httpx")
+    fastapi = pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+    from audit_api import create_audit_router
+
+    class InlinePool:
+        async def run(self, fn, *args):
+            return fn(*args)
+
+    logger = make_logger()
+    log_numbered(logger, 3)
+    app = fastapi.FastAPI()
+    app.include_router(create_audit_router(logger, InlinePool()))
+    client = TestClient(app)
+
+    response = client.get("/audit", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    assert "malformed cursor" in response.json()["detail"]
+
+    assert client.get("/audit", params={"limit": 0}).status_code == 400
+    page = client.get("/audit", params={"limit": 2}).json()
+    assert len(page["events"]) == 2
+    assert len(client.get("/audit", params={"cursor": page["next_cursor"]}).json()["events"]) == 1
@@ -0,0 +1,168 @@
+"""AuditLogger: background writer, rotation, torn-line recovery, streaming reads."""
+
+import os
+import json
+
+import pytest
+
+import audit_logger
+from audit_logger import AuditLogger, ACTIVE_NAME, list_segments, read_events
+
+
+@pytest.fixture
+def log_dir(tmp_path):
+    return str(tmp_path / "audit")
+
+
+@pytest.fixture
+def make_logger(log_dir, tmp_path):
+    loggers = []
+
+    def make(**kwargs):
+        kwargs.setdefault("legacy_path", str(tmp_path / "no_legacy.json"))
+        kwargs.setdefault("index", False)
+        logger = AuditLogger(log_dir=log_dir, **kwargs)
+        loggers.append(logger)
+        return logger
+
+    yield make
+    for logger in loggers:
+        logger.close()
+
+
+def log_many(logger, n, person="alice"):
+    return [logger.log_event("DOOR_UNLOCK_SUCCESS", person, 0.5 + i / 1000, f"event {i}") for i in range(n)]
+
+
+def test_events_are_written_as_json_lines(make_logger, log_dir):
+    logger = make_logger()
+    entries = log_many(logger, 3)
+    logger.flush()
+
+    lines = open(os.path.join(log_dir, ACTIVE_NAME), encoding="utf-8").read().splitlines()
+    assert [json.loads(line) for line in lines] == entries
+    assert logger.stats()["written"] == 3
+
+
+def test_close_drains_the_queue(make_logger, log_dir):
+    logger = make_logger()
+    entries = log_many(logger, 500)
+    logger.close()
+
+    assert list(read_events(log_dir=log_dir)) == entries
+    assert logger.stats()["queued"] == 0
+    # Batched: far fewer fsyncs than events
+    assert logger.stats()["batches"] < 500
+
+
+def test_log_event_after_close_is_written_synchronously(make_logger, log_dir):
+    logger = make_logger()
+    logger.close()
+    entry = logger.log_event("DOOR_UNLOCK_FAILED", "UNKNOWN", 0.2)
+    assert list(read_events(log_dir=log_dir)) == [entry]
+
+
+def test_size_rotation_keeps_every_event_in_order(make_logger, log_dir, monkeypatch):
+    monkeypatch.setattr(audit_logger, "AUDIT_ROTATE_BYTES", 1000)
+    logger = make_logger()
+    entries = []
+    for _ in range(10):
+        entries += log_many(logger, 10)
+        logger.flush()  # one batch per round, so each round can rotate
+
+    segments = list_segments(log_dir)
+    assert logger.rotations >= 5
+    assert len(segments) == logger.rotations + (1 if os.path.exists(os.path.join(log_dir, ACTIVE_NAME)) else 0)
+    rotated = [path for _, path in segments if not path.endswith(ACTIVE_NAME)]
+    assert rotated == sorted(rotated)
+
+    # Each rotated segment is named after its first event
+    for start, path in segments:
+        first = json.loads(open(path, encoding="utf-8").readline())
+        if start is not None:
+            assert start == audit_logger._parse_time(first["timestamp"])
+
+    assert list(read_events(log_dir=log_dir)) == entries
+
+
+def test_age_rotation(make_logger, log_dir, monkeypatch):
+    monkeypatch.setattr(audit_logger, "AUDIT_ROTATE_SECONDS", 0)
+    logger = make_logger()
+    log_many(logger, 2)
+    logger.flush()
+    log_many(logger, 2)
+    logger.flush()
+
+    assert logger.rotations == 2
+    assert len(list(read_events(log_dir=log_dir))) == 4
+
+
+def test_time_range_reads_skip_nothing_inside_the_range(make_logger, log_dir, monkeypatch):
+    monkeypatch.setattr(audit_logger, "AUDIT_ROTATE_BYTES", 600)
+    logger = make_logger()
+    entries = []
+    for _ in range(8):
+        entries += log_many(logger, 5)
+        logger.flush()
+
+    start, end = entries[12]["timestamp"], entries[30]["timestamp"]
+    assert list(read_events(start=start, end=end, log_dir=log_dir)) == entries[12:31]
+    assert list(read_events(end=entries[0]["timestamp"], log_dir=log_dir)) == entries[:1]
+
+
+def test_filters(make_logger):
+    logger = make_logger()
+    log_many(logger, 3, person="alice")
+    bob = log_many(logger, 2, person="bob")
+    failed = logger.log_event("DOOR_UNLOCK_FAILED", "UNKNOWN", 0.1)
+
+    assert list(logger.read_events(person="bob")) == bob
+    assert list(logger.read_events(event_type="DOOR_UNLOCK_FAILED")) == [failed]
+
+
+def test_torn_last_line_is_repaired_before_appending(make_logger, log_dir):
+    logger = make_logger()
+    before = log_many(logger, 2)
+    logger.close()
+
+    # Crash in the middle of a write
+    with open(os.path.join(log_dir, ACTIVE_NAME), "ab") as f:
+        f.write(b'{"timestamp": "2026-10-18T12:00:00", "event_ty')
+
+    logger = make_logger()
+    after = log_many(logger, 2)
+    logger.flush()
+
+    assert list(read_events(log_dir=log_dir)) == before + after
+    lines = open(os.path.join(log_dir, ACTIVE_NAME), "rb").read().splitlines()
+    assert all(json.loads(line) for line in lines)
+
+
+def test_reader_skips_a_torn_line(log_dir):
+    os.makedirs(log_dir)
+    good = {"timestamp": "2026-10-18T12:00:00", "event_type": "X", "person": "a", "score": 0.0, "details": ""}
+    with open(os.path.join(log_dir, ACTIVE_NAME), "w", encoding="utf-8") as f:
+        f.write(json.dumps(good) + "\n" + '{"timestamp": "2026-10-18T12:00:01", "ev')
+    assert list(read_events(log_dir=log_dir)) == [good]
+
+
+def test_legacy_json_is_migrated_once(make_logger, log_dir, tmp_path):
+    legacy = tmp_path / "audit_log.json"
+    old = [
+        {"timestamp": "2025-01-01T10:00:00", "event_type": "DOOR_UNLOCK_SUCCESS",
+         "person": "old", "score": 0.9, "details": ""},
+        {"timestamp": "2025-01-02T10:00:00", "event_type": "DOOR_UNLOCK_FAILED",
+         "person": "UNKNOWN", "score": 0.1, "details": ""},
+    ]
+    legacy.write_text(json.dumps(old))
+
+    logger = make_logger(legacy_path=str(legacy))
+    new = log_many(logger, 1)
+    logger.flush()
+
+    assert not legacy.exists()
+    assert (tmp_path / "audit_log.json.migrated").exists()
+    assert list(read_events(log_dir=log_dir)) == old + new
+
+    make_logger(legacy_path=str(legacy))  # nothing left to migrate
+    assert list(read_events(log_dir=log_dir)) == old + new
@@ -0,0 +1,335 @@
+"""FaceDatabase crash recovery: change log replay, torn records, checkpoints, migration."""
+
+import os
+import json
+
+import numpy as np
+import pytest
+
+import face_database
+from face_database import FaceDatabase, binary_paths, log_path
+from conftest import unit_vector
+
+
+def open_db(db_path, **kwargs):
+    return FaceDatabase(db_path=db_path, storage_format="binary", shared=False, **kwargs)
+
+
+def names(db):
+    return sorted(p["name"] for p in db.get_all_people())
+
+
+@pytest.fixture
+def no_compaction(monkeypatch):
+    monkeypatch.setattr(face_database, "FACE_DB_COMPACT_EVERY", 10_000)
+
+
+def test_torn_last_log_record_is_truncated(db_path, no_compaction):
+    db = open_db(db_path)
+    db.enroll("alice", [unit_vector(1)])
+    db.enroll("bob", [unit_vector(2)])
+    intact = os.path.getsize(log_path(db_path))
+
+    # Crash in the middle of appending a third record
+    with open(log_path(db_path), "ab") as f:
+        f.write(b'{"seq": 3, "op": "put", "name": "car')
+
+    db = open_db(db_path)
+    assert names(db) == ["alice", "bob"]
+    assert db.version == 2
+    assert os.path.getsize(log_path(db_path)) == intact
+
+    # New records go after the intact ones and survive a restart
+    db.enroll("carol", [unit_vector(3)])
+    db = open_db(db_path)
+    assert names(db) == ["alice", "bob", "carol"]
+    assert db.recognize(unit_vector(3))["name"] == "carol"
+
+
+def test_replay_after_crash_before_checkpoint(db_path, no_compaction):
+    db = open_db(db_path)
+    db.enroll("alice", [unit_vector(1)])
+    db.enroll("bob", [unit_vector(2)])
+    db.remove_person("alice")
+    assert not os.path.exists(binary_paths(db_path)[1])  # nothing checkpointed yet
+
+    db = open_db(db_path)
+    assert names(db) == ["bob"]
+    assert db.version == 3
+    assert db.recognize(unit_vector(2))["name"] == "bob"
+    assert not db.recognize(unit_vector(1))["matched"]
+
+
+def test_checkpoint_before_log_truncation_is_not_replayed_twice(db_path, no_compaction):
+    db = open_db(db_path)
+    db.enroll("alice", [unit_vector(1)])
+    db.enroll("bob", [unit_vector(2)])
+    db.remove_person("alice")
+    stale_log = open(log_path(db_path), "rb").read()
+
+    with db._lock:
+        db._checkpoint()
+    # Crash after the checkpoint was committed but before the log was emptied
+    with open(log_path(db_path), "wb") as f:
+        f.write(stale_log)
+
+    db = open_db(db_path)
+    assert names(db) == ["bob"]
+    assert db.version == 3
+    assert db._log_pending == 0  # every record was already in the checkpoint
+
+    db.enroll("carol", [unit_vector(3)])
+    db = open_db(db_path)
+    assert names(db) == ["bob", "carol"]
+    assert db.version == 4
+
+
+def test_compaction_writes_a_new_checkpoint_and_empties_the_log(db_path, monkeypatch):
+    monkeypatch.setattr(face_database, "FACE_DB_COMPACT_EVERY", 2)
+    db = open_db(db_path)
+    db.enroll("alice", [unit_vector(1)])
+    db.enroll("bob", [unit_vector(2)])
+
+    meta = json.load(open(binary_paths(db_path)[1]))
+    assert meta["log_seq"] == 2
+    assert list(meta["people"]) == ["alice", "bob"]
+    assert os.path.getsize(log_path(db_path)) == 0
+    assert names(open_db(db_path)) == ["alice", "bob"]
+
+
+def test_interrupted_checkpoint_keeps_the_previous_one(db_path, no_compaction, monkeypatch):
+    db = open_db(db_path)
+    db.enroll("alice", [unit_vector(1)])
+    with db._lock:
+        db._checkpoint()
+    db.enroll("bob", [unit_vector(2)])
+    committed_meta = open(binary_paths(db_path)[1], "rb").read()
+
+    # Crash at the commit point: the new embedding block is written, the
+    # sidecar rename never happens
+    real_replace = os.replace
+
+    def failing_replace(src, dst):
+        if dst.endswith(".meta.json"):
+            raise OSError("simulated crash")
+        return real_replace(src, dst)
+
+    monkeypatch.setattr(face_database.os, "replace", failing_replace)
+    with pytest.raises(OSError), db._lock:
+        db._checkpoint()
+    monkeypatch.setattr(face_database.os, "replace", real_replace)
+
+    # The old sidecar is untouched and still points at its own block
+    assert open(binary_paths(db_path)[1], "rb").read() == committed_meta
+    db = open_db(db_path)
+    assert names(db) == ["alice", "bob"]
+    assert db.recognize(unit_vector(2))["name"] == "bob"
+
+
+def test_migrates_legacy_json(db_path):
+    legacy = {
+        "people": {
+            # Oldest files: one averaged embedding per person
+            "alice": {"embedding": unit_vector(1).tolist(), "num_samples": 5,
+                      "enrolled_at": "2026-01-01T10:00:00", "updated_at": "2026-01-01T10:00:00"},
+            "bob": {"templates": [unit_vector(2).tolist(), unit_vector(3).tolist()], "num_samples": 8,
+                    "enrolled_at": "2026-01-02T10:00:00", "updated_at": "2026-01-02T10:00:00"},
+        }
+    }
+    with open(db_path, "w", encoding="utf-8") as f:
+        json.dump(legacy, f)
+    original = open(db_path, "rb").read()
+
+    db = open_db(db_path)
+    assert names(db) == ["alice", "bob"]
+    people = {p["name"]: p for p in db.get_all_people()}
+    assert people["alice"]["num_templates"] == 1
+    assert people["bob"]["num_templates"] == 2
+    assert db.recognize(unit_vector(1))["name"] == "alice"
+    assert db.recognize(unit_vector(3))["name"] == "bob"
+
+    # Binary checkpoint written, legacy file left untouched
+    assert os.path.exists(binary_paths(db_path)[1])
+    assert open(db_path, "rb").read() == original
+
+    # Second start loads the binary files, not the JSON again
+    db.enroll("carol", [unit_vector(4)])
+    assert names(open_db(db_path)) == ["alice", "bob", "carol"]
+
+
+def test_reloaded_templates_match_exactly(db_path, no_compaction):
+    db = open_db(db_path)
+    db.enroll("alice", [unit_vector(1), unit_vector(2), unit_vector(3)])
+    before = db._person_templates("alice")
+
+    reopened = open_db(db_path)
+    np.testing.assert_array_equal(reopened._person_templates("alice"), before)
+
+
+def test_enroll_many_writes_one_checkpoint(db_path, no_compaction):
+    db = open_db(db_path)
+    db.enroll("alice", [unit_vector(1)])
+    version = db.version
+
+    assert db.enroll_many({f"p{i}": [unit_vector(10 + i)] for i in range(20)}) == 20
+    assert db.version == version + 1
+    assert os.path.getsize(log_path(db_path)) == 0
+
+    db = open_db(db_path)
+    assert len(names(db)) == 21
+    assert db.recognize(unit_vector(15))["name"] == "p5"
+    assert db.recognize(unit_vector(1))["name"] == "alice"
+
+
+# ── IVF index ───────────────────────────────────────────────────────────
+
+def ivf_pair(db_path, index, people):
+    """(exact DB, IVF DB) holding the same people."""
+    exact = FaceDatabase(db_path=os.path.join(os.path.dirname(db_path), "exact.json"),
+                         storage_format="binary", shared=False, index=face_database.ExactIndex())
+    ivf = open_db(db_path, index=index)
+    exact.enroll_many(people)
+    ivf.enroll_many(people)
+    return exact, ivf
+
+
+def noisy(seed, noise=0.5):
+    q = unit_vector(seed) + noise * unit_vector(10_000 + seed)
+    return q / np.linalg.norm(q)
+
+
+def test_ivf_below_min_size_searches_exactly(db_path):
+    index = face_database.IVFIndex(min_size=1000, nprobe=1)
+    exact, ivf = ivf_pair(db_path, index, {f"p{i}": [unit_vector(i)] for i in range(50)})
+
+    assert not index.is_trained
+    flat, _ = ivf._flat_templates()
+    rows, _ = index.score(flat, unit_vector(3))
+    assert rows is None  # every row scored
+    for seed in range(20):
+        assert ivf.search_top_k(noisy(seed), k=3) == exact.search_top_k(noisy(seed), k=3)
+
+
+def test_ivf_probing_every_list_matches_exact(db_path):
+    index = face_database.IVFIndex(min_size=0)
+    exact, ivf = ivf_pair(db_path, index, {f"p{i}": [unit_vector(i)] for i in range(300)})
+
+    assert index.is_trained
+    index.nprobe = len(index.centroids)
+    for seed in range(0, 300, 7):
+        assert ivf.recognize(noisy(seed), threshold=0.0) == exact.recognize(noisy(seed), threshold=0.0)
+        assert ivf.search_top_k(noisy(seed), k=5) == exact.search_top_k(noisy(seed), k=5)
+
+
+def test_ivf_follows_enroll_and_remove(db_path, no_compaction):
+    index = face_database.IVFIndex(min_size=0, nprobe=2)
+    _, ivf = ivf_pair(db_path, index, {f"p{i}": [unit_vector(i)] for i in range(100)})
+    assert index.is_trained and index._lists is None
+
+    ivf.recognize(unit_vector(0))
+    assert index._lists is not None
+
+    # A new person is assigned to its nearest list and found right away
+    ivf.enroll("newcomer", [unit_vector(5000)])
+    assert index._lists is None  # lists rebuilt on the next search
+    assert ivf.recognize(unit_vector(5000))["name"] == "newcomer"
+
+    # Removing p10 moves the last row (newcomer) into its slot: p10 is gone,
+    # newcomer is still found under its new row
+    assert ivf._names[-1] == "newcomer"
+    ivf.remove_person("p10")
+    assert index._lists is None
+    assert ivf.recognize(unit_vector(10))["name"] != "p10"
+    assert ivf.recognize(unit_vector(5000))["name"] == "newcomer"
+
+    # Re-enrolling with another embedding re-assigns the row
+    ivf.enroll("p20", [unit_vector(6000)])
+    assert ivf.recognize(unit_vector(6000))["name"] == "p20"
+
+
+def test_ivf_retrains_when_the_database_doubles(db_path):
+    index = face_database.IVFIndex(min_size=0)
+    _, ivf = ivf_pair(db_path, index, {f"p{i}": [unit_vector(i)] for i in range(100)})
+    first = index.centroids
+
+    ivf.enroll_many({f"q{i}": [unit_vector(1000 + i)] for i in range(50)})
+    assert index.centroids is first  # 150 < 2 * 100: lists are kept
+
+    ivf.enroll_many({f"r{i}": [unit_vector(2000 + i)] for i in range(60)})
+    assert index.centroids is not first
+    assert index._trained_size == 210
+
+
+# ── Multi-template matching ─────────────────────────────────────────────
+
+def samples_around(seed, n, noise=0.1):
+    """n noisy unit-norm samples of one pose / lighting condition."""
+    rows = [unit_vector(seed) + noise * unit_vector(100_000 + seed * 100 + i) for i in range(n)]
+    return [r / np.linalg.norm(r) for r in rows]
+
+
+def test_select_templates_keeps_one_per_cluster_largest_first():
+    embeddings = samples_around(1, 4) + samples_around(2, 3) + samples_around(3, 2)
+    templates = face_database.select_templates(embeddings, 3)
+
+    assert templates.shape == (3, 512)
+    np.testing.assert_allclose(np.linalg.norm(templates, axis=1), 1.0, rtol=1e-5)
+    for template, seed in zip(templates, (1, 2, 3)):
+        assert float(template @ unit_vector(seed)) > 0.95
+
+
+def test_select_templates_with_few_embeddings_keeps_them_all():
+    embeddings = [2.0 * unit_vector(1), unit_vector(2)]
+    templates = face_database.select_templates(embeddings, 3)
+    np.testing.assert_allclose(templates, [unit_vector(1), unit_vector(2)], atol=1e-6)
+
+    mean = face_database.select_templates(embeddings, 1)
+    assert mean.shape == (1, 512)
+    expected = unit_vector(1) + unit_vector(2)
+    np.testing.assert_allclose(mean[0], expected / np.linalg.norm(expected), atol=1e-6)
+
+
+def test_enroll_and_update_keep_at_most_max_templates(db_path, no_compaction):
+    db = open_db(db_path)
+    assert db.max_templates == face_database.FACE_DB_MAX_TEMPLATES
+
+    db.enroll("alice", samples_around(1, 5) + samples_around(2, 5) + samples_around(3, 5) + samples_around(4, 5))
+    assert len(db._person_templates("alice")) == db.max_templates
+    db.update("alice", samples_around(5, 10))
+    person = db.get_all_people()[0]
+    assert person["num_templates"] == db.max_templates
+    assert person["num_samples"] == 30
+    # The new, largest pose got a template of its own
+    assert db.recognize(unit_vector(5))["name"] == "alice"
+
+
+def test_top_m_mean_scoring(db_path, no_compaction):
+    db = open_db(db_path)
+    db.template_scoring, db.top_m = "top_m_mean", 2
+    templates = [unit_vector(1), unit_vector(2), unit_vector(3)]
+    db.enroll("alice", templates)
+    db.enroll("bob", [unit_vector(4)])
+
+    query = unit_vector(1) + unit_vector(2)
+    query /= np.linalg.norm(query)
+    best_two = sorted((float(t @ query) for t in templates), reverse=True)[:2]
+    score = {r["name"]: r["score"] for r in db.search_top_k(query, k=2)}
+    assert score["alice"] == pytest.approx(np.mean(best_two), abs=1e-4)
+
+    # bob has one template: its score is that template's, not halved by an empty slot
+    assert score["bob"] == pytest.approx(float(unit_vector(4) @ query), abs=1e-4)
+
+    db.template_scoring = "max"
+    assert db.search_top_k(query, k=1)[0]["score"] == pytest.approx(best_two[0], abs=1e-4)
+
+
+@pytest.mark.parametrize("scoring", ["max", "top_m_mean"])
+def test_empty_template_slots_never_match(db_path, no_compaction, scoring):
+    db = open_db(db_path)
+    db.template_scoring = scoring
+    db.enroll("alice", [unit_vector(1)])   # one template, the other slots are zero rows
+
+    # Opposite of alice's only template: an empty slot would score 0.0 and win
+    result = db.search_top_k(-unit_vector(1), k=1)
+    assert result[0]["name"] == "alice"
+    assert result[0]["score"] == pytest.approx(-1.0, abs=1e-4)
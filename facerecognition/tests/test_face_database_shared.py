@@ -0,0 +1,96 @@
+"""Shared mode: two FaceDatabase instances (as two API workers) on one directory."""
+
+import pytest
+
+import face_database
+from face_database import FaceDatabase
+from conftest import unit_vector
+
+pytestmark = pytest.mark.skipif(face_database.fcntl is None, reason="shared mode needs fcntl (POSIX)")
+
+
+@pytest.fixture
+def workers(db_path):
+    return (
+        FaceDatabase(db_path=db_path, storage_format="binary", shared=True),
+        FaceDatabase(db_path=db_path, storage_format="binary", shared=True),
+    )
+
+
+def test_enroll_is_seen_by_the_other_worker(workers):
+    a, b = workers
+    a.enroll("alice", [unit_vector(1)])
+
+    match = b.recognize(unit_vector(1))
+    assert match["matched"] and match["name"] == "alice"
+    assert [p["name"] for p in b.get_all_people()] == ["alice"]
+
+
+def test_remove_is_seen_by_the_other_worker(workers):
+    a, b = workers
+    a.enroll("alice", [unit_vector(1)])
+    assert b.recognize(unit_vector(1))["matched"]
+
+    b.remove_person("alice")
+    assert not a.recognize(unit_vector(1))["matched"]
+    assert a.get_all_people() == []
+
+
+def test_update_is_seen_by_the_other_worker(workers):
+    a, b = workers
+    a.enroll("alice", [unit_vector(1)])
+    b.update("alice", [unit_vector(2)])
+
+    people = a.get_all_people()
+    assert people[0]["num_samples"] == 2
+    assert a.recognize(unit_vector(2))["name"] == "alice"
+
+
+def test_clear_is_seen_by_the_other_worker(workers):
+    a, b = workers
+    a.enroll("alice", [unit_vector(1)])
+    a.enroll("bob", [unit_vector(2)])
+    assert len(b.get_all_people()) == 2
+
+    a.clear()
+    assert b.get_all_people() == []
+    assert not b.recognize(unit_vector(2))["matched"]
+
+    # Writes after the new checkpoint are tailed again
+    b.enroll("carol", [unit_vector(3)])
+    assert a.recognize(unit_vector(3))["name"] == "carol"
+
+
+def test_compaction_in_one_worker_is_picked_up_by_the_other(workers, monkeypatch):
+    monkeypatch.setattr(face_database, "FACE_DB_COMPACT_EVERY", 3)
+    a, b = workers
+    for i in range(7):
+        a.enroll(f"p{i}", [unit_vector(i)])
+
+    assert len(b.get_all_people()) == 7
+    assert b.recognize(unit_vector(5))["name"] == "p5"
+    b.remove_person("p0")
+    assert len(a.get_all_people()) == 6
+
+
+def test_version_needs_a_sync_current_version_does_not(workers):
+    a, b = workers
+    a.enroll("alice", [unit_vector(1)])
+    b.recognize(unit_vector(1))
+    seen = b.version
+
+    a.remove_person("alice")
+    # `version` is what this worker last applied: stale until its next call
+    assert b.version == seen
+    # current_version() syncs first, so caches keyed on it get invalidated
+    assert b.current_version() == a.version > seen
+
+
+def test_enroll_many_is_seen_by_the_other_worker(workers):
+    a, b = workers
+    a.enroll("alice", [unit_vector(1)])
+    assert b.recognize(unit_vector(1))["matched"]
+
+    a.enroll_many({"bob": [unit_vector(2)], "carol": [unit_vector(3)]})
+    assert len(b.get_all_people()) == 3
+    assert b.recognize(unit_vector(3))["name"] == "carol"
@@ -0,0 +1,91 @@
+"""Pi FaceDetector scan scheduling: motion gate, ROI scans, forced full scans."""
+
+import cv2
+import numpy as np
+import pytest
+
+from conftest import import_pi
+
+pytestmark = pytest.mark.skipif(not hasattr(cv2, "CascadeClassifier"), reason="OpenCV built without objdetect")
+
+face_detector = import_pi("face_detector")
+
+FACE = (260, 180, 80, 80)           # tracked face (x, y, w, h)
+NEWCOMER = (40, 300, 80, 80)        # far outside the face's ROI
+
+
+@pytest.fixture
+def detector(monkeypatch):
+    """FaceDetector whose cascade reports the faces in `detector.people` (no Haar)."""
+    monkeypatch.setattr(face_detector, "DETECTION_FULL_SCAN_EVERY", 10)
+    detector = face_detector.FaceDetector(motion_gate=True, quality_reject=False)
+    detector.people = [FACE]
+    detector.calls = []
+
+    def cascade(gray, offset=(0, 0)):
+        full = offset == (0, 0) and gray.shape == (480, 640)
+        detector.calls.append("full" if full else "roi")
+        ox, oy = offset
+        h, w = gray.shape[:2]
+        return [r for r in detector.people
+                if r[0] >= ox and r[1] >= oy and r[0] + r[2] <= ox + w and r[1] + r[3] <= oy + h]
+
+    detector._cascade = cascade
+    return detector
+
+
+def frame(*moving):
+    """Gray 640x480 BGR frame with a bright square on each (x, y, w, h) box."""
+    img = np.full((480, 640, 3), 90, dtype=np.uint8)
+    for x, y, w, h in moving:
+        img[y:y + h, x:x + w] = 220
+    return img
+
+
+def shifted(box, dx):
+    x, y, w, h = box
+    return (x + dx, y, w, h)
+
+
+def test_motion_inside_the_roi_scans_only_the_roi(detector):
+    detector.detect(frame(FACE))
+    assert detector.calls == ["full"]
+
+    detector.detect(frame(shifted(FACE, 6)))
+    assert detector.calls == ["full", "roi"]
+    assert detector.stats()["outside_motion_scans"] == 0
+
+
+def test_static_frame_reuses_the_boxes(detector):
+    detector.detect(frame(FACE))
+    faces = detector.detect(frame(FACE))
+    assert detector.calls == ["full"]
+    assert len(faces) == 1
+    assert detector.stats()["static_skips"] == 1
+
+
+def test_motion_outside_the_rois_forces_a_full_scan(detector):
+    detector.detect(frame(FACE))
+    detector.detect(frame(shifted(FACE, 6)))
+
+    # Someone walks in far from the tracked face: seen on this very frame
+    detector.people = [FACE, NEWCOMER]
+    faces = detector.detect(frame(shifted(FACE, 6), NEWCOMER))
+    assert detector.calls == ["full", "roi", "full"]
+    assert len(faces) == 2
+    assert detector.stats()["outside_motion_scans"] == 1
+
+
+def test_full_scan_request_overrides_roi_and_motion_gate(detector):
+    detector.detect(frame(FACE))
+    detector.detect(frame(FACE), full_scan=True)            # no motion at all
+    detector.detect(frame(shifted(FACE, 6)), full_scan=True)  # motion inside the ROI
+    assert detector.calls == ["full", "full", "full"]
+
+
+def test_periodic_full_scan(detector, monkeypatch):
+    monkeypatch.setattr(face_detector, "DETECTION_FULL_SCAN_EVERY", 3)
+    detector.detect(frame(FACE))
+    for dx in (4, 8, 12):
+        detector.detect(frame(shifted(FACE, dx)))
+    assert detector.calls == ["full", "roi", "roi", "full"]
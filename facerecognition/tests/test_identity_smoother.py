@@ -0,0 +1,123 @@
+"""IdentitySmoother: dHash reuse, refresh interval, EMA restarts, match cache, counters."""
+
+import cv2
+import numpy as np
+import pytest
+
+import identity_smoother
+from identity_smoother import IdentitySmoother, dhash, hash_distance
+from conftest import unit_vector
+
+
+def crop(seed, noise=0):
+    """Smooth synthetic 'face' crop; `noise` adds small per-pixel jitter."""
+    rng = np.random.default_rng(seed)
+    img = cv2.GaussianBlur(rng.uniform(0, 255, (96, 96)).astype(np.float32), (0, 0), 8)
+    img = cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX)
+    if noise:
+        img = img + np.random.default_rng(seed + 1).uniform(-noise, noise, img.shape)
+    gray = np.clip(img, 0, 255).astype(np.uint8)
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(identity_smoother.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    counters = dict.fromkeys(identity_smoother._stats, 0)
+    monkeypatch.setattr(identity_smoother, "_stats", counters)
+    return counters
+
+
+def test_dhash_is_stable_under_jitter_and_differs_between_faces():
+    assert hash_distance(dhash(crop(1)), dhash(crop(1, noise=2))) <= identity_smoother.IDENTITY_HASH_DISTANCE
+    assert hash_distance(dhash(crop(1)), dhash(crop(2))) > identity_smoother.IDENTITY_HASH_DISTANCE
+
+
+def test_needs_embedding_has_no_side_effects(stats, clock):
+    smoother = IdentitySmoother()
+    assert smoother.needs_embedding(crop(1))
+    assert smoother.needs_embedding(crop(1))
+    assert smoother.embedding is None
+    assert stats["embedded"] == stats["reused"] == 0
+
+
+def test_unchanged_crop_reuses_the_embedding(stats, clock):
+    smoother = IdentitySmoother()
+    smoother.update(unit_vector(1), crop(1))
+    assert stats["embedded"] == 1
+
+    assert not smoother.needs_embedding(crop(1, noise=2))
+    smoother.reuse()
+    assert smoother.needs_embedding(crop(2))
+    assert stats["reused"] == 1
+    assert identity_smoother.identity_stats()["reuse_rate"] == 0.5
+
+
+def test_refresh_interval_forces_a_new_embedding(clock):
+    smoother = IdentitySmoother()
+    smoother.update(unit_vector(1), crop(1))
+
+    clock[0] += identity_smoother.IDENTITY_REFRESH_SECONDS - 0.1
+    assert not smoother.needs_embedding(crop(1))
+    clock[0] += 0.2
+    assert smoother.needs_embedding(crop(1))
+
+    smoother.update(unit_vector(1), crop(1))
+    assert not smoother.needs_embedding(crop(1))
+
+
+def test_similar_embeddings_are_averaged(stats, clock):
+    smoother = IdentitySmoother()
+    a = unit_vector(1)
+    b = a + 0.3 * unit_vector(2)
+    b /= np.linalg.norm(b)
+    smoother.update(a, crop(1))
+    smoother.update(b, crop(1))
+
+    alpha = identity_smoother.IDENTITY_EMA_ALPHA
+    expected = alpha * b + (1 - alpha) * a
+    np.testing.assert_allclose(smoother.embedding, expected / np.linalg.norm(expected), atol=1e-6)
+    assert smoother.frames == 2
+    assert stats["resets"] == 0
+
+
+def test_low_similarity_restarts_the_average(stats, clock):
+    smoother = IdentitySmoother()
+    smoother.update(unit_vector(1), crop(1))
+    smoother.update(unit_vector(1), crop(1))
+    smoother.update(unit_vector(2), crop(2))   # someone else under the same track
+
+    np.testing.assert_allclose(smoother.embedding, unit_vector(2), atol=1e-6)
+    assert smoother.frames == 1
+    assert stats["resets"] == 1
+
+
+def test_match_is_cached_per_database_version_and_embedding(stats, clock):
+    smoother = IdentitySmoother()
+    smoother.update(unit_vector(1), crop(1))
+    assert smoother.cached_match(3) is None
+
+    smoother.set_match({"name": "alice", "score": 0.9, "matched": True}, 3)
+    assert smoother.cached_match(3)["name"] == "alice"
+    assert smoother.cached_match(4) is None          # database changed
+
+    smoother.update(unit_vector(1), crop(1))
+    assert smoother.cached_match(3) is None          # new embedding
+    assert stats["match_reused"] == 1
+
+
+def test_reset_forgets_everything(clock):
+    smoother = IdentitySmoother()
+    smoother.update(unit_vector(1), crop(1))
+    smoother.set_match({"name": "alice", "score": 0.9, "matched": True}, 1)
+    smoother.reset()
+
+    assert smoother.embedding is None
+    assert smoother.needs_embedding(crop(1))
+    assert smoother.cached_match(1) is None
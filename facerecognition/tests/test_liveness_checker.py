@@ -0,0 +1,111 @@
+"""Liveness rule chain: cheap rules short-circuit MiniFASNet, rule order."""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("uniface")
+
+import liveness_checker
+from liveness_checker import LivenessChecker, RULE_LIVENESS, RULE_LOCKDOWN, RULE_PROXIMITY
+
+FACE = np.zeros((112, 112, 3), dtype=np.uint8)
+NEAR = 0.2                                          # face_height_ratio well under the proximity limit
+TOO_CLOSE = liveness_checker.PROXIMITY_RATIO_LIMIT + 0.1
+
+
+class StubSpoofer:
+    """Stands in for MiniFASNet; records every predict() call."""
+
+    def __init__(self, is_real=True, confidence=0.99):
+        self.calls = 0
+        self.result = SimpleNamespace(is_real=is_real, confidence=confidence)
+
+    def predict(self, image, bbox):
+        self.calls += 1
+        return self.result
+
+
+@pytest.fixture
+def spoofer(monkeypatch):
+    stub = StubSpoofer()
+    monkeypatch.setattr(liveness_checker, "_get_spoofer", lambda: stub)
+    return stub
+
+
+def skipped():
+    return liveness_checker.rule_stats()["inference_skipped"]
+
+
+def test_real_frame_runs_minifasnet_and_counts_up(spoofer):
+    checker = LivenessChecker()
+    result = checker.check(FACE, NEAR, 1)
+
+    assert spoofer.calls == 1
+    assert result.is_real and result.blocked_by is None
+    assert result.consecutive_frames == 1
+    assert list(result.rule_ms) == [RULE_LOCKDOWN, RULE_PROXIMITY, RULE_LIVENESS]
+
+
+@pytest.mark.parametrize("ratio, count, rule", [
+    (NEAR, 2, RULE_LOCKDOWN),
+    (TOO_CLOSE, 1, RULE_PROXIMITY),
+])
+def test_cheap_rule_blocks_before_minifasnet(spoofer, ratio, count, rule):
+    checker = LivenessChecker()
+    checker.check(FACE, NEAR, 1)
+    checker.check(FACE, NEAR, 1)
+    assert checker.consecutive_real_frames == 2
+    before_calls, before_skipped = spoofer.calls, skipped()
+
+    assert not checker.needs_inference(ratio, count)
+    result = checker.check(FACE, ratio, count)
+
+    assert spoofer.calls == before_calls
+    assert skipped() == before_skipped + 1
+    assert result.blocked_by == rule
+    assert not result.is_real
+    assert result.consecutive_frames == 0
+    assert checker.consecutive_real_frames == 0
+    assert RULE_LIVENESS not in result.rule_ms
+
+
+def test_spoof_result_from_batch_is_not_recomputed(spoofer):
+    checker = LivenessChecker()
+    result = checker.check(FACE, NEAR, 1, spoof_result=SimpleNamespace(is_real=False, confidence=0.97))
+
+    assert spoofer.calls == 0
+    assert result.blocked_by == RULE_LIVENESS
+    assert result.consecutive_frames == 0
+
+
+def test_custom_rule_order_is_honoured(spoofer):
+    checker = LivenessChecker(rule_order=[RULE_LIVENESS, RULE_LOCKDOWN, RULE_PROXIMITY])
+    before_skipped = skipped()
+
+    assert checker.needs_inference(TOO_CLOSE, 2)
+    result = checker.check(FACE, TOO_CLOSE, 2)
+
+    # MiniFASNet runs first, then lockdown blocks before proximity is evaluated
+    assert spoofer.calls == 1
+    assert skipped() == before_skipped
+    assert result.blocked_by == RULE_LOCKDOWN
+    assert result.is_multi_face_lockdown and not result.too_close
+    assert list(result.rule_ms) == [RULE_LIVENESS, RULE_LOCKDOWN]
+
+
+def test_proximity_before_lockdown(spoofer):
+    checker = LivenessChecker(rule_order=[RULE_PROXIMITY, RULE_LOCKDOWN, RULE_LIVENESS])
+    result = checker.check(FACE, TOO_CLOSE, 2)
+
+    assert spoofer.calls == 0
+    assert result.blocked_by == RULE_PROXIMITY
+    assert result.too_close and not result.is_multi_face_lockdown
+
+
+def test_rule_order_must_be_known_and_include_liveness(spoofer):
+    with pytest.raises(ValueError):
+        LivenessChecker(rule_order=[RULE_LOCKDOWN, "blink"])
+    with pytest.raises(ValueError):
+        LivenessChecker(rule_order=[RULE_LOCKDOWN, RULE_PROXIMITY])
@@ -0,0 +1,82 @@
+"""Liveness state stores: per-session / per-track counters, TTL, session ids."""
+
+import time
+
+import pytest
+
+import liveness_state
+from liveness_state import MemoryStateStore, SQLiteStateStore, parse_session
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(ttl=None):
+        if request.param == "memory":
+            return MemoryStateStore(ttl=ttl)
+        return SQLiteStateStore(db_path=str(tmp_path / "liveness_state.db"), ttl=ttl)
+    return make
+
+
+def test_counters_are_per_session_and_track(make_store):
+    store = make_store()
+    store.set("pi-one-1", 1, 3)
+    store.set("pi-one-1", 2, 5)
+    store.set("pi-two-2", 1, 7)
+
+    assert store.get("pi-one-1", 1) == 3
+    assert store.get("pi-one-1", 2) == 5
+    assert store.get("pi-two-2", 1) == 7
+    assert store.get("pi-two-2", 2) == 0
+
+
+def test_untracked_frames_do_not_share_track_zero(make_store):
+    store = make_store()
+    store.set("pi-one-1", None, 4)
+    assert store.get("pi-one-1", 0) == 0
+
+    store.set("pi-one-1", 0, 2)
+    assert store.get("pi-one-1", None) == 4
+    assert store.get("pi-one-1", 0) == 2
+
+
+def test_reset_session_wipes_only_that_session(make_store):
+    store = make_store()
+    store.set("pi-one-1", None, 1)
+    store.set("pi-one-1", 3, 2)
+    store.set("pi-two-2", 3, 4)
+
+    store.reset_session("pi-one-1")
+    assert store.get("pi-one-1", None) == 0
+    assert store.get("pi-one-1", 3) == 0
+    assert store.get("pi-two-2", 3) == 4
+
+
+def test_expired_counters_read_as_zero(make_store, monkeypatch):
+    store = make_store(ttl=5.0)
+    store.set("pi-one-1", 1, 3)
+
+    now = time.time()
+    monkeypatch.setattr(liveness_state.time, "time", lambda: now + 6.0)
+    assert store.get("pi-one-1", 1) == 0
+    assert store.stats()["tracks"] == 0
+
+
+def test_zero_ttl_is_honoured(make_store, monkeypatch):
+    store = make_store(ttl=0)
+    assert store.ttl == 0
+
+    now = time.time()
+    monkeypatch.setattr(liveness_state.time, "time", lambda: now)
+    store.set("pi-one-1", 1, 3)
+    monkeypatch.setattr(liveness_state.time, "time", lambda: now + 0.01)
+    assert store.get("pi-one-1", 1) == 0
+
+
+@pytest.mark.parametrize("value", ["0f3c9a7e5b1d4c2a8e6f0a1b2c3d4e5f", "kiosk-door_01"])
+def test_valid_session_ids(value):
+    assert parse_session(value) == value
+
+
+@pytest.mark.parametrize("value", [None, "", "short", "x" * 65, "pi one", "pi/../one", "pi\none-123", "pï-one-123"])
+def test_invalid_session_ids(value):
+    assert parse_session(value) is None
@@ -0,0 +1,98 @@
+"""RecognitionCache: hits, database-version invalidation, LRU eviction, TTL."""
+
+import pytest
+
+import recognition_cache
+from recognition_cache import RecognitionCache
+from face_database import FaceDatabase
+from conftest import unit_vector
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(recognition_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def cached(cache, contents, embedding=None):
+    key = cache.key(contents)
+    return key, cache.put(key, unit_vector(len(contents)) if embedding is None else embedding)
+
+
+def test_hit_returns_cached_embedding_and_match():
+    cache = RecognitionCache(max_entries=4, ttl=60)
+    key = cache.key(b"frame-1")
+    assert cache.get(key) is None
+
+    entry = cache.put(key, unit_vector(1))
+    cache.set_match(entry, {"name": "alice", "similarity": 0.8}, version=3)
+
+    hit = cache.get(key)
+    assert hit is entry
+    assert cache.match(hit, 3) == {"name": "alice", "similarity": 0.8}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["match_hits"]) == (1, 1, 1)
+
+
+def test_match_is_a_copy():
+    cache = RecognitionCache(max_entries=4, ttl=60)
+    _, entry = cached(cache, b"frame-1")
+    cache.set_match(entry, {"name": "alice"}, version=1)
+
+    cache.match(entry, 1)["name"] = "mallory"
+    assert cache.match(entry, 1) == {"name": "alice"}
+
+
+def test_database_change_misses_the_match(db_path):
+    db = FaceDatabase(db_path=db_path, storage_format="binary", shared=False)
+    cache = RecognitionCache(max_entries=4, ttl=60)
+    key, entry = cached(cache, b"frame-1", unit_vector(1))
+    cache.set_match(entry, db.recognize(entry.embedding), db.version)
+    assert cache.match(cache.get(key), db.version) is not None
+
+    db.enroll("alice", [unit_vector(1)])
+
+    hit = cache.get(key)
+    assert hit is entry                     # the embedding is still reused ...
+    assert cache.match(hit, db.version) is None     # ... the match is recomputed
+    assert cache.stats()["rematches"] == 1
+
+    cache.set_match(hit, db.recognize(hit.embedding), db.version)
+    assert cache.match(hit, db.version)["name"] == "alice"
+
+
+def test_lru_eviction_at_capacity():
+    cache = RecognitionCache(max_entries=2, ttl=60)
+    a, _ = cached(cache, b"a")
+    b, _ = cached(cache, b"b")
+    assert cache.get(a) is not None         # b is now least recently used
+
+    c, _ = cached(cache, b"c")
+
+    assert cache.get(b) is None
+    assert cache.get(a) is not None
+    assert cache.get(c) is not None
+    stats = cache.stats()
+    assert (stats["entries"], stats["evictions"]) == (2, 1)
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = RecognitionCache(max_entries=4, ttl=10)
+    key, _ = cached(cache, b"frame-1")
+
+    clock[0] += 10
+    assert cache.get(key) is not None
+    clock[0] += 0.5
+    assert cache.get(key) is None
+    assert cache.stats()["expired"] == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_disabled_cache_stores_nothing():
+    cache = RecognitionCache(max_entries=0, ttl=60)
+    key, entry = cached(cache, b"frame-1")
+
+    assert not cache.enabled
+    assert entry.embedding is not None
+    assert cache.get(key) is None
@@ -0,0 +1,99 @@
+"""Pi SendRate: mode transitions from backend responses and send timing."""
+
+import pytest
+
+from conftest import import_pi
+
+send_rate = import_pi("send_rate")
+SendRate = send_rate.SendRate
+IDLE, NORMAL, STREAK, LOCKDOWN = send_rate.IDLE, send_rate.NORMAL, send_rate.STREAK, send_rate.LOCKDOWN
+
+
+@pytest.fixture
+def rate(monkeypatch):
+    monkeypatch.setattr(send_rate, "_INTERVALS", {IDLE: 3.0, NORMAL: 1.0, STREAK: 0.15, LOCKDOWN: 3.0})
+    return SendRate()
+
+
+def response(consecutive=0, validated=False, lockdown=False, **extra):
+    return {"consecutive_frames": consecutive, "is_validated": validated, "lockdown": lockdown, **extra}
+
+
+def face_in_view(rate, now=100.0):
+    assert rate.due(now, 1)
+    rate.sent(now)
+
+
+def test_starts_idle(rate):
+    assert rate.mode == IDLE
+    assert rate.interval() == 3.0
+
+
+def test_face_count_change_sends_at_once_and_switches_mode(rate):
+    rate.sent(100.0)
+    assert rate.due(100.01, 1)          # a face appeared: no waiting for the interval
+    assert rate.mode == NORMAL
+    rate.sent(100.01)
+    assert not rate.due(100.5, 1)
+    assert rate.due(101.01, 1)
+
+    assert rate.due(101.02, 0)          # the face left: no_face right away
+    assert rate.mode == IDLE
+
+
+def test_streak_then_validated(rate):
+    face_in_view(rate)
+    rate.on_result(response(consecutive=2))
+    assert rate.mode == STREAK
+    assert not rate.due(100.1, 1)
+    assert rate.due(100.16, 1)
+
+    rate.on_result(response(consecutive=5, validated=True))
+    assert rate.mode == NORMAL
+
+
+def test_lockdown_uses_the_idle_interval(rate):
+    face_in_view(rate)
+    rate.on_result(response(consecutive=0, lockdown=True))
+    assert rate.mode == LOCKDOWN
+    assert rate.interval() == 3.0
+
+    rate.on_result(response(consecutive=0))
+    assert rate.mode == NORMAL
+
+
+@pytest.mark.parametrize("result", [
+    {"label": "NO_FACE", "is_validated": False, "matched": False, "seq": 2},  # no_face ack
+    {"busy": True, "seq": 3},
+    {"error": "Inference failed", "is_validated": False},
+])
+def test_replies_without_a_verdict_keep_the_mode(rate, result):
+    face_in_view(rate)
+    rate.on_result(response(consecutive=1))
+    rate.on_result(result)
+    assert rate.mode == STREAK
+
+
+def test_late_response_after_the_face_left_is_ignored(rate):
+    face_in_view(rate)
+    assert rate.due(100.5, 0)
+    rate.sent(100.5)
+    rate.on_result(response(consecutive=3))         # for the frame before the face left
+    assert rate.mode == IDLE
+
+
+def test_backend_rate_cap(rate):
+    face_in_view(rate)
+    rate.on_result(response(consecutive=1, max_rate_hz=4.0))
+    assert rate.max_rate_hz == 4.0
+    assert rate.interval() == 0.25                  # STREAK's 0.15 s capped to 4 Hz
+
+    # A face count change also waits for the cap
+    assert not rate.due(100.1, 2)
+    assert rate.due(100.25, 2)
+
+
+def test_cap_survives_replies_without_a_verdict(rate):
+    rate.on_result({"label": "NO_FACE", "is_validated": False, "max_rate_hz": 2.0})
+    assert rate.max_rate_hz == 2.0
+    assert rate.mode == IDLE
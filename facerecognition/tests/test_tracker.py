@@ -0,0 +1,136 @@
+"""Pi FaceTracker: IoU / centroid association, expiry, due() and take_best()."""
+
+import pytest
+
+from conftest import import_pi
+
+tracker_module = import_pi("tracker")
+FaceTracker = tracker_module.FaceTracker
+
+
+def face(box, score=0.5, reject=None):
+    """Face dict as FaceDetector.detect() returns it (box is x1, y1, x2, y2)."""
+    return {"box": box, "confidence": 1.0, "face": None,
+            "quality": {"score": score, "reject": reject}}
+
+
+def shifted(box, dx, dy=0):
+    x1, y1, x2, y2 = box
+    return (x1 + dx, y1 + dy, x2 + dx, y2 + dy)
+
+
+A = (100, 100, 200, 200)
+B = (400, 100, 500, 200)
+
+
+@pytest.fixture
+def tracker():
+    return FaceTracker(iou_threshold=0.3, max_missed=2)
+
+
+def test_overlapping_boxes_keep_their_track(tracker):
+    first = [face(A), face(B)]
+    tracker.update(first)
+    second = [face(shifted(B, 10)), face(shifted(A, 10))]  # order swapped
+    tracker.update(second)
+
+    assert second[0]["track_id"] == first[1]["track_id"]
+    assert second[1]["track_id"] == first[0]["track_id"]
+    assert tracker.stats()["created"] == 2
+
+
+def test_best_iou_wins_when_boxes_compete(tracker):
+    tracker.update([face(A)])
+    near, nearer = face(shifted(A, 40)), face(shifted(A, 5))
+    tracker.update([near, nearer])
+
+    assert nearer["track_id"] == 1
+    assert near["track_id"] == 2
+
+
+def test_fast_mover_is_followed_by_centroid(tracker):
+    tracker.update([face(A)])
+    moved = face(shifted(A, 45, 10))    # no IoU >= 0.3, centroid within half a box width
+    tracker.update([moved])
+    assert moved["track_id"] == 1
+
+    jumped = face(shifted(A, 400))      # too far: a new person
+    tracker.update([jumped])
+    assert jumped["track_id"] == 2
+
+
+def test_track_ids_start_at_one_and_wrap_past_zero(tracker):
+    tracker._next_id = 0xFFFFFFFF
+    assert tracker._new_id() == 0xFFFFFFFF
+    assert tracker._new_id() == 1
+
+
+def test_tracks_expire_after_max_missed_frames(tracker):
+    tracker.update([face(A)])
+    tracker.update([])
+    tracker.update([])
+    assert 1 in tracker.tracks and tracker.tracks[1].missed == 2
+
+    back = face(A)
+    tracker.update([back])              # seen again within max_missed: same track
+    assert back["track_id"] == 1 and tracker.tracks[1].missed == 0
+
+    for _ in range(3):
+        tracker.update([])
+    assert tracker.tracks == {}
+    again = face(A)
+    tracker.update([again])
+    assert again["track_id"] == 2
+
+
+def test_take_best_returns_the_best_acceptable_crop_and_empties_the_window(tracker):
+    crops = [face(A, 0.4), face(A, 0.9, reject="blurry"), face(A, 0.7), face(A, 0.5)]
+    for crop in crops:
+        tracker.update([crop])
+    track = tracker.tracks[1]
+
+    assert track.take_best() is crops[2]    # the rejected 0.9 crop is never picked
+    assert track.take_best() is None
+
+
+def test_due_skips_tracks_without_an_acceptable_crop_or_not_in_view(tracker):
+    tracker.update([face(A, reject="dark"), face(B)])
+    assert [t.id for t in tracker.due(10.0)] == [2]
+    assert tracker.stats()["avoided"] == 1
+
+    tracker.update([face(A)])               # B missed this frame
+    assert [t.id for t in tracker.due(11.0)] == [1]
+
+
+def test_identified_tracks_are_resent_only_after_the_interval(tracker, monkeypatch):
+    monkeypatch.setattr(tracker_module, "TRACK_IDENTIFIED_RESEND", 5.0)
+    tracker.update([face(A)])
+    track = tracker.due(100.0)[0]
+    track.take_best()
+    track.last_sent = 100.0
+    tracker.on_result({"track_id": 1, "is_validated": True, "matched": True, "name": "alice"})
+    assert track.identified == "alice"
+
+    tracker.update([face(A)])
+    assert tracker.due(103.0) == []
+    assert tracker.stats()["suppressed"] == 1
+    assert track.best is None               # the stale crop is dropped
+
+    tracker.update([face(A)])
+    assert tracker.due(105.5) == [track]
+
+
+def test_on_result_and_reset_identified(tracker):
+    tracker.update([face(A)])
+    track = tracker.tracks[1]
+    tracker.on_result({"track_id": 1, "is_validated": True, "matched": True, "name": "alice"})
+    tracker.on_result({"track_id": 1, "busy": True})                  # no verdict: unchanged
+    tracker.on_result({"track_id": 99, "is_validated": True, "matched": True, "name": "x"})
+    assert track.identified == "alice"
+
+    tracker.on_result({"track_id": 1, "is_validated": False, "matched": False})
+    assert track.identified is None
+
+    tracker.on_result({"track_id": 1, "is_validated": True, "matched": True, "name": "alice"})
+    tracker.reset_identified()
+    assert track.identified is None
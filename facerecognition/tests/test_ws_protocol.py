@@ -0,0 +1,78 @@
+"""Binary frame protocol: the Pi's pack_frame against the backend's unpack_frame."""
+
+import pytest
+
+import ws_protocol
+from ws_protocol import FrameError, unpack_frame, MSG_RECOGNIZE, MSG_NO_FACE
+from conftest import import_pi
+
+sender = import_pi("sender")
+
+JPEG = b"\xff\xd8face-jpeg\xff\xd9"
+FRAME_JPEG = b"\xff\xd8full-frame\xff\xd9"
+
+
+def pack(version, **kwargs):
+    fields = dict(msg_type=MSG_RECOGNIZE, seq=42, timestamp=1234.5, box=(10, 20, 110, 140),
+                  face_height_ratio=0.25, face_count=2, confidence=1.0, jpeg=JPEG, track_id=7)
+    fields.update(kwargs)
+    return sender.pack_frame(version=version, **fields)
+
+
+def test_both_sides_know_the_same_versions():
+    assert set(sender.FRAME_HEADERS) == set(ws_protocol.FRAME_HEADERS)
+    for version, header in sender.FRAME_HEADERS.items():
+        assert header.format == ws_protocol.FRAME_HEADERS[version][0].format
+    assert f"kamera.face.v{sender.FRAME_VERSION}" == sender.BINARY_SUBPROTOCOL
+    assert sender.BINARY_SUBPROTOCOL in ws_protocol.BINARY_SUBPROTOCOLS
+
+
+@pytest.mark.parametrize("version", [1, 2, 3, 4])
+def test_round_trip(version):
+    message = unpack_frame(pack(version))
+
+    assert message["type"] == "recognize"
+    assert message["seq"] == (42 if version >= 2 else None)
+    assert message["track_id"] == (7 if version >= 3 else None)
+    assert message["box"] == [10, 20, 110, 140]
+    assert message["face_count"] == 2
+    assert message["timestamp"] == 1234.5
+    assert message["face_height_ratio"] == pytest.approx(0.25)
+    assert bytes(message["face"]) == JPEG
+    assert "frame" not in message
+
+
+def test_round_trip_with_full_frame():
+    message = unpack_frame(pack(4, frame_jpeg=FRAME_JPEG, frame_scale=0.5))
+    assert bytes(message["face"]) == JPEG
+    assert bytes(message["frame"]) == FRAME_JPEG
+    assert message["frame_scale"] == 0.5
+
+
+@pytest.mark.parametrize("version", [3, 4])
+def test_untracked_and_no_face(version):
+    message = unpack_frame(sender.pack_frame(MSG_NO_FACE, 9, 1.0, track_id=None, version=version))
+    assert message["type"] == "no_face"
+    assert message["track_id"] is None
+    assert message["seq"] == 9
+    assert bytes(message["face"]) == b""
+
+
+@pytest.mark.parametrize("version", [1, 2, 3, 4])
+def test_truncated_header_is_rejected(version):
+    data = pack(version)
+    header_size = ws_protocol.FRAME_HEADERS[version][0].size
+    with pytest.raises(FrameError, match="too short"):
+        unpack_frame(data[:header_size - 1])
+
+
+def test_truncated_face_payload_is_rejected():
+    data = pack(4)
+    with pytest.raises(FrameError, match="exceeds payload"):
+        unpack_frame(data[:-3])
+
+
+@pytest.mark.parametrize("data", [b"", b"\x00" + bytes(43), b"\x05" + bytes(60)])
+def test_unknown_version_is_rejected(data):
+    with pytest.raises(FrameError, match="Unsupported frame version"):
+        unpack_frame(data)